@@ -10,14 +10,24 @@ benchmark.py — 可复用的 Python 并行压测工具
     result = benchmark(my_func, data_list, concurrency=20, repeat=3, timeout=5)
     print_report(result)
 
+    # 开环模式：按 200 QPS 的泊松到达发送请求，延迟从计划发送时刻算起
+    result = benchmark(my_func, data_list, concurrency=20, rate=200, arrival="poisson")
+
+    # 阶梯加压：并发 10→200，每级 20 个并发、保持 30 秒，自动标出饱和点
+    result = benchmark(my_func, data_list, stages=ramp_stages(10, 200, 20, hold=30))
+
 设计建议：
     - I/O 密集型场景（网络请求、文件读写等）→ executor_type="thread"
     - CPU 密集型场景（数值计算、图像处理等）→ executor_type="process"
       注意：process 模式下 func 和 data_list 元素必须可 pickle
+    - 默认的闭环模式一次性提交全部请求，只能反映服务耗时；评估线上 p99
+      请使用开环模式（rate=），避免 coordinated omission 低估排队延迟
 """
 
 from __future__ import annotations
 
+import math
+import random
 import shutil
 import statistics
 import sys
@@ -27,15 +37,17 @@ from concurrent.futures import (
     Future,
     ProcessPoolExecutor,
     ThreadPoolExecutor,
-    as_completed,
+    FIRST_COMPLETED,
+    wait,
 )
+from collections import Counter
 from dataclasses import dataclass
-from typing import Any, Callable, Sequence
+from typing import Any, Callable, Iterator, Sequence
 
 from .logger import init_logger
 logger = init_logger(name=__name__)
 
-__all__ = ["benchmark", "print_report"]
+__all__ = ["benchmark", "print_report", "ramp_stages", "LatencyHistogram"]
 
 
 # ═══════════════════════════════════════════════
@@ -90,6 +102,176 @@ def _compute_latency_stats(latencies_ms: list[float]) -> dict[str, float]:
     }
 
 
+# ═══════════════════════════════════════════════
+#  流式延迟直方图
+# ═══════════════════════════════════════════════
+
+# 每个 2 的幂区间再细分为 2**(_SUB_BUCKET_BITS - 1) 个等宽子桶，
+# 相对误差不超过 1 / 2**(_SUB_BUCKET_BITS - 1) ≈ 0.1%
+_SUB_BUCKET_BITS = 11
+_SUB_BUCKET_COUNT = 1 << _SUB_BUCKET_BITS           # 低于此值（微秒）精确记录
+_SUB_BUCKET_HALF = _SUB_BUCKET_COUNT >> 1
+
+_HISTOGRAM_KEYS = _PERCENTILE_KEYS + ("p999", "p9999")
+
+
+def _bucket_index(us: int) -> int:
+    """微秒值 → 桶序号。[0, 2048) 一一对应，此后每个 2 的幂区间 1024 个桶。"""
+    if us < _SUB_BUCKET_COUNT:
+        return us
+    shift = us.bit_length() - _SUB_BUCKET_BITS
+    return _SUB_BUCKET_COUNT + (shift - 1) * _SUB_BUCKET_HALF + (us >> shift) - _SUB_BUCKET_HALF
+
+
+def _bucket_value(index: int) -> float:
+    """桶序号 → 桶内代表值（微秒，取区间中点）。"""
+    if index < _SUB_BUCKET_COUNT:
+        return float(index)
+    shift, sub = divmod(index - _SUB_BUCKET_COUNT, _SUB_BUCKET_HALF)
+    shift += 1
+    lower = (sub + _SUB_BUCKET_HALF) << shift
+    return lower + (1 << shift) / 2
+
+
+class LatencyHistogram:
+    """
+    对数分桶的延迟直方图（HDR Histogram 风格），内存与请求数无关。
+
+    以微秒为单位记录：2ms 以下精确到 1µs，以上按 2 的幂分段、段内等分
+    1024 个子桶，分位数相对误差约 0.1%，足以区分 p99.9 / p99.99。
+    桶计数稀疏存储，1 小时以内的延迟最多占用约 2.5 万个桶。
+
+    avg / min / max 精确统计；多个直方图可用 merge() 合并（如各 worker
+    各自记录、最后汇总），合并后的分桶计数与在单个直方图中记录全部样本
+    完全一致。
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts: Counter[int] = Counter()
+        self.count = 0
+        self.total = 0.0                # 秒
+        self.min = math.inf             # 秒
+        self.max = 0.0                  # 秒
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, seconds: float) -> None:
+        """记录一次耗时（秒）。"""
+        seconds = max(seconds, 0.0)
+        self.counts[_bucket_index(int(seconds * 1_000_000))] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: LatencyHistogram) -> LatencyHistogram:
+        """将 other 的样本并入自身，返回 self。"""
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentiles(self, pcts: Sequence[float]) -> list[float]:
+        """按 pcts（0–100）返回对应分位数（毫秒），结果夹在 [min, max] 内。"""
+        if not self.count:
+            return [0.0] * len(pcts)
+        order = sorted(range(len(pcts)), key=lambda i: pcts[i])
+        out = [0.0] * len(pcts)
+        buckets = sorted(self.counts.items())
+        seen = 0
+        pos = 0
+        for i in order:
+            # 第 rank 个样本（从 1 计）所在的桶
+            rank = max(1, math.ceil(pcts[i] / 100.0 * self.count))
+            while seen + buckets[pos][1] < rank:
+                seen += buckets[pos][1]
+                pos += 1
+            value = _bucket_value(buckets[pos][0]) / 1_000_000
+            out[i] = min(max(value, self.min), self.max) * 1000.0
+        return out
+
+    def stats(self) -> dict[str, float]:
+        """avg / min / max / p50 / p90 / p95 / p99 / p999 / p9999（毫秒）。"""
+        if not self.count:
+            return {k: 0.0 for k in _HISTOGRAM_KEYS}
+        p50, p90, p95, p99, p999, p9999 = self.percentiles((50, 90, 95, 99, 99.9, 99.99))
+        return {
+            "avg": self.total / self.count * 1000.0,
+            "min": self.min * 1000.0,
+            "max": self.max * 1000.0,
+            "p50": p50, "p90": p90, "p95": p95, "p99": p99,
+            "p999": p999, "p9999": p9999,
+        }
+
+
+_MAX_ERROR_SAMPLES = 1000       # 报告中保留的失败调用明细上限
+
+
+class _Recorder:
+    """
+    流式汇总压测结果，取代逐条保存 _TaskResult：延迟进直方图，成功 /
+    失败 / 超时只计数，失败明细最多保留 _MAX_ERROR_SAMPLES 条，返回值按
+    data_list 索引只保留一份。可按 worker / 阶段分别记录后 merge()。
+    """
+
+    __slots__ = (
+        "service", "response", "total", "success", "timeouts",
+        "errors", "keep_values", "values", "value_rounds",
+    )
+
+    def __init__(self, keep_values: bool = True) -> None:
+        self.service = LatencyHistogram()
+        self.response = LatencyHistogram()      # 仅开环模式：含排队的响应延迟
+        self.total = 0
+        self.success = 0
+        self.timeouts = 0
+        self.errors: list[dict[str, Any]] = []
+        self.keep_values = keep_values
+        self.values: dict[int, Any] = {}        # index → 最近一轮成功的返回值
+        self.value_rounds: dict[int, int] = {}
+
+    def add(self, r: _TaskResult, response_latency: float | None = None) -> None:
+        self.total += 1
+        self.service.record(r.latency)
+        if response_latency is not None:
+            self.response.record(response_latency)
+        if r.is_timeout:
+            self.timeouts += 1
+        if r.success:
+            self.success += 1
+            if self.keep_values and r.repeat_round >= self.value_rounds.get(r.index, -1):
+                self.values[r.index] = r.return_value
+                self.value_rounds[r.index] = r.repeat_round
+        elif len(self.errors) < _MAX_ERROR_SAMPLES:
+            self.errors.append({
+                "index": r.index,
+                "round": r.repeat_round,
+                "error": r.error,
+                "is_timeout": r.is_timeout,
+                "latency_ms": round(r.latency * 1000, 2),
+            })
+
+    def merge(self, other: _Recorder) -> _Recorder:
+        self.service.merge(other.service)
+        self.response.merge(other.response)
+        self.total += other.total
+        self.success += other.success
+        self.timeouts += other.timeouts
+        self.errors.extend(other.errors[:_MAX_ERROR_SAMPLES - len(self.errors)])
+        for idx, rnd in other.value_rounds.items():
+            if rnd >= self.value_rounds.get(idx, -1):
+                self.values[idx] = other.values[idx]
+                self.value_rounds[idx] = rnd
+        return self
+
+
 # ═══════════════════════════════════════════════
 #  模块顶层 worker（支持 ProcessPoolExecutor 的 pickle 要求）
 # ═══════════════════════════════════════════════
@@ -100,12 +282,14 @@ def _run_one(
     item: Any,
     rnd: int,
     timeout: float | None = None,
+    keep_value: bool = True,
 ) -> _TaskResult:
     """
     在 worker 中执行一次 func(item)，捕获异常并记录耗时。
     此函数定义在模块顶层，以确保 ProcessPoolExecutor 能正确序列化。
 
     当 timeout 非 None 且实际耗时超过该值时，标记为超时失败。
+    keep_value=False 时丢弃返回值，不回传给主进程。
     """
     t0 = time.perf_counter()
     try:
@@ -118,7 +302,7 @@ def _run_one(
             latency=latency,
             success=not timed_out,
             is_timeout=timed_out,
-            return_value=None if timed_out else ret,
+            return_value=ret if keep_value and not timed_out else None,
         )
     except Exception as exc:
         latency = time.perf_counter() - t0
@@ -218,6 +402,280 @@ _EXECUTOR_MAP: dict[str, type] = {
     "process": ProcessPoolExecutor,
 }
 
+_ARRIVALS = ("constant", "poisson")
+
+
+def _arrival_offsets(
+    total: int, rate: float, arrival: str, seed: int | None,
+) -> Iterator[float]:
+    """逐个生成每个请求相对开始时刻的计划发送时间（秒），不预先物化。
+
+    constant — 等间隔 1/rate；poisson — 间隔服从均值 1/rate 的指数分布。
+    """
+    if arrival == "constant":
+        for i in range(total):
+            yield i / rate
+        return
+    rng = random.Random(seed)
+    t = 0.0
+    for _ in range(total):
+        yield t
+        t += rng.expovariate(rate)
+
+
+def _dispatch_closed_loop(
+    pool: Any,
+    func: Callable[[Any], Any],
+    data_list: Sequence[Any],
+    repeat: int,
+    timeout: float | None,
+    progress: _ProgressBar | None,
+    recorder: _Recorder,
+    window: int,
+) -> None:
+    """
+    闭环模式：按序提交全部请求，由线程 / 进程池按并发数消化。
+
+    在途 Future 不超过 window 个，完成一个补一个，已汇总的结果随即释放，
+    内存不随总请求数增长。只有最后一轮的调用回传返回值。
+    """
+    data_size = len(data_list)
+    total = data_size * repeat
+    keep_round = repeat - 1 if recorder.keep_values else -1
+    future_map: dict[Future, tuple[int, int]] = {}
+    n = 0
+    while n < total or future_map:
+        while n < total and len(future_map) < window:
+            rnd, idx = divmod(n, data_size)
+            fut = pool.submit(
+                _run_one, func, idx, data_list[idx], rnd, timeout, rnd == keep_round,
+            )
+            future_map[fut] = (idx, rnd)
+            n += 1
+        done, _ = wait(future_map, return_when=FIRST_COMPLETED)
+        for fut in done:
+            idx, rnd = future_map.pop(fut)
+            result = _collect(fut, idx, rnd, timeout)
+            recorder.add(result)
+            if progress:
+                progress.update(success=result.success, is_timeout=result.is_timeout)
+
+
+def _dispatch_open_loop(
+    pool: Any,
+    func: Callable[[Any], Any],
+    data_list: Sequence[Any],
+    repeat: int,
+    timeout: float | None,
+    progress: _ProgressBar | None,
+    offsets: Iterator[float],
+    keep_values: bool,
+) -> tuple[_Recorder, float]:
+    """
+    开环模式：按计划时刻逐个发送，不等待前一个请求完成。
+
+    响应延迟 = 完成时刻 - 计划发送时刻，包含池内排队时间；发送端落后于
+    计划（send lag）时同样计入，从而避免 coordinated omission。
+    offsets 边发送边惰性取用，内存不随总请求数增长。完成时刻由主进程中的 Future 回调记录，thread / process 模式使用同一时钟。
+
+    回调在完成该 Future 的线程中执行，每个线程写各自的 _Recorder，
+    结束后合并，记录过程无需加锁。
+
+    返回 ``(合并后的 _Recorder, 最大发送滞后（秒）)``。
+    """
+    data_size = len(data_list)
+    keep_round = repeat - 1 if keep_values else -1
+    lock = threading.Lock()
+    recorders: dict[int, _Recorder] = {}
+    pending: set[Future] = set()
+
+    def _on_done(fut: Future, idx: int, rnd: int, scheduled: float) -> None:
+        done = time.perf_counter()
+        result = _collect(fut, idx, rnd, timeout)
+        tid = threading.get_ident()
+        rec = recorders.get(tid)
+        if rec is None:
+            with lock:
+                rec = recorders.setdefault(tid, _Recorder(keep_values))
+        rec.add(result, done - scheduled)
+        if progress:
+            progress.update(success=result.success, is_timeout=result.is_timeout)
+        with lock:
+            pending.discard(fut)
+
+    max_lag = 0.0
+    start = time.perf_counter()
+    for n, offset in enumerate(offsets):
+        rnd, idx = divmod(n, data_size)
+        scheduled = start + offset
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        max_lag = max(max_lag, time.perf_counter() - scheduled)
+        fut = pool.submit(
+            _run_one, func, idx, data_list[idx], rnd, timeout, rnd == keep_round,
+        )
+        with lock:
+            pending.add(fut)
+        fut.add_done_callback(
+            lambda f, i=idx, r=rnd, sc=scheduled: _on_done(f, i, r, sc)
+        )
+    while True:
+        with lock:
+            remaining = list(pending)
+        if not remaining:
+            break
+        wait(remaining)
+
+    merged = _Recorder(keep_values)
+    for rec in recorders.values():
+        merged.merge(rec)
+    return merged, max_lag
+
+
+def _run_stage(
+    pool: Any,
+    func: Callable[[Any], Any],
+    data_list: Sequence[Any],
+    concurrency: int,
+    duration: float,
+    timeout: float | None,
+    start: int,
+    keep_values: bool,
+) -> tuple[_Recorder, float, int]:
+    """
+    以闭环方式在 duration 秒内始终保持 concurrency 个请求在途。
+
+    pool 由各阶段共用，按最大并发一次建好，本阶段只限制在途请求数，
+    建池 / 关池开销不计入阶段耗时。
+
+    请求按 data_list 循环取数，第 n 个请求对应 ``divmod(n, len(data_list))``
+    的 (round, index)；start 为本阶段的起始序号，使各阶段接续取数。
+    截止时刻之后不再发送新请求，但会等在途请求完成，计入本阶段。
+
+    返回 ``(本阶段的 _Recorder, 本阶段实际耗时（秒）, 下一阶段的起始序号)``。
+    """
+    data_size = len(data_list)
+    recorder = _Recorder(keep_values)
+    future_map: dict[Future, tuple[int, int]] = {}
+    n = start
+
+    def _submit() -> None:
+        nonlocal n
+        rnd, idx = divmod(n, data_size)
+        fut = pool.submit(
+            _run_one, func, idx, data_list[idx], rnd, timeout, keep_values,
+        )
+        future_map[fut] = (idx, rnd)
+        n += 1
+
+    t0 = time.perf_counter()
+    deadline = t0 + duration
+    for _ in range(concurrency):
+        _submit()
+    while future_map:
+        done, _ = wait(future_map, return_when=FIRST_COMPLETED)
+        for fut in done:
+            idx, rnd = future_map.pop(fut)
+            recorder.add(_collect(fut, idx, rnd, timeout))
+            if time.perf_counter() < deadline:
+                _submit()
+    elapsed = time.perf_counter() - t0
+
+    return recorder, elapsed, n
+
+
+def _stage_summary(
+    stage: int, concurrency: int, recorder: _Recorder, elapsed: float,
+) -> dict[str, Any]:
+    """汇总单个阶段的 QPS、错误率与延迟分位数。"""
+    requests = recorder.total
+    success = recorder.success
+    stats = recorder.service.stats()
+    return {
+        "stage": stage,
+        "concurrency": concurrency,
+        "duration": round(elapsed, 4),
+        "requests": requests,
+        "success_count": success,
+        "error_rate": round((requests - success) / requests * 100, 2) if requests else 0.0,
+        "qps": round(requests / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_stats": {k: round(v, 2) for k, v in stats.items()},
+    }
+
+
+# 饱和判定阈值：满足任一条即认为该阶段已越过拐点
+_SATURATION_MIN_GAIN = 0.10         # 并发上调后 QPS 增幅不足 10%
+_SATURATION_P50_FACTOR = 2.0        # p50 超过此前各阶段最低 p50 的 2 倍
+_SATURATION_ERROR_RATE = 1.0        # 错误率（%）达到 1%
+
+
+def _detect_saturation(stages: list[dict[str, Any]]) -> dict[str, Any] | None:
+    """
+    在逐级加压的阶段报告中寻找饱和点（延迟曲线的拐点）。
+
+    从第二个阶段起依次检查：错误率达到阈值、并发上调但 QPS 几乎不再增长、
+    p50 相对此前最低值显著抬升（闭环下越过拐点后请求开始排队，中位数随并发
+    线性上涨；p99 对调度抖动过于敏感，不单独作为判据）。首个命中的阶段记为饱和阶段，其前一阶段即
+    拐点（knee）—— 仍能线性扩展的最大并发。未命中时返回 None。
+    """
+    for i in range(1, len(stages)):
+        prev, cur = stages[i - 1], stages[i]
+        best_p50 = min(s["latency_stats"]["p50"] for s in stages[:i])
+        if cur["error_rate"] >= _SATURATION_ERROR_RATE:
+            reason = f"error rate {cur['error_rate']}%"
+        elif (
+            cur["concurrency"] > prev["concurrency"]
+            and cur["qps"] < prev["qps"] * (1 + _SATURATION_MIN_GAIN)
+        ):
+            reason = f"throughput plateau ({prev['qps']} -> {cur['qps']} QPS)"
+        elif best_p50 > 0 and cur["latency_stats"]["p50"] > best_p50 * _SATURATION_P50_FACTOR:
+            reason = f"p50 {cur['latency_stats']['p50']}ms > {_SATURATION_P50_FACTOR:g}x {best_p50}ms"
+        else:
+            continue
+        return {
+            "stage": i,
+            "concurrency": cur["concurrency"],
+            "reason": reason,
+            "knee_stage": i - 1,
+            "knee_concurrency": prev["concurrency"],
+            "knee_qps": prev["qps"],
+        }
+    return None
+
+
+def ramp_stages(
+    start: int, stop: int, step: int, hold: float,
+) -> list[tuple[int, float]]:
+    """
+    生成阶梯加压的 stages 配置：并发从 start 起每级增加 step，直到 stop（含），
+    每级保持 hold 秒。
+
+    示例：ramp_stages(10, 50, 20, hold=5) → [(10, 5), (30, 5), (50, 5)]
+    """
+    if start < 1 or step < 1 or stop < start:
+        raise ValueError("ramp_stages requires 1 <= start <= stop and step >= 1")
+    levels = list(range(start, stop + 1, step))
+    if levels[-1] != stop:
+        levels.append(stop)
+    return [(c, hold) for c in levels]
+
+
+def _collect(fut: Future, idx: int, rnd: int, timeout: float | None) -> _TaskResult:
+    """取出 Future 的 _TaskResult；池层面的异常（序列化失败等）记为失败。"""
+    try:
+        return fut.result()
+    except Exception as exc:
+        # func 本身的异常已在 _run_one 内部处理
+        return _TaskResult(
+            index=idx,
+            repeat_round=rnd,
+            latency=timeout or 0.0,
+            success=False,
+            is_timeout=True,
+            error=f"{type(exc).__name__}: {exc}",
+        )
+
 
 def benchmark(
     func: Callable[[Any], Any],
@@ -228,6 +686,11 @@ def benchmark(
     timeout: float | None = None,
     executor_type: str = "thread",
     show_progress: bool = True,
+    rate: float | None = None,
+    arrival: str = "constant",
+    seed: int | None = None,
+    stages: Sequence[tuple[int, float]] | None = None,
+    keep_results: bool = True,
 ) -> dict[str, Any]:
     """
     对 func 在 data_list 上进行并行压测，返回结构化报告字典。
@@ -261,6 +724,29 @@ def benchmark(
     show_progress : bool, default=True
         是否在 stderr 上实时显示进度条。
 
+    rate : float | None, default=None
+        目标 QPS。None 为闭环模式（一次性提交全部请求，延迟只含服务耗时）；
+        设置后为开环模式：按计划时刻发送请求，不等待前一个完成，
+        latency_stats 从计划发送时刻算起，包含排队时间，能如实反映过载时
+        的尾延迟。concurrency 仍是 worker 数上限，超出的请求在池中排队。
+
+    arrival : str, default="constant"
+        开环模式的到达过程："constant"（等间隔）或 "poisson"（指数间隔）。
+
+    seed : int | None, default=None
+        poisson 到达的随机种子，便于复现。
+
+    stages : Sequence[tuple[int, float]] | None, default=None
+        阶梯压测配置，每项为 (并发数, 持续秒数)，可用 ramp_stages() 生成。
+        设置后按阶段依次压测：每个阶段闭环地保持指定并发、循环取 data_list
+        直到时间用尽，此时忽略 concurrency / repeat，且不能与 rate 同用。
+        进度不再显示进度条，改为每个阶段结束时输出一行日志。
+
+    keep_results : bool, default=True
+        是否收集返回值。True 时只有最后一轮的调用把返回值传回（results）；
+        False 时 worker 丢弃所有返回值，results 为空列表，适合返回值较大的
+        长时间压测。
+
     返回
     ────
     dict，结构如下：
@@ -280,14 +766,30 @@ def benchmark(
             "p90": float,
             "p95": float,
             "p99": float,
+            "p999": float,          # p99.9
+            "p9999": float,         # p99.99
         },
+        "service_latency_stats": {...},  # 仅 func 执行耗时，闭环模式下同上
         "concurrency": int,
         "repeat": int,
         "data_size": int,
         "executor_type": str,
+        "mode": str,                # "closed" / "open"
+        "target_qps": float | None, # 开环模式的目标 QPS
+        "arrival": str | None,
+        "max_send_lag_ms": float,   # 开环模式下发送端落后计划的最大值
         "results": list,            # 与 data_list 一一对应的返回值（最后一轮）
-        "errors": list[dict],       # 所有失败调用的摘要
+        "errors": list[dict],       # 失败调用的摘要（最多保留前 1000 条）
+        # 以下仅 stages 模式：
+        "stages": list[dict],       # 每阶段的 concurrency / qps / error_rate / latency_stats
+        "saturation": dict | None,  # 饱和阶段、原因及拐点（knee）并发与 QPS
     }
+
+    stages 模式下 concurrency 为各阶段最大并发，repeat 为 data_list 被完整
+    或部分遍历的轮数，results 为每个元素最近一次成功调用的返回值。
+
+    延迟由 LatencyHistogram 流式汇总，不逐条保存调用结果，内存占用与
+    总请求数无关；分位数相对误差约 0.1%，avg / min / max 为精确值。
     """
 
     # ── 参数校验 ──
@@ -295,6 +797,21 @@ def benchmark(
         raise ValueError("concurrency must be >= 1")
     if repeat < 1:
         raise ValueError("repeat must be >= 1")
+    if rate is not None and rate <= 0:
+        raise ValueError("rate must be > 0")
+    if arrival not in _ARRIVALS:
+        raise ValueError(f"arrival must be one of {list(_ARRIVALS)}, got '{arrival}'")
+    if stages is not None:
+        if rate is not None:
+            raise ValueError("stages cannot be combined with rate")
+        if not stages:
+            raise ValueError("stages must not be empty")
+        for c, duration in stages:
+            if c < 1 or duration <= 0:
+                raise ValueError(f"invalid stage ({c}, {duration}): need concurrency >= 1, duration > 0")
+        concurrency = max(c for c, _ in stages)
+        repeat = 1
+    mode = "closed" if rate is None else "open"
 
     PoolClass = _EXECUTOR_MAP.get(executor_type)
     if PoolClass is None:
@@ -311,53 +828,74 @@ def benchmark(
             "total_requests": 0, "success_count": 0,
             "fail_count": 0, "timeout_count": 0, "success_rate": 100.0,
             "total_time": 0.0, "qps": 0.0,
-            "latency_stats": dict(_ZERO_LATENCY),
+            "latency_stats": LatencyHistogram().stats(),
+            "service_latency_stats": LatencyHistogram().stats(),
             "concurrency": concurrency, "repeat": repeat,
             "data_size": data_size, "executor_type": executor_type,
+            "mode": mode, "target_qps": rate,
+            "arrival": arrival if rate is not None else None,
+            "max_send_lag_ms": 0.0,
             "results": [], "errors": [],
         }
         print_report(empty_report)
         return empty_report
 
-    task_results: list[_TaskResult] = []
-    logger.info(
-        f"benchmark: {func.__name__}, {total_requests} requests, "
-        f"{concurrency} workers, {repeat} rounds"
-    )
+    if stages is None:
+        logger.info(
+            f"benchmark: {func.__name__}, {total_requests} requests, "
+            f"{concurrency} workers, {repeat} rounds, mode={mode}"
+            + (f", target {rate} QPS ({arrival})" if rate is not None else "")
+        )
+    else:
+        logger.info(
+            f"benchmark: {func.__name__}, {len(stages)} stages, "
+            f"concurrency {stages[0][0]} -> {stages[-1][0]}"
+        )
 
     # ── 主调度 ──
     wall_start = time.perf_counter()
-
-    with PoolClass(max_workers=concurrency) as pool:
-        future_map: dict[Future, tuple[int, int]] = {}
-        for rnd in range(repeat):
-            for idx, item in enumerate(data_list):
-                fut = pool.submit(_run_one, func, idx, item, rnd, timeout)
-                future_map[fut] = (idx, rnd)
-
-        progress = _ProgressBar(total_requests) if show_progress else None
-        try:
-            for fut in as_completed(future_map):
-                idx, rnd = future_map[fut]
-                try:
-                    result = fut.result()
-                except Exception as exc:
-                    # 仅捕获 pool 层面异常（序列化失败等），
-                    # func 本身的异常已在 _run_one 内部处理
-                    result = _TaskResult(
-                        index=idx,
-                        repeat_round=rnd,
-                        latency=timeout or 0.0,
-                        success=False,
-                        is_timeout=True,
-                        error=f"{type(exc).__name__}: {exc}",
+    max_lag = 0.0
+    stage_reports: list[dict[str, Any]] = []
+
+    if stages is not None:
+        recorder = _Recorder(keep_results)
+        n = 0
+        # 各阶段共用一个按最大并发创建的池，阶段内只限制在途请求数
+        with PoolClass(max_workers=concurrency) as pool:
+            for i, (c, duration) in enumerate(stages):
+                part, elapsed, n = _run_stage(
+                    pool, func, data_list, c, duration, timeout, n, keep_results,
+                )
+                recorder.merge(part)
+                stage_reports.append(_stage_summary(i, c, part, elapsed))
+                if show_progress:
+                    st = stage_reports[-1]
+                    logger.info(
+                        f"stage {i}: concurrency={c}, {st['requests']} requests, "
+                        f"QPS={st['qps']}, err={st['error_rate']}%, "
+                        f"p99={st['latency_stats']['p99']}ms"
+                    )
+        total_requests = recorder.total
+        repeat = -(-total_requests // data_size)
+    else:
+        with PoolClass(max_workers=concurrency) as pool:
+            progress = _ProgressBar(total_requests) if show_progress else None
+            try:
+                if rate is None:
+                    recorder = _Recorder(keep_results)
+                    _dispatch_closed_loop(
+                        pool, func, data_list, repeat, timeout, progress,
+                        recorder, window=concurrency * 2,
                     )
-                task_results.append(result)
+                else:
+                    offsets = _arrival_offsets(total_requests, rate, arrival, seed)
+                    recorder, max_lag = _dispatch_open_loop(
+                        pool, func, data_list, repeat, timeout, progress,
+                        offsets, keep_results,
+                    )
+            finally:
                 if progress:
-                    progress.update(success=result.success, is_timeout=result.is_timeout)
-        finally:
-            if progress:
-                progress.close()
+                    progress.close()
 
     total_time = time.perf_counter() - wall_start
 
@@ -365,35 +903,20 @@ def benchmark(
     #  统计计算
     # ═══════════════════════════════════════════
 
-    success_count = sum(1 for r in task_results if r.success)
+    success_count = recorder.success
     fail_count = total_requests - success_count
-    timeout_count = sum(1 for r in task_results if r.is_timeout)
+    timeout_count = recorder.timeouts
 
-    latencies_ms = sorted(r.latency * 1000.0 for r in task_results)
-    latency_stats = _compute_latency_stats(latencies_ms)
+    service_stats = recorder.service.stats()
+    latency_stats = recorder.response.stats() if rate is not None else service_stats
     qps = total_requests / total_time if total_time > 0 else 0.0
 
-    # ── 与 data_list 一一对应的返回值列表（取最后一轮 repeat 的结果）──
-    last_round = repeat - 1
-    results_by_index: dict[int, Any] = {
-        r.index: r.return_value
-        for r in task_results
-        if r.repeat_round == last_round and r.success
-    }
-    results_list = [results_by_index.get(i) for i in range(data_size)]
-
-    # ── 错误摘要 ──
-    errors_summary = [
-        {
-            "index": r.index,
-            "round": r.repeat_round,
-            "error": r.error,
-            "is_timeout": r.is_timeout,
-            "latency_ms": round(r.latency * 1000, 2),
-        }
-        for r in task_results
-        if not r.success
-    ]
+    # ── 与 data_list 一一对应的返回值列表（最后一轮；stages 模式下为最近一次成功）──
+    if keep_results:
+        results_list = [recorder.values.get(i) for i in range(data_size)]
+    else:
+        results_list = []
+    errors_summary = recorder.errors
 
     report: dict[str, Any] = {
         "total_requests": total_requests,
@@ -404,13 +927,21 @@ def benchmark(
         "total_time": round(total_time, 4),
         "qps": round(qps, 2),
         "latency_stats": {k: round(v, 2) for k, v in latency_stats.items()},
+        "service_latency_stats": {k: round(v, 2) for k, v in service_stats.items()},
         "concurrency": concurrency,
         "repeat": repeat,
         "data_size": data_size,
         "executor_type": executor_type,
+        "mode": mode,
+        "target_qps": rate,
+        "arrival": arrival if rate is not None else None,
+        "max_send_lag_ms": round(max_lag * 1000, 2),
         "results": results_list,
         "errors": errors_summary,
     }
+    if stages is not None:
+        report["stages"] = stage_reports
+        report["saturation"] = _detect_saturation(stage_reports)
     print_report(report)
     return report
 
@@ -419,6 +950,12 @@ def benchmark(
 #  格式化报告打印
 # ═══════════════════════════════════════════════
 
+def _mode_label(report: dict[str, Any]) -> str:
+    if report.get("mode") != "open":
+        return "closed-loop"
+    return f"open-loop {report['target_qps']} QPS ({report['arrival']})"
+
+
 def print_report(report: dict[str, Any], file: Any = None) -> None:
     """
     将压测报告以可读文本格式打印。
@@ -457,6 +994,7 @@ def print_report(report: dict[str, Any], file: Any = None) -> None:
         f"  |  Repeat rounds   : {report['repeat']:<31}|",
         f"  |  Data size       : {report['data_size']:<31}|",
         f"  |  Executor        : {report['executor_type']:<31}|",
+        f"  |  Mode            : {_mode_label(report):<31}|",
         "  +----------------------------------------------------+",
         "",
         "  +-- Summary -----------------------------------------+",
@@ -477,14 +1015,64 @@ def print_report(report: dict[str, Any], file: Any = None) -> None:
         f"  |  P90             : {p90_s:<31}|",
         f"  |  P95             : {p95_s:<31}|",
         f"  |  P99             : {p99_s:<31}|",
-        "  +----------------------------------------------------+",
     ]
+    # 由 LatencyHistogram 统计的报告额外带有 p99.9 / p99.99
+    if "p9999" in ls:
+        p999_s = f"{ls['p999']:.2f}"
+        p9999_s = f"{ls['p9999']:.2f}"
+        lines += [
+            f"  |  P99.9           : {p999_s:<31}|",
+            f"  |  P99.99          : {p9999_s:<31}|",
+        ]
+    lines.append("  +----------------------------------------------------+")
+
+    # 开环模式下另列服务耗时，与含排队的响应延迟对照
+    if report.get("mode") == "open":
+        svc = report["service_latency_stats"]
+        avg_p50 = f"{svc['avg']:.2f} / {svc['p50']:.2f}"
+        p99_max = f"{svc['p99']:.2f} / {svc['max']:.2f}"
+        lag_s = f"{report.get('max_send_lag_ms', 0.0):.2f}"
+        lines += [
+            "",
+            "  +-- Service time (ms, excl. queueing) ---------------+",
+            f"  |  Avg / P50       : {avg_p50:<31}|",
+            f"  |  P99 / Max       : {p99_max:<31}|",
+            f"  |  Max send lag    : {lag_s:<31}|",
+            "  +----------------------------------------------------+",
+        ]
+
+    # 阶段报告
+    stage_reports = report.get("stages")
+    if stage_reports:
+        lines += [
+            "",
+            "  +-- Stages ------------------------------------------+",
+            f"  |  {'#':>2} {'conc':>5} {'QPS':>9} {'err%':>6} {'p50':>8} {'p99':>8}      |",
+        ]
+        for st in stage_reports:
+            st_ls = st["latency_stats"]
+            lines.append(
+                f"  |  {st['stage']:>2} {st['concurrency']:>5} {st['qps']:>9.2f} "
+                f"{st['error_rate']:>6.2f} {st_ls['p50']:>8.2f} {st_ls['p99']:>8.2f}      |"
+            )
+        sat = report.get("saturation")
+        if sat:
+            knee_s = f"concurrency {sat['knee_concurrency']} @ {sat['knee_qps']:.2f} QPS"
+            lines += [
+                f"  |  Knee            : {knee_s:<31}|",
+                f"  |  Saturated at    : {'stage %d (%s)' % (sat['stage'], sat['concurrency']):<31}|",
+                f"  |    {sat['reason'][:47]:<47}|",
+            ]
+        else:
+            lines.append(f"  |  Saturation      : {'not reached':<31}|")
+        lines.append("  +----------------------------------------------------+")
 
     # 错误摘要（最多展示前 10 条）
     errors = report.get("errors", [])
     if errors:
         lines.append("")
-        lines.append(f"  +-- Errors (first 10 of {len(errors)}) -------------------------+")
+        n_errors = report.get("fail_count", len(errors))
+        lines.append(f"  +-- Errors (first 10 of {n_errors}) -------------------------+")
         for e in errors[:10]:
             tag = "[TIMEOUT]" if e["is_timeout"] else "[ERROR]  "
             e_idx = e["index"]
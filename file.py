@@ -12,10 +12,13 @@ import csv
 import json
 import os
 import pickle
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Union
+from typing import Any, Dict, Iterator, List, Literal, Optional, Union
 
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
@@ -294,29 +297,144 @@ def read_jsonl(file_path: PathLike, encoding: str = "utf-8") -> List[Any]:
 
 
 def write_jsonl(
-    data: List[Any],
+    data: Union[List[Any], pd.DataFrame, Any],
     file_path: PathLike,
     encoding: str = "utf-8",
     append: bool = False,
+    chunk_size: int = 100_000,
+    num_workers: int = 1,
 ) -> None:
     """
     写入 JSONL 文件（每行一个 JSON 对象）。
 
     参数:
-        data: 要写入的对象列表。
+        data: 要写入的对象列表，或 pd.DataFrame / pyarrow.Table。
         file_path: 文件路径。
         encoding: 文件编码，默认 utf-8。
         append: 是否追加写入，默认 False。
+        chunk_size: DataFrame / Arrow 输入时每个分块的行数，默认 100000。
+        num_workers: DataFrame / Arrow 输入时并行序列化的线程数，默认 1。
+
+    说明:
+        DataFrame / Arrow 输入按列式分块调用 to_json(orient="records", lines=True)，
+        不再逐行生成 dict；float 列按列格式化为 repr 以保证精确往返。多线程
+        序列化时按分块顺序写出，保证行序不变；序列化期间大多持有 GIL，
+        多线程通常仅在自由线程构建（PEP 703）下有明显收益。
     """
     file_path = _to_path(file_path)
     _ensure_parent(file_path)
     mode = "a" if append else "w"
+
+    if isinstance(data, pd.DataFrame) or _is_arrow_table(data):
+        with open(file_path, mode, encoding=encoding) as f:
+            for text in _iter_jsonl_chunks(data, chunk_size, num_workers):
+                f.write(text)
+        logger.info(
+            f"Write {len(data)} JSON objects to '{file_path}' "
+            f"({type(data).__name__}, chunk_size={chunk_size}, workers={num_workers})"
+        )
+        return
+
     with open(file_path, mode, encoding=encoding) as f:
         for item in data:
             f.write(json.dumps(item, ensure_ascii=False) + "\n")
     logger.info(f"Write {len(data)} JSON objects to '{file_path}'")
 
 
+def _is_arrow_table(data: Any) -> bool:
+    """判断是否为 pyarrow.Table（未安装 pyarrow 时直接返回 False）。"""
+    if not type(data).__module__.startswith("pyarrow"):
+        return False
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return False
+    return isinstance(data, pa.Table)
+
+
+def _float_texts(column: pd.Series) -> List[str]:
+    """float 列 → 可精确往返的 repr 文本列表，NaN / inf / NA 记为 null。"""
+    values = column.to_numpy(dtype="float64", na_value=np.nan)
+    texts = list(map(repr, values.tolist()))
+    for i in np.flatnonzero(~np.isfinite(values)).tolist():
+        texts[i] = "null"
+    return texts
+
+
+def _frame_to_jsonl(df: pd.DataFrame) -> str:
+    """将一个 DataFrame 分块序列化为 JSONL 文本（以换行结尾）。"""
+    if df.empty:
+        return ""
+    is_float = [pd.api.types.is_float_dtype(dtype) for dtype in df.dtypes]
+    if not any(is_float):
+        text = df.to_json(
+            orient="records", lines=True, force_ascii=False, date_format="iso",
+        )
+        return text if text.endswith("\n") else text + "\n"
+
+    # to_json 最多保留 15 位有效数字（默认仅 10 位），会悄悄截断浮点数：
+    # float 列按列格式化为 repr，其余相邻列仍整段交给 to_json 处理日期等
+    # 类型，再用逐行模板按原列序拼接，全程不构造逐行的 dict
+    fields: List[str] = []
+    columns: List[List[str]] = []
+    start = 0
+    while start < df.shape[1]:
+        stop = start + 1
+        while stop < df.shape[1] and is_float[stop] == is_float[start]:
+            stop += 1
+        if is_float[start]:
+            for i in range(start, stop):
+                key = json.dumps(str(df.columns[i]), ensure_ascii=False)
+                fields.append(key.replace("%", "%%") + ":%s")
+                columns.append(_float_texts(df.iloc[:, i]))
+        else:
+            text = df.iloc[:, start:stop].to_json(
+                orient="records", lines=True, force_ascii=False, date_format="iso",
+            )
+            # 每行形如 {...}，去掉花括号后即为这一段列的片段
+            fields.append("%s")
+            columns.append([line[1:-1] for line in text.rstrip("\n").split("\n")])
+        start = stop
+    template = "{" + ",".join(fields) + "}\n"
+    return "".join(map(template.__mod__, zip(*columns)))
+
+
+def _iter_jsonl_chunks(
+    data: Any, chunk_size: int, num_workers: int,
+) -> Iterator[str]:
+    """按行分块 yield JSONL 文本，num_workers > 1 时多线程序列化但保持顺序。"""
+    if chunk_size <= 0:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+
+    if isinstance(data, pd.DataFrame):
+        chunks = (
+            data.iloc[start: start + chunk_size]
+            for start in range(0, len(data), chunk_size)
+        )
+        convert = _frame_to_jsonl
+    else:
+        chunks = iter(data.to_batches(max_chunksize=chunk_size))
+
+        def convert(batch: Any) -> str:
+            return _frame_to_jsonl(batch.to_pandas())
+
+    if num_workers <= 1:
+        for chunk in chunks:
+            yield convert(chunk)
+        return
+
+    # 有界窗口：最多 num_workers * 2 个分块在途，避免一次性序列化整张表
+    window = num_workers * 2
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending: deque = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(convert, chunk))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
 # ========================
 # Parquet 文件读写
 # ========================
@@ -12,13 +12,85 @@ multi_process
     可以真正实现并行计算。
     适合 CPU 密集型任务（如图像处理、数学计算、数据压缩等）。
 
+interpreter
+    子解释器（Python 3.14+ 的 InterpreterPoolExecutor）：每个 worker 有独立的
+    GIL，同进程内并行执行 CPU 密集型任务，免去进程间的 pickle / IPC。
+    自由线程构建（如 python3.13t，FREE_THREADED 为 True）上直接使用线程，
+    二者都不可用时回退到多进程。
+
+async
+    单线程事件循环驱动协程函数，并发数仅受 num_workers 限制（可达数千），
+    适合大量高延迟 I/O（如 HTTP 请求）。func 须为 ``async def`` 函数。
+
 提供 apply_parallel 函数，支持多线程/多进程并行处理，并保证结果顺序与输入一致。
+
+imap_parallel
+    apply_parallel 的流式版本：按需从输入迭代器取数、以有界窗口提交任务，
+    并逐个 yield 结果（可选保序 / 乱序），输入与输出都无需整体驻留内存。
+
+apply_reduce
+    map + reduce：每个任务在 worker 内把一整块元素的结果就地折叠，只把部分
+    聚合值传回主进程合并（如词频、直方图），不再回传海量逐元素结果。
+
+apply_sharded
+    列批模式：将 DataFrame / ndarray 一次性写入内存映射文件，worker 只接收
+    行区间并零拷贝地映射对应切片，func 以向量化方式处理整块数据。
+
+shared / get_shared
+    通过 ``shared=`` 将大型只读对象（模型、词表、查找表）每个 worker 只传一次，
+    func 内用 ``get_shared()`` 获取；fork 启动方式下直接写时复制继承，零序列化。
+
+remote
+    RemoteExecutor 通过 TCP 将任务分发给其他主机上的 worker 服务
+    （``MP_REMOTE_AUTHKEY=... python -m my_toolkit.mp --port 6000`` 启动），
+    worker 断连时自动把在途任务重新排队到其他 worker。持有密钥的一方可在
+    worker 上执行任意代码，须使用足够随机的密钥并只在可信网络中开放。
+
+Pipeline
+    多级流水线：每级（map / filter / batch）有独立的执行器类型与 worker 数，
+    级间以有界队列相连，上一级产出即可被下一级处理，CPU 与 I/O 阶段相互重叠。
+
+cache=
+    按 "函数 + 元素" 的稳定哈希缓存结果（内存 LRU 的 MemoryCache 或 sqlite
+    持久化的 DiskCache），重复运行时命中的元素不再提交执行。
+
+ParallelPool
+    可复用的执行器池。高频调用 apply_parallel 时，通过 ``pool=`` 参数挂载
+    同一个池，避免每次调用都重新创建线程 / 进程（process 模式下尤其昂贵）。
 """
 
 from __future__ import annotations
 
-import gc
+import argparse
+import asyncio
+import atexit
+import copy
+import functools
+import hashlib
+import heapq
+import inspect
+import itertools
+import math
+import mmap
+import multiprocessing
 import os
+import pickle
+import queue
+import shutil
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import types
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from collections.abc import Sequence as SequenceABC
+from contextlib import closing, contextmanager
+from itertools import islice
+from multiprocessing.connection import AuthenticationError, Client, Listener
 from typing import (
     Any,
     Callable,
@@ -27,14 +99,19 @@ from typing import (
     List,
     Literal,
     Optional,
+    Sequence,
+    Union,
 )
 from concurrent.futures import (
+    BrokenExecutor,
     ThreadPoolExecutor,
     ProcessPoolExecutor,
+    Executor,
     Future,
     as_completed,
 )
 
+from .benchmark import _compute_latency_stats
 from .logger import init_logger
 
 logger = init_logger(name=__name__)
@@ -54,6 +131,21 @@ def _get_pd():
     return _pd if _pd is not False else None
 
 
+# 延迟导入 numpy，仅 apply_sharded 需要
+_np = None
+
+
+def _get_np():
+    global _np
+    if _np is None:
+        try:
+            import numpy as np
+            _np = np
+        except ImportError:
+            _np = False
+    return _np if _np is not False else None
+
+
 try:
     from tqdm.auto import tqdm  # auto 可自动适配 notebook / terminal
 except ImportError:
@@ -62,19 +154,104 @@ except ImportError:
 # ---------------------------------------------------------------------------
 # 常量与默认配置
 # ---------------------------------------------------------------------------
-_VALID_METHODS = ("thread", "process")
+_VALID_METHODS = ("thread", "process", "interpreter", "async", "remote")
 
 _EXECUTOR_MAP = {
     "thread": ThreadPoolExecutor,
     "process": ProcessPoolExecutor,
 }
 
+# 自由线程构建（PEP 703，如 python3.13t）且运行时未重新启用 GIL 时，
+# 线程可以真正并行执行 Python 代码
+FREE_THREADED: bool = not getattr(sys, "_is_gil_enabled", lambda: True)()
+
+try:
+    from concurrent.futures import InterpreterPoolExecutor  # Python 3.14+
+except ImportError:
+    InterpreterPoolExecutor = None
+else:
+    _EXECUTOR_MAP["interpreter"] = InterpreterPoolExecutor
+
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """读取 cgroup (v2 / v1) 的 CPU 配额，返回可用核数；未设限时返回 ``None``。"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:  # cgroup v2: "<quota> <period>"
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:  # cgroup v1
+            quota_us = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period_us = int(f.read())
+        if quota_us > 0 and period_us > 0:
+            return quota_us / period_us
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    """当前进程实际可用的 CPU 数：综合 CPU 亲和性与 cgroup 配额（向上取整）。"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # 非 Linux 平台
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, -(-limit // 1)))
+    return int(cpus)
+
+
 NUM_WORKERS: int = int(
-    os.environ.get("NUM_WORKERS", min(os.cpu_count() or 1, 8))
+    os.environ.get("NUM_WORKERS", min(available_cpus(), 8))
+)
+
+# num_workers="auto" 的爬山调优参数：每轮最短测量时长、最多轮数、
+# 吞吐提升低于该比例时视为没有改善
+_TUNE_INTERVAL_SECONDS = 0.5
+_TUNE_MAX_ROUNDS = 12
+_TUNE_TOLERANCE = 0.05
+
+# apply_parallel_async 的默认并发数
+ASYNC_CONCURRENCY: int = int(os.environ.get("ASYNC_CONCURRENCY", 1000))
+
+# 滑动窗口的默认大小为 num_workers * _WINDOW_FACTOR，
+# 既保证 worker 不空闲，又避免一次性创建过多 Future 导致 OOM
+_WINDOW_FACTOR = 4
+
+# chunksize="auto" 时的探测参数：探测最多耗时 / 条数，以及每个任务的目标耗时
+_PROBE_MAX_SECONDS = 0.2
+_PROBE_MAX_ITEMS = 32
+_CHUNK_TARGET_SECONDS = 0.05
+
+# 进度汇报的默认最小刷新间隔（秒）：完成的元素先累加，到期才刷新进度条 /
+# 调用 progress_callback，避免高频微任务下逐条 update 占用主线程
+PROGRESS_INTERVAL: float = 0.1
+
+# cost= 装箱时单个任务最多包含 chunksize * 该倍数个元素，防止大量零代价元素挤进同一组
+_COST_GROUP_MAX_FACTOR = 4
+
+# stats 中判定慢任务（straggler）的阈值：执行耗时超过中位数的倍数，及最多列出的条数
+_STRAGGLER_FACTOR = 4.0
+_MAX_STRAGGLERS = 10
+
+_UNSET = object()  # 哨兵值，区分 "shared=None" 与 "未设置 shared"
+
+# apply_reduce 在总数未知时的默认块大小
+_REDUCE_CHUNKSIZE = 1024
+
+# 单个池允许的最大 worker 数，防止误传超大值耗尽系统资源
+MAX_POOL_WORKERS: int = int(
+    os.environ.get("MAX_POOL_WORKERS", max(32, (os.cpu_count() or 1) * 4))
 )
 
-# 分批提交的默认批次大小，防止一次性创建过多 Future 导致 OOM
-_DEFAULT_BATCH_SIZE = 5000
+# 模块级共享池的最大数量，超出时按 LRU 关闭最久未使用的池
+_MAX_SHARED_POOLS = 4
 
 
 # ---------------------------------------------------------------------------
@@ -125,180 +302,3452 @@ def _resolve_iterable(iterable: Any) -> tuple[list, int]:
     return items, len(items)
 
 
-def _chunked(seq: Any, size: int) -> Iterator[tuple[list, int]]:
-    """将序列按 size 分批 yield，避免一次性生成所有 Future。"""
-    for start in range(0, len(seq), size):
-        yield seq[start: start + size], start
+def _call_chunk(func: Callable, elements: Any) -> List[tuple[bool, Any]]:
+    """在 worker 中顺序处理一组元素，逐个捕获异常。
 
+    返回 ``(ok, value)`` 列表：成功时 value 为返回值，失败时为异常对象，
+    以便主进程对每个元素单独应用 error_policy。
+    """
+    outcomes: List[tuple[bool, Any]] = []
+    for elem in elements:
+        try:
+            outcomes.append((True, _call_func(func, elem)))
+        except Exception as exc:
+            outcomes.append((False, exc))
+    return outcomes
 
-# ---------------------------------------------------------------------------
-# 核心函数
-# ---------------------------------------------------------------------------
-def apply_parallel(
-    iterable: Iterable,
-    func: Callable,
-    method: Literal["thread", "process"] = "thread",
-    num_workers: int = NUM_WORKERS,
-    show_progress: bool = True,
-    total_num: Optional[int] = None,
-    error_policy: Literal["store", "raise", "ignore"] = "store",
-    progress_desc: Optional[str] = None,
-    batch_size: Optional[int] = None,
-) -> List[Any]:
-    """对 *iterable* 中的每个元素并行调用 *func*，返回与输入顺序严格一致的结果列表。
 
-    Parameters
-    ----------
-    iterable : Iterable
-        任意可迭代对象（列表、元组、生成器、``pandas.DataFrame`` 等）。
-        当传入 DataFrame 时，自动按行转为 ``dict`` 列表。
-    func : callable
-        对每个元素执行的函数。根据元素类型自动选择解包方式。
-    method : ``"thread"`` | ``"process"``, default ``"thread"``
-        并行方式。传入其他值将抛出 ``ValueError``。
-    num_workers : int, default ``NUM_WORKERS``
-    show_progress : bool, default ``True``
-    total_num : int | None, default ``None``
-    error_policy : ``"store"`` | ``"raise"`` | ``"ignore"``, default ``"store"``
-        任务异常处理策略：
-        - ``"store"``  — 将异常对象存入结果列表对应位置（默认，向后兼容）。
-        - ``"raise"``  — 遇到第一个异常立即取消剩余任务并抛出。
-        - ``"ignore"`` — 记录日志，结果位置填 ``None``。
-    progress_desc : str | None, default ``None``
-        自定义进度条描述文字。为 ``None`` 时使用默认格式。
-    batch_size : int | None, default ``None``
-        分批提交的批次大小。为 ``None`` 时，当任务数 > 10000 自动启用
-        (默认 5000)，否则一次性提交。设为 0 或负数表示禁用分批。
+def _call_timed(func: Callable, elements: Any) -> tuple[str, float, float, list]:
+    """``_call_chunk`` 的计时版本，返回 ``(worker 标识, 开始时间, 结束时间, outcomes)``。
 
-    Returns
-    -------
-    list
-        结果列表，第 *i* 个元素对应 ``iterable`` 中第 *i* 个输入。
+    使用 ``time.time()`` 以便与主进程的时间戳直接比较。
+    """
+    worker = f"{os.getpid()}/{threading.current_thread().name}"
+    start = time.time()
+    outcomes = _call_chunk(func, elements)
+    return worker, start, time.time(), outcomes
 
-    Raises
-    ------
-    ValueError
-        当 ``method`` 不是 ``"thread"`` 或 ``"process"`` 时。
-    RuntimeError
-        当 ``error_policy="raise"`` 且有任务抛出异常时（封装原始异常）。
 
-    Examples
-    --------
-    >>> from mp import apply_parallel
-    >>> results = apply_parallel(range(10), lambda x: x ** 2, method="thread")
-    >>> assert results == [i ** 2 for i in range(10)]
+# _StartClock 的槽位格式：(令牌, worker 端开始时刻 time.time())
+_CLOCK_SLOT = struct.Struct("<qd")
+
+
+def _call_clocked(path: str, slot: int, token: int, call: Callable, *args: Any) -> Any:
+    """在 worker 中先把开始时刻写入 path 的第 slot 个槽位，再执行 ``call(*args)``。"""
+    try:
+        with open(path, "r+b") as f:
+            f.seek(slot * _CLOCK_SLOT.size)
+            f.write(_CLOCK_SLOT.pack(token, time.time()))
+    except OSError:
+        pass  # 调用已结束、文件已删除（被放弃的任务迟到开始）
+    return call(*args)
+
+
+class _StartClock:
+    """task_timeout 的计时起点：由 worker 在真正开始执行任务时记录。
+
+    主进程创建一个临时文件（优先 /dev/shm）并以 mmap 读取，每个在途任务
+    占一个槽位，worker 开始执行时写入 ``(令牌, time.time())``。计时因此
+    不受任务在调用队列中排队、或共享池中其他调用占用 worker 的影响。
+    令牌每次提交递增，槽位复用后旧任务迟到的写入会被忽略。
     """
 
-    # ---- 1. 参数校验 -----------------------------------------------------
-    if method not in _VALID_METHODS:
+    def __init__(self, capacity: int) -> None:
+        fd, self.path = tempfile.mkstemp(
+            prefix="mp_clock_",
+            dir="/dev/shm" if os.path.isdir("/dev/shm") else None,
+        )
+        self._file = os.fdopen(fd, "r+b")
+        self._mm: Optional[mmap.mmap] = None
+        self._capacity = 0
+        self._free: List[int] = []
+        self._tokens = itertools.count(1)
+        self._grow(max(1, capacity))
+
+    def _grow(self, capacity: int) -> None:
+        size = capacity * _CLOCK_SLOT.size
+        self._file.truncate(size)
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self._free.extend(range(capacity - 1, self._capacity - 1, -1))
+        self._capacity = capacity
+
+    def assign(self) -> tuple[str, int, int]:
+        """分配槽位，返回随任务发给 worker 的 ``(路径, 槽位, 令牌)``。"""
+        if not self._free:
+            self._grow(self._capacity * 2)
+        slot = self._free.pop()
+        token = next(self._tokens)
+        _CLOCK_SLOT.pack_into(self._mm, slot * _CLOCK_SLOT.size, 0, 0.0)
+        return self.path, slot, token
+
+    def release(self, ticket: tuple[str, int, int]) -> None:
+        self._free.append(ticket[1])
+
+    def started(self, ticket: tuple[str, int, int]) -> Optional[float]:
+        """worker 开始执行该任务的时刻；尚未开始时返回 ``None``。"""
+        token, start = _CLOCK_SLOT.unpack_from(self._mm, ticket[1] * _CLOCK_SLOT.size)
+        return start if token == ticket[2] else None
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class _ChunkProbe:
+    """``chunksize="auto"`` 的探测：先经执行器串行运行 pending 开头的少量元素，
+    按 worker 端测得的单条耗时推算 chunksize。
+
+    探测任务与正式任务走同一个执行器（``_run_window`` 窗口为 1），因此
+    remote / shared / initializer / task_timeout / 限流的语义完全一致。
+    ``groups()`` 逐个产出单元素任务（超时只影响该元素本身），累计执行时间
+    达到 ``_PROBE_MAX_SECONDS`` 或探测满 ``_PROBE_MAX_ITEMS`` 条时停止；执行
+    时间取自 stats（以计时模式提交）中本次探测追加的记录，不含 IPC 开销。
+    """
+
+    def __init__(
+        self, items: Any, pending: Sequence[int], num_workers: int, stats: _TaskStats,
+    ) -> None:
+        self.items = items
+        self.pending = pending
+        self.num_workers = num_workers
+        self.stats = stats
+        self.probed = 0     # 已交给执行器的元素数（pending[:probed]）
+        self._mark = len(stats.records)
+
+    def _timed(self) -> tuple[int, float]:
+        """返回 ``(有计时记录的元素数, 累计执行秒数)``。"""
+        records = self.stats.records[self._mark:]
+        return sum(r[1] for r in records), sum(r[4] - r[3] for r in records)
+
+    def groups(self) -> Iterator[tuple[Sequence[int], list]]:
+        limit = min(_PROBE_MAX_ITEMS, len(self.pending))
+        while self.probed < limit:
+            if self.probed and self._timed()[1] >= _PROBE_MAX_SECONDS:
+                return
+            idx = self.pending[self.probed: self.probed + 1]
+            self.probed += 1
+            yield idx, [self.items[idx[0]]]
+
+    def chunksize(self) -> int:
+        """chunksize 使单个任务耗时约为 ``_CHUNK_TARGET_SECONDS``，同时不超过
+        ``剩余数 / (num_workers * 4)``，以保留足够的任务数做负载均衡。
+        有探测任务超时或在池层面失败时无从估计，保守地取 1。
+        """
+        timed, busy = self._timed()
+        if timed < self.probed:
+            chunksize = 1
+            per_item = math.nan
+        else:
+            per_item = busy / timed
+            remaining = len(self.pending) - self.probed
+            balance_cap = max(1, -(-remaining // (self.num_workers * 4)))
+            if per_item <= 0:
+                chunksize = balance_cap
+            else:
+                chunksize = max(1, min(int(_CHUNK_TARGET_SECONDS / per_item), balance_cap))
+        logger.info(
+            f"chunksize 探测 | 样本={self.probed}, 单条耗时={per_item * 1e3:.3f}ms, "
+            f"chunksize={chunksize}"
+        )
+        return chunksize
+
+
+def _chunked(
+    seq: Any, size: int, indices: Sequence[int],
+) -> Iterator[tuple[Sequence[int], list]]:
+    """将 indices 指向的元素按 size 切组，惰性 yield ``(下标序列, 元素组)``。
+
+    indices 为连续的 ``range`` 时直接对 seq 切片，否则逐个取元素。
+    """
+    for pos in range(0, len(indices), size):
+        idx = indices[pos: pos + size]
+        if isinstance(idx, range) and idx.step == 1:
+            yield idx, seq[idx.start: idx.stop]
+        else:
+            yield idx, [seq[i] for i in idx]
+
+
+def _cost_groups(
+    seq: Any, size: int, indices: Sequence[int], cost: Callable[[Any], float],
+) -> Iterator[tuple[Sequence[int], list]]:
+    """按 cost 从大到小排列 indices 指向的元素并分组（最长任务优先）。
+
+    size 为 1 时逐个 yield；否则按代价装箱：每组的目标总代价为
+    ``总代价 / ceil(元素数 / size)``，代价达到目标的大元素单独成组，其余按
+    降序贪心累加至目标（每组至多 ``size * _COST_GROUP_MAX_FACTOR`` 个元素）。
+    代价相同的元素保持输入顺序。
+    """
+    costs = sorted(
+        ((max(0.0, float(cost(seq[i]))), i) for i in indices),
+        key=lambda c: c[0],
+        reverse=True,
+    )
+    if size == 1:
+        for _, i in costs:
+            yield (i,), [seq[i]]
+        return
+
+    total = sum(c for c, _ in costs)
+    target = total / max(1, math.ceil(len(costs) / size))
+    max_len = size * _COST_GROUP_MAX_FACTOR
+    group: list[int] = []
+    acc = 0.0
+    for c, i in costs:
+        group.append(i)
+        acc += c
+        if acc >= target or len(group) >= max_len:
+            yield tuple(group), [seq[j] for j in group]
+            group, acc = [], 0.0
+    if group:
+        yield tuple(group), [seq[j] for j in group]
+
+
+def _iter_elements(iterable: Any) -> Iterator[Any]:
+    """惰性遍历输入；DataFrame 逐行转为 dict，而不一次性 to_dict。"""
+    pd = _get_pd()
+    if pd is not None and isinstance(iterable, pd.DataFrame):
+        columns = list(iterable.columns)
+        return (
+            dict(zip(columns, row))
+            for row in iterable.itertuples(index=False, name=None)
+        )
+    return iter(iterable)
+
+
+def _iter_groups(
+    elements: Iterator[Any], size: int,
+) -> Iterator[tuple[range, list]]:
+    """从迭代器中按 size 惰性切组，yield ``(下标区间, 元素列表)``。"""
+    start = 0
+    while True:
+        group = list(islice(elements, size))
+        if not group:
+            return
+        yield range(start, start + len(group)), group
+        start += len(group)
+
+
+_logged_fallbacks: set = set()
+
+
+def _resolve_method(method: str) -> str:
+    """将 ``method="interpreter"`` 解析为当前解释器上实际可用的后端。
+
+    - 自由线程构建 → ``"thread"``：线程已能并行，且无需任何序列化；
+    - 有 ``InterpreterPoolExecutor``（3.14+）→ ``"interpreter"``：每个 worker
+      是独立 GIL 的子解释器，同进程内并行，免去进程间 IPC；
+    - 否则回退到 ``"process"``。
+
+    其余 method 原样返回。
+    """
+    if method != "interpreter":
+        return method
+    if FREE_THREADED:
+        resolved = "thread"
+    elif InterpreterPoolExecutor is not None:
+        resolved = "interpreter"
+    else:
+        resolved = "process"
+    if resolved != method and resolved not in _logged_fallbacks:
+        _logged_fallbacks.add(resolved)
+        logger.info(f"method='interpreter' 在当前解释器上使用 {resolved!r} 后端")
+    return resolved
+
+
+def _validate_options(
+    method: str,
+    error_policy: str,
+    methods: tuple = _VALID_METHODS,
+) -> None:
+    """校验 apply_parallel / imap_parallel 共用的参数。"""
+    if method not in methods:
         raise ValueError(
-            f"method 参数仅支持 {_VALID_METHODS!r}，收到: {method!r}"
+            f"method 参数仅支持 {methods!r}，收到: {method!r}"
         )
     if error_policy not in ("store", "raise", "ignore"):
         raise ValueError(
             f"error_policy 参数仅支持 'store' / 'raise' / 'ignore'，收到: {error_policy!r}"
         )
 
-    # ---- 2. 物化可迭代对象 -----------------------------------------------
-    items, inferred_total = _resolve_iterable(iterable)
-    total_num = total_num or inferred_total
-
-    # 边界: 空任务直接返回
-    if total_num == 0:
-        return []
 
-    # 裁剪 num_workers 到合理范围
-    num_workers = max(1, min(num_workers, total_num))
+def _apply_error_policy(idx: int, exc: BaseException, error_policy: str) -> Any:
+    """记录失败任务，并按 error_policy 返回应填入结果位置的值。
 
-    # ---- 3. 决定是否分批提交 ---------------------------------------------
-    if batch_size is None:
-        # 超过 10000 条自动启用分批，防止 Future 过多占满内存
-        effective_batch = _DEFAULT_BATCH_SIZE if total_num > 10000 else total_num
-    elif batch_size <= 0:
-        effective_batch = total_num  # 禁用分批
-    else:
-        effective_batch = batch_size
+    - ``"store"``  → 返回异常对象本身
+    - ``"ignore"`` → 返回 ``None``
+    - ``"raise"``  → 抛出封装了原始异常的 ``RuntimeError``
+    """
+    logger.error(f"任务 #{idx} 执行失败: {exc}")
+    if error_policy == "raise":
+        raise RuntimeError(f"任务 #{idx} 执行失败: {exc}") from exc
+    if error_policy == "store":
+        return exc
+    return None
 
-    # ---- 4. 选择执行器 ---------------------------------------------------
-    executor_cls = _EXECUTOR_MAP[method]
 
-    # ---- 5. 进度条准备 ---------------------------------------------------
-    use_tqdm = show_progress and tqdm is not None
-    if show_progress and tqdm is None:
+def _make_pbar(show_progress: bool, total: Optional[int], desc: Optional[str]):
+    """创建 tqdm 进度条；未安装 tqdm 时给出提示并返回 ``None``。"""
+    if not show_progress:
+        return None
+    if tqdm is None:
         logger.warning(
             "show_progress=True 但 tqdm 未安装，将跳过进度条显示。"
             "可通过 `pip install tqdm` 安装。"
         )
+        return None
+    return tqdm(total=total, desc=desc, dynamic_ncols=True)
+
+
+class _Progress:
+    """聚合的进度汇报：累加完成数，按时间限流后刷新进度条与回调。
+
+    ``update()`` 只做计数，距上次刷新超过 ``interval`` 秒时才把增量一次性写入 tqdm，并以字典形式向 callback
+    报告 ``done`` / ``total`` / ``errors`` / ``elapsed`` / ``rate`` (items/s) /
+    ``eta`` (秒，total 未知时为 ``None``)。``close()`` 时强制做最后一次刷新。
+    """
+
+    def __init__(
+        self,
+        bar: Any,
+        total: Optional[int],
+        callback: Optional[Callable[[dict], None]],
+        interval: float,
+    ) -> None:
+        self.bar = bar
+        self.total = total
+        self.callback = callback
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self._unflushed = 0
+        self._start = self._last = time.monotonic()
+
+    def update(self, n: int = 1, errors: int = 0) -> None:
+        self.done += n
+        self.errors += errors
+        self._unflushed += n
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self.flush(now)
+
+    def snapshot(self, now: Optional[float] = None) -> dict:
+        """返回当前进度的机器可读快照。"""
+        elapsed = (now or time.monotonic()) - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = max(0.0, (self.total - self.done) / rate)
+        return {
+            "done": self.done,
+            "total": self.total,
+            "errors": self.errors,
+            "elapsed": elapsed,
+            "rate": rate,
+            "eta": eta,
+        }
+
+    def flush(self, now: Optional[float] = None) -> None:
+        self._last = now or time.monotonic()
+        if self.bar is not None and self._unflushed:
+            if self.errors:
+                self.bar.set_postfix(errors=self.errors, refresh=False)
+            self.bar.update(self._unflushed)
+        self._unflushed = 0
+        if self.callback is not None:
+            self.callback(self.snapshot(self._last))
+
+    def close(self) -> None:
+        self.flush()
+        if self.bar is not None:
+            self.bar.close()
 
+
+def _log_progress(stats: dict) -> None:
+    """``progress_callback="log"`` 时使用：每次刷新输出一行进度日志。"""
+    total = stats["total"]
+    done = f"{stats['done']}/{total}" if total is not None else str(stats["done"])
+    eta = f"{stats['eta']:.1f}s" if stats["eta"] is not None else "-"
     logger.info(
-        f"apply_parallel 启动 | method={method}, workers={num_workers}, "
-        f"total={total_num}, batch={effective_batch}, error_policy={error_policy}",
+        f"进度 {done} | {stats['rate']:.1f} it/s | ETA {eta} | 失败 {stats['errors']}"
     )
 
-    # ---- 6. 提交与收集 ---------------------------------------------------
-    results: list = [None] * total_num
-    error_count = 0
-    completed_count = 0
-    should_abort = False  # raise 策略下的中止标志
-
-    pbar = None
-    if use_tqdm:
-        pbar = tqdm(
-            total=total_num,
-            desc=progress_desc,
-            dynamic_ncols=True,
+
+def _make_progress(
+    show_progress: bool,
+    total: Optional[int],
+    desc: Optional[str],
+    callback: Union[Callable[[dict], None], Literal["log"], None] = None,
+    interval: float = PROGRESS_INTERVAL,
+) -> Optional[_Progress]:
+    """创建进度汇报器；既不显示进度条也没有回调时返回 ``None``。"""
+    if callback == "log":
+        callback = _log_progress
+    elif callback is not None and not callable(callback):
+        raise ValueError(
+            f"progress_callback 须为可调用对象或 'log'，收到: {callback!r}"
         )
+    bar = _make_pbar(show_progress, total, desc)
+    if bar is None and callback is None:
+        return None
+    return _Progress(bar, total, callback, interval)
+
 
+def _submit_task(
+    executor: Executor,
+    func: Callable,
+    group: list,
+    stats: Optional[_TaskStats] = None,
+    ticket: Optional[tuple[str, int, int]] = None,
+) -> Future:
+    """提交一个任务：单元素直接调用，多元素走 _call_chunk；收集 stats 时走 _call_timed。
+
+    传入 ticket（:meth:`_StartClock.assign`）时经 _call_clocked 记录开始时刻。
+    """
+    if stats is not None:
+        call, args = _call_timed, (func, group)
+    elif len(group) == 1:
+        call, args = _call_func, (func, group[0])
+    else:
+        call, args = _call_chunk, (func, group)
+    if ticket is not None:
+        call, args = _call_clocked, (*ticket, call, *args)
+    fut = executor.submit(call, *args)
+    if stats is not None:
+        stats.submitted[fut] = time.time()
+    return fut
+
+
+def _task_outcomes(
+    future: Future,
+    indices: Sequence[int],
+    stats: Optional[_TaskStats] = None,
+) -> List[tuple[bool, Any]]:
+    """将 _submit_task 返回的 Future 展开为逐元素的 ``(ok, value)`` 列表。"""
+    n = len(indices)
     try:
-        with executor_cls(max_workers=num_workers) as executor:
-            for chunk, chunk_start in _chunked(items, effective_batch):
-                if should_abort:
-                    break
+        value = future.result()
+    except Exception as exc:
+        # 单条任务失败，或整组任务在池层面失败（如序列化错误）
+        if stats is not None:
+            stats.submitted.pop(future, None)
+        return [(False, exc)] * n
+    if stats is not None:
+        return stats.record(future, indices, value)
+    return [(True, value)] if n == 1 else value
 
-                # 提交当前批次
-                future_to_idx: dict[Future, int] = {}
-                for local_idx, elem in enumerate(chunk):
-                    global_idx = chunk_start + local_idx
-                    fut = executor.submit(_call_func, func, elem)
-                    future_to_idx[fut] = global_idx
 
-                # 收集当前批次结果
-                for future in as_completed(future_to_idx):
-                    idx = future_to_idx[future]
-                    try:
-                        results[idx] = future.result()
-                    except Exception as exc:
-                        error_count += 1
-                        logger.error(f"任务 #{idx} 执行失败: {exc}")
-
-                        if error_policy == "raise":
-                            should_abort = True
-                            # 取消当前批次尚未开始的任务
-                            for f in future_to_idx:
-                                f.cancel()
-                            raise RuntimeError(
-                                f"任务 #{idx} 执行失败: {exc}"
-                            ) from exc
-                        elif error_policy == "store":
-                            results[idx] = exc
-                        # "ignore" → results[idx] 保持 None
-
-                    completed_count += 1
-                    if pbar is not None:
-                        pbar.update(1)
-
-                # 批次间释放 Future 引用，允许 GC 回收
-                del future_to_idx
-                gc.collect()
+class _TaskStats:
+    """收集每个任务的提交 / 开始 / 结束 / 收取时间戳，汇总为 stats 报告。
+
+    - 排队等待 = 开始 - 提交：窗口内等待空闲 worker 及 IPC 的时间
+    - 执行     = 结束 - 开始：func 本身的耗时
+    - 收取延迟 = 主线程取到结果 - 结束：主线程处理不过来时会升高
+    """
+
+    def __init__(self, num_workers: int) -> None:
+        self.num_workers = num_workers
+        self.submitted: dict[Future, float] = {}
+        # (首个下标, 元素数, 提交, 开始, 结束, 收取, worker)
+        self.records: list[tuple] = []
+        self._t0 = time.time()
+
+    def record(self, future: Future, indices: Sequence[int], value: tuple) -> list:
+        worker, start, end, outcomes = value
+        submitted = self.submitted.pop(future, start)
+        self.records.append(
+            (indices[0], len(indices), submitted, start, end, time.time(), worker)
+        )
+        return outcomes
+
+    def report(self) -> dict[str, Any]:
+        """汇总为报告字典，耗时单位为毫秒（busy / wall 为秒）。"""
+        records = self.records
+        wall = max((r[5] for r in records), default=self._t0) - self._t0
+
+        def _ms(values: Iterable[float]) -> dict[str, float]:
+            return _compute_latency_stats(sorted(max(0.0, v) * 1000 for v in values))
+
+        execution = _ms(r[4] - r[3] for r in records)
+        queue_wait = _ms(r[3] - r[2] for r in records)
+        collect_lag = _ms(r[5] - r[4] for r in records)
+
+        busy: dict[str, float] = {}
+        task_counts: dict[str, int] = {}
+        for r in records:
+            busy[r[6]] = busy.get(r[6], 0.0) + (r[4] - r[3])
+            task_counts[r[6]] = task_counts.get(r[6], 0) + 1
+        workers = {
+            w: {
+                "tasks": task_counts[w],
+                "busy": busy[w],
+                "busy_fraction": busy[w] / wall if wall > 0 else 0.0,
+            }
+            for w in busy
+        }
+        utilization = (
+            sum(busy.values()) / (self.num_workers * wall) if wall > 0 else 0.0
+        )
+
+        threshold = execution["p50"] * _STRAGGLER_FACTOR / 1000
+        slow = sorted(
+            (r for r in records if r[4] - r[3] > threshold > 0),
+            key=lambda r: r[4] - r[3],
+            reverse=True,
+        )
+        stragglers = [
+            {"index": r[0], "items": r[1], "exec_ms": (r[4] - r[3]) * 1000, "worker": r[6]}
+            for r in slow[:_MAX_STRAGGLERS]
+        ]
+
+        # 粗略判断瓶颈：worker 基本跑满 → func；主线程收取延迟超过执行耗时
+        # → 主线程；否则时间主要花在调度 / 序列化 / IPC 上 → pool
+        if utilization >= 0.8:
+            bottleneck = "func"
+        elif collect_lag["avg"] > execution["avg"]:
+            bottleneck = "main_thread"
+        else:
+            bottleneck = "pool"
+
+        return {
+            "tasks": len(records),
+            "items": sum(r[1] for r in records),
+            "wall": wall,
+            "execution_ms": execution,
+            "queue_wait_ms": queue_wait,
+            "collect_lag_ms": collect_lag,
+            "total_ms": _ms(r[5] - r[2] for r in records),
+            "workers": workers,
+            "utilization": utilization,
+            "stragglers": stragglers,
+            "bottleneck": bottleneck,
+        }
+
+
+class _RetryQueue:
+    """失败元素的延迟重试队列。
 
+    失败的元素按退避时长进入最小堆，等待期间不占用任何 worker（不在 worker
+    内 sleep），到期后由 ``_run_window`` 作为单元素任务优先重新提交。
+    ``attempts`` 只记录发生过重试的元素的累计执行次数。
+    """
+
+    def __init__(
+        self,
+        items: Sequence,
+        retries: int,
+        backoff: Union[float, Callable[[int], float]],
+        retry_on: Union[type, tuple],
+    ) -> None:
+        self.items = items
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_on = retry_on
+        self.attempts: dict[int, int] = {}
+        self._heap: list[tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, idx: int, exc: BaseException) -> bool:
+        """若元素还可重试则排入队列并返回 ``True``，否则返回 ``False``。"""
+        attempt = self.attempts.get(idx, 1)
+        if attempt > self.retries or not isinstance(exc, self.retry_on):
+            return False
+        self.attempts[idx] = attempt + 1
+        if callable(self.backoff):
+            delay = self.backoff(attempt)
+        else:
+            delay = self.backoff * 2 ** (attempt - 1)
+        heapq.heappush(self._heap, (time.monotonic() + delay, idx))
+        logger.debug(f"任务 #{idx} 第 {attempt} 次执行失败，{delay:.2f}s 后重试: {exc}")
+        return True
+
+    def pop_ready(self, limit: int) -> Iterator[tuple[Sequence[int], list]]:
+        """取出至多 limit 个已到期的元素，yield ``((下标,), [元素])``。"""
+        now = time.monotonic()
+        while limit > 0 and self._heap and self._heap[0][0] <= now:
+            _, idx = heapq.heappop(self._heap)
+            limit -= 1
+            yield (idx,), [self.items[idx]]
+
+    def wait_time(self) -> Optional[float]:
+        """距最早一个元素到期的秒数；队列为空时返回 ``None``。"""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+
+class _Throttle:
+    """调度器内的限流器：令牌桶限制提交速率，并按 key 限制在途任务数。
+
+    - 令牌桶：容量为 burst，每秒补充 rate 个；每个任务按元素数消耗令牌
+      （apply_parallel 限流时 chunksize 固定为 1；更大的组允许透支，以免
+      超过 burst 的组永远等不到）。
+    - 按 key 并发：``key_func(元素)`` 得到 key，同一 key 的在途任务数不超过
+      ``max_per_key``（int 对所有 key 生效；dict 只限制其中列出的 key）。
+    """
+
+    def __init__(
+        self,
+        rate_limit: Union[float, tuple[float, int], None],
+        key_func: Optional[Callable[[Any], Any]],
+        max_per_key: Union[int, dict, None],
+    ) -> None:
+        rate, burst = (
+            rate_limit if isinstance(rate_limit, tuple) else (rate_limit, None)
+        )
+        if rate is not None and rate <= 0:
+            raise ValueError(f"rate_limit 须为正数，收到: {rate_limit!r}")
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate or 1)))
+        self.tokens = self.capacity
+        self._stamp = time.monotonic()
+        self.key_func = key_func
+        self.max_per_key = max_per_key
+        self.active: dict[Any, int] = {}
+
+    def key_of(self, group: list) -> Any:
+        return self.key_func(group[0]) if self.key_func is not None else None
+
+    def key_ready(self, key: Any) -> bool:
+        if self.key_func is None or self.max_per_key is None:
+            return True
+        if isinstance(self.max_per_key, dict):
+            cap = self.max_per_key.get(key)
+            if cap is None:
+                return True
+        else:
+            cap = self.max_per_key
+        return self.active.get(key, 0) < cap
+
+    def take(self, n: int) -> float:
+        """尝试取 n 个令牌：成功返回 0，否则返回还需等待的秒数（不扣令牌）。"""
+        if self.rate is None:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        need = min(n, self.capacity)
+        if self.tokens >= need:
+            self.tokens -= n
+            return 0.0
+        return (need - self.tokens) / self.rate
+
+    def acquire(self, key: Any) -> None:
+        if self.key_func is not None:
+            self.active[key] = self.active.get(key, 0) + 1
+
+    def release(self, key: Any) -> None:
+        if self.key_func is not None:
+            self.active[key] -= 1
+
+
+def _expired_future(seconds: float) -> Future:
+    """构造一个以 ``TimeoutError`` 结束的 Future，代表超时的任务。"""
+    fut: Future = Future()
+    fut.set_exception(TimeoutError(f"任务执行超过 {seconds}s，已放弃"))
+    return fut
+
+
+def _run_window(
+    handle: _ExecutorHandle,
+    func: Callable,
+    groups: Iterator[tuple[Sequence[int], list]],
+    window: int,
+    tuner: Optional[_ConcurrencyTuner] = None,
+    task_timeout: Optional[float] = None,
+    recycle: bool = False,
+    retry_queue: Optional[_RetryQueue] = None,
+    stats: Optional[_TaskStats] = None,
+    throttle: Optional[_Throttle] = None,
+) -> Iterator[tuple[Sequence[int], Future]]:
+    """滑动窗口调度：始终保持至多 window 个任务在途，按完成顺序 yield。
+
+    每个 Future 完成时由回调放入队列，主线程取出一个即补交一个新任务，
+    不存在批次间的屏障，也不需要每轮对全部在途 Future 调用 ``wait``。
+    传入 tuner 时窗口大小改由 ``tuner.limit`` 动态决定。
+    yield ``(下标序列, Future)``；生成器关闭时取消未开始的任务。
+
+    设置 task_timeout 时，主线程定期检查开始执行超过该时长的任务，将其以
+    ``TimeoutError`` yield 出去。开始时刻由 worker 写入 :class:`_StartClock`
+    （remote 模式取调度线程把任务发往远程 worker 的时刻），排队中的任务
+    不计时。recycle 为 ``True``（process 模式）且执行器归本次调用所有时，
+    随即通过 ``handle.recycle()`` 终止卡死的 worker 并换上新池，其余在途
+    任务重新提交；否则（thread 模式，或挂载的 ParallelPool）仅放弃该任务，
+    worker 继续占用直到返回，不影响共用该池的其他调用。
+
+    传入 retry_queue 时，调用方在处理 yield 出的结果时可把失败元素排入该
+    队列；到期的重试元素优先于新任务提交，在途任务为空但仍有待重试元素时
+    等待其到期，而不是结束调度。传入 stats 时任务以计时模式提交。
+
+    传入 throttle 时，每个任务提交前须通过限流：key 已达并发上限的任务组
+    暂存在 held 中（至多 window 个），由后续 key 未满的任务先行提交；令牌
+    不足时停止提交，等待到令牌补足的时刻。
+    """
+    done_queue: queue.SimpleQueue = queue.SimpleQueue()
+    # 在途任务：Future → (下标序列, 元素组, 限流 key)，元素组用于换池后重新提交
+    in_flight: dict[Future, tuple[Sequence[int], list, Any]] = {}
+    clock: Optional[_StartClock] = None
+    if task_timeout is not None and not isinstance(handle.executor, RemoteExecutor):
+        clock = _StartClock(window)
+    tickets: dict[Future, tuple[str, int, int]] = {}  # 在途任务 → 计时槽位
+    started: dict[Future, float] = {}  # remote 模式：已发往 worker 的任务 → 开始时刻
+    held: deque = deque()  # 因限流暂缓提交的 (下标序列, 元素组, key)
+    poll = None if task_timeout is None else min(task_timeout / 4, 0.5)
+    exhausted = False
+
+    def _submit(indices: Sequence[int], group: list, key: Any = None) -> None:
+        ticket = clock.assign() if clock is not None else None
+        fut = _submit_task(handle.executor, func, group, stats, ticket)
+        if ticket is not None:
+            tickets[fut] = ticket
+        in_flight[fut] = (indices, group, key)
+        if throttle is not None:
+            throttle.acquire(key)
+        fut.add_done_callback(done_queue.put)
+
+    def _drop(fut: Future) -> Optional[tuple]:
+        """把 fut 移出在途集合并释放其计时槽位，返回其在途记录。"""
+        ticket = tickets.pop(fut, None)
+        if ticket is not None:
+            clock.release(ticket)
+        started.pop(fut, None)
+        return in_flight.pop(fut, None)
+
+    def _start_of(fut: Future) -> Optional[float]:
+        if clock is not None:
+            return clock.started(tickets[fut])
+        if fut.running():
+            return started.setdefault(fut, time.time())
+        return None
+
+    def _finish(entry: tuple) -> None:
+        if throttle is not None:
+            throttle.release(entry[2])
+
+    def _fill_throttled(limit: int) -> Optional[float]:
+        """限流模式下补充任务；令牌不足时返回需等待的秒数，否则返回 None。"""
+        nonlocal exhausted
+        if retry_queue is not None:
+            for indices, group in retry_queue.pop_ready(window):
+                held.append((indices, group, throttle.key_of(group)))
+        while len(in_flight) < limit:
+            # 优先提交暂缓队列中 key 未满的任务组，再从输入拉取新任务
+            pos = next(
+                (i for i, h in enumerate(held) if throttle.key_ready(h[2])), None
+            )
+            if pos is not None:
+                nxt = held[pos]
+                del held[pos]
+            else:
+                if exhausted or len(held) >= window:
+                    return None
+                pulled = next(groups, None)
+                if pulled is None:
+                    exhausted = True
+                    return None
+                nxt = (*pulled, throttle.key_of(pulled[1]))
+                if not throttle.key_ready(nxt[2]):
+                    held.append(nxt)
+                    continue
+            wait = throttle.take(len(nxt[1]))
+            if wait > 0:
+                held.appendleft(nxt)
+                return wait
+            _submit(*nxt)
+        return None
+
+    try:
+        while True:
+            limit = tuner.limit if tuner is not None else window
+            throttle_wait = None
+            if throttle is not None:
+                throttle_wait = _fill_throttled(limit)
+            else:
+                if retry_queue is not None:
+                    for nxt in retry_queue.pop_ready(limit - len(in_flight)):
+                        _submit(*nxt)
+                while not exhausted and len(in_flight) < limit:
+                    nxt = next(groups, None)
+                    if nxt is None:
+                        exhausted = True
+                        break
+                    _submit(*nxt)
+
+            retry_wait = retry_queue.wait_time() if retry_queue is not None else None
+            waits = [w for w in (retry_wait, throttle_wait) if w is not None]
+            if not in_flight:
+                if not waits and not held:
+                    return
+                time.sleep(min(waits, default=0))
+                continue
+            timeout = poll
+            # 窗口已满时到期的重试 / 令牌也无法使用，只需等待在途任务完成
+            if waits and len(in_flight) < limit:
+                timeout = min(waits) if timeout is None else min(timeout, *waits)
+            try:
+                fut = done_queue.get(timeout=timeout)
+            except queue.Empty:
+                fut = None
+
+            if fut is not None:
+                entry = _drop(fut)
+                if entry is None:
+                    continue  # 已判定超时或随旧池被替换的任务，忽略其迟到的结果
+                _finish(entry)
+                indices = entry[0]
+                if tuner is not None:
+                    tuner.observe(len(indices))
+                yield indices, fut
+            if task_timeout is None:
+                continue
+
+            # ---- 超时检查：以 worker 开始执行的时刻作为开始时间 ----
+            now = time.time()
+            expired = []
+            for f in in_flight:
+                if f.done():
+                    continue
+                t0 = _start_of(f)
+                if t0 is not None and now - t0 > task_timeout:
+                    expired.append(f)
+            if not expired:
+                continue
+
+            for f in expired:
+                entry = _drop(f)
+                _finish(entry)
+                yield entry[0], _expired_future(task_timeout)
+            if recycle and handle.owned:
+                logger.warning(
+                    f"{len(expired)} 个任务超过 {task_timeout}s 未完成，"
+                    f"终止卡死的 worker 并重建进程池"
+                )
+                survivors = [_drop(f) for f in list(in_flight)]
+                for entry in survivors:
+                    _finish(entry)
+                handle.recycle()
+                for entry in survivors:
+                    _submit(*entry)
+            else:
+                handle.abandoned = True
+                reason = (
+                    "执行器由 ParallelPool 共用，不终止其 worker" if recycle
+                    else "线程无法强制终止"
+                )
+                logger.warning(
+                    f"{len(expired)} 个任务超过 {task_timeout}s 未完成，已放弃"
+                    f"（{reason}，将继续占用 worker）"
+                )
     finally:
-        if pbar is not None:
-            pbar.close()
+        for fut in in_flight:
+            fut.cancel()
+        if clock is not None:
+            clock.close()
+
+
+# 已调优的并发数缓存：{(method, _tune_key(func)): num_workers}
+_autotune_cache: dict[tuple[str, Any], int] = {}
+
+
+def _func_key(func: Callable) -> str:
+    """函数的稳定标识（模块 + 限定名），用于日志与断点校验。"""
+    module = getattr(func, "__module__", None) or ""
+    name = getattr(func, "__qualname__", None) or type(func).__qualname__
+    return f"{module}.{name}"
+
+
+def _tune_key(func: Callable) -> Any:
+    """调优缓存键中的函数部分：取函数的代码对象，同一模块中的不同 lambda
+    互不影响；partial / 绑定方法取其底层函数，没有代码对象时退回 ``_func_key``。
+    """
+    while isinstance(func, functools.partial):
+        func = func.func
+    func = getattr(func, "__func__", func)
+    code = getattr(func, "__code__", None)
+    return code if code is not None else _func_key(func)
+
+
+class _ConcurrencyTuner:
+    """基于吞吐（items/s）的爬山法并发调优器。
+
+    以 ``limit`` 作为在途任务上限（即实际并发数）运行，每轮至少测量
+    ``_TUNE_INTERVAL_SECONDS`` 且完成 ``limit`` 个元素后比较吞吐：有提升则
+    沿当前方向继续（向上探索时步长翻倍），否则回到最优值、反向并减半步长。
+    步长降为 0、越界或超过 ``_TUNE_MAX_ROUNDS`` 轮后固定为最优值并写入缓存。
+    """
+
+    def __init__(
+        self, key: tuple[str, Any], name: str, start: int, lower: int, upper: int,
+    ) -> None:
+        self.key = key
+        self.name = name
+        self.lower, self.upper = lower, upper
+        self.limit = self.best = max(lower, min(start, upper))
+        self.best_rate: Optional[float] = None
+        self.step = max(1, self.limit)
+        self.direction = 1
+        self.reversed = False
+        self.rounds = 0
+        self.finished = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self._t0 = time.perf_counter()
+        self._count = 0
+
+    def observe(self, n: int) -> None:
+        """记录 n 个元素完成；满足一轮测量条件时调整 ``limit``。"""
+        if self.finished:
+            return
+        self._count += n
+        elapsed = time.perf_counter() - self._t0
+        if elapsed < _TUNE_INTERVAL_SECONDS or self._count < self.limit:
+            return
+        self._advance(self._count / elapsed)
+        self._reset()
+
+    def _advance(self, rate: float) -> None:
+        self.rounds += 1
+        logger.debug(f"autotune {self.name}: workers={self.limit}, {rate:.1f} items/s")
+        if self.best_rate is None or rate > self.best_rate * (1 + _TUNE_TOLERANCE):
+            self.best_rate, self.best = rate, self.limit
+            if self.direction > 0 and not self.reversed and self.rounds > 1:
+                self.step *= 2
+        else:
+            self.direction = -self.direction
+            self.reversed = True
+            self.step //= 2
+
+        nxt = max(self.lower, min(self.upper, self.best + self.direction * self.step))
+        if self.step == 0 or nxt == self.best or self.rounds >= _TUNE_MAX_ROUNDS:
+            self.finish()
+        else:
+            self.limit = nxt
+
+    def finish(self) -> None:
+        """固定为当前最优并发数，记录日志并写入缓存。"""
+        if self.finished:
+            return
+        self.finished = True
+        self.limit = self.best
+        if self.best_rate is None:
+            return  # 任务过少，尚未完成任何一轮测量，不缓存
+        _autotune_cache[self.key] = self.best
+        logger.info(
+            f"autotune {self.name} ({self.key[0]}): 选定 num_workers={self.best}, "
+            f"约 {self.best_rate:.1f} items/s（{self.rounds} 轮）"
+        )
+
+
+# ---------------------------------------------------------------------------
+# worker 共享只读对象（shared= / get_shared）
+# ---------------------------------------------------------------------------
+# fork 模式下待子进程继承的对象：{token: payload}，在执行器存续期间保留
+_fork_payloads: dict[int, Any] = {}
+_fork_tokens = itertools.count()
+
+# worker 内的共享对象。线程池的 worker 与调用方同进程，故按线程隔离
+_worker_state = threading.local()
+
+
+def _worker_init(
+    shared_spec: Optional[tuple],
+    initializer: Optional[Callable],
+    initargs: tuple,
+) -> None:
+    """worker 启动钩子：先安装共享对象，再调用用户的 initializer。"""
+    if shared_spec is not None:
+        kind, value = shared_spec
+        # fork: 从继承自父进程的内存中取出对象；其他: 对象本身已随 initargs 传入
+        _worker_state.shared = _fork_payloads[value] if kind == "fork" else value
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _executor_kwargs(
+    method: str,
+    num_workers: int,
+    shared: Any,
+    initializer: Optional[Callable],
+    initargs: tuple,
+    max_tasks_per_child: Optional[int] = None,
+) -> tuple[dict, Optional[int]]:
+    """组装执行器构造参数，返回 ``(kwargs, fork_token)``。
+
+    process 模式且启动方式为 fork 时，共享对象登记在 ``_fork_payloads`` 中，
+    子进程通过写时复制继承，仅传递一个整数 token；否则对象随 initargs
+    每个 worker pickle 一次。调用方须在执行器关闭后释放 fork_token。
+
+    ``max_tasks_per_child`` 与 fork 不兼容，此时改用 forkserver / spawn 启动。
+    """
+    kwargs: dict = {"max_workers": num_workers}
+    start_method = multiprocessing.get_start_method()
+    if max_tasks_per_child is not None:
+        if method != "process":
+            raise ValueError("max_tasks_per_child 仅支持 method='process'")
+        if sys.version_info < (3, 11):
+            raise ValueError("max_tasks_per_child 需要 Python 3.11+")
+        if start_method == "fork":
+            start_method = (
+                "forkserver"
+                if "forkserver" in multiprocessing.get_all_start_methods()
+                else "spawn"
+            )
+        kwargs["max_tasks_per_child"] = max_tasks_per_child
+        kwargs["mp_context"] = multiprocessing.get_context(start_method)
+
+    if shared is _UNSET:
+        if initializer is not None:
+            kwargs["initializer"] = _worker_init
+            kwargs["initargs"] = (None, initializer, initargs)
+        return kwargs, None
+
+    token = None
+    if method == "process" and start_method == "fork":
+        token = next(_fork_tokens)
+        _fork_payloads[token] = shared
+        shared_spec = ("fork", token)
+    else:
+        shared_spec = ("value", shared)
+    kwargs["initializer"] = _worker_init
+    kwargs["initargs"] = (shared_spec, initializer, initargs)
+    return kwargs, token
+
+
+def _terminate_executor(executor: Executor) -> None:
+    """强制关闭执行器：process 模式下直接终止全部 worker 进程。
+
+    线程无法被强制终止，thread 模式下仅停止接收新任务，卡住的线程会被放弃。
+    """
+    processes = getattr(executor, "_processes", None) or {}
+    for proc in list(processes.values()):
+        proc.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _ExecutorHandle:
+    """持有当前执行器，并支持在 worker 卡死时整体替换。
+
+    ``recycle()`` 终止当前执行器的全部 worker 并换上新的执行器，仅用于
+    本次调用自建的执行器（``owned``）；挂载的 ParallelPool 可能正被其他
+    调用使用，不得回收。``abandoned`` 为 ``True`` 时（有任务被放弃）关闭时
+    不再等待。
+    """
+
+    def __init__(self, factory: Callable[[], Executor], owned: bool = True) -> None:
+        self._factory = factory
+        self.owned = owned
+        self.executor = factory()
+        self.abandoned = False
+
+    def recycle(self) -> Executor:
+        if not self.owned:
+            raise RuntimeError("不能回收非本次调用创建的执行器")
+        _terminate_executor(self.executor)
+        self.executor = self._factory()
+        return self.executor
+
+
+def get_shared() -> Any:
+    """在 func 内获取通过 ``shared=`` 下发给当前 worker 的共享对象。
+
+    Raises
+    ------
+    LookupError
+        当前 worker 未设置共享对象时。
+    """
+    try:
+        return _worker_state.shared
+    except AttributeError:
+        raise LookupError(
+            "当前 worker 没有共享对象，请在 apply_parallel / ParallelPool 中传入 shared="
+        ) from None
+
+
+@contextmanager
+def _executor_context(
+    pool: Optional[ParallelPool],
+    method: str,
+    num_workers: int,
+    shared: Any = _UNSET,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+    max_tasks_per_child: Optional[int] = None,
+) -> Iterator[_ExecutorHandle]:
+    """yield 执行器句柄：挂载的池调用结束后不关闭，否则新建并在退出时关闭。"""
+    if pool is not None:
+        if shared is not _UNSET or initializer is not None or max_tasks_per_child:
+            raise ValueError(
+                "使用 pool 时 shared / initializer / max_tasks_per_child "
+                "须在创建 ParallelPool 时指定"
+            )
+        while not pool._acquire():
+            # get_pool 返回后、开始使用前被 LRU 淘汰的共享池：换用同规格的新池
+            if pool._shared_key is None:
+                raise RuntimeError("ParallelPool 已关闭，无法继续提交任务")
+            pool = get_pool(*pool._shared_key)
+        try:
+            yield _ExecutorHandle(lambda: pool.executor, owned=False)
+        finally:
+            pool._release()
+        return
+
+    kwargs, token = _executor_kwargs(
+        method, num_workers, shared, initializer, initargs, max_tasks_per_child,
+    )
+    handle = None
+    try:
+        handle = _ExecutorHandle(lambda: _EXECUTOR_MAP[method](**kwargs))
+        yield handle
+    finally:
+        if handle is not None:
+            handle.executor.shutdown(wait=not handle.abandoned)
+        _fork_payloads.pop(token, None)
+
+
+def _warmup_task(delay: float) -> int:
+    """预热任务：短暂占用 worker，确保每个 worker 都被真正创建。"""
+    time.sleep(delay)
+    return os.getpid()
+
+
+# ---------------------------------------------------------------------------
+# 断点续跑（checkpoint=）
+# ---------------------------------------------------------------------------
+class _Checkpoint:
+    """apply_parallel 的断点文件：逐帧追加的 pickle 日志。
+
+    首帧为头部 ``{"checkpoint": 函数全名, "total": 总数, "inputs": 输入指纹}``，
+    其后每帧为一条 ``(下标, 结果)``。续跑时三者须与本次一致，否则抛出
+    ``ValueError``，避免把另一份输入或另一个函数的结果当作本次结果返回。结果在 ``add`` 时即序列化（无法 pickle 的结果
+    记一条警告后跳过，续跑时重新执行），距上次落盘超过 interval 秒时批量
+    追加。进程在写入中途崩溃会留下不完整的末帧，``load`` 时将其截掉。
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        total: int,
+        key: str,
+        inputs: Optional[str],
+        interval: float,
+    ) -> None:
+        self.path = path
+        self.total = total
+        self.key = key
+        self.inputs = inputs
+        self.interval = interval
+        self._buffer: List[bytes] = []
+        self._last_flush = time.monotonic()
+        self._warned = False
+
+    def _append(self, frame: bytes) -> None:
+        with open(self.path, "ab") as f:
+            f.write(frame)
+            f.flush()
+
+    def load(self) -> dict[int, Any]:
+        """读取已完成的结果；文件不存在时写入头部并返回空字典。"""
+        if not os.path.exists(self.path):
+            self._append(pickle.dumps(
+                {"checkpoint": self.key, "total": self.total, "inputs": self.inputs}
+            ))
+            return {}
+        done: dict[int, Any] = {}
+        with open(self.path, "rb") as f:
+            try:
+                header = pickle.load(f)
+            except Exception:
+                header = None
+            if not isinstance(header, dict) or "total" not in header:
+                raise ValueError(f"{self.path} 不是 apply_parallel 的断点文件，请确认路径或删除该文件")
+            good = f.tell()
+            while True:
+                try:
+                    idx, value = pickle.load(f)
+                except EOFError:
+                    if f.tell() > good:
+                        logger.warning(f"断点文件 {self.path} 末尾不完整，已截断")
+                    break
+                except Exception as exc:
+                    # 写入中途崩溃留下的不完整末帧：截掉，从最后一个完整帧续写
+                    logger.warning(f"断点文件 {self.path} 末尾不完整（{exc!r}），已截断")
+                    break
+                done[idx] = value
+                good = f.tell()
+        if os.path.getsize(self.path) > good:
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+        if header.get("total") != self.total:
+            raise ValueError(
+                f"断点文件 {self.path} 记录的任务数为 {header.get('total')}，"
+                f"与本次的 {self.total} 不一致，请确认输入或删除该文件"
+            )
+        if header.get("checkpoint") != self.key:
+            raise ValueError(
+                f"断点文件 {self.path} 由 {header.get('checkpoint')} 生成，"
+                f"与本次的函数 {self.key} 不一致，请确认函数或删除该文件"
+            )
+        recorded = header.get("inputs")
+        if recorded is None or self.inputs is None:
+            logger.warning(f"输入含无法 pickle 的元素，续跑断点 {self.path} 时不校验输入")
+        elif recorded != self.inputs:
+            raise ValueError(
+                f"断点文件 {self.path} 记录的输入与本次不一致，请确认输入或删除该文件"
+            )
+        logger.info(f"从断点 {self.path} 恢复 {len(done)} / {self.total} 个结果")
+        return done
+
+    def add(self, idx: int, value: Any) -> None:
+        try:
+            self._buffer.append(pickle.dumps((idx, value), protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as exc:
+            if not self._warned:
+                logger.warning(f"结果无法 pickle，不写入断点（续跑时将重新执行）: {exc!r}")
+                self._warned = True
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """将缓存的结果追加到断点文件。"""
+        if self._buffer:
+            self._append(b"".join(self._buffer))
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+
+def _inputs_fingerprint(items: Iterable) -> Optional[str]:
+    """全部输入 pickle 后的 sha256，用于校验断点；含无法 pickle 的元素时返回 ``None``。"""
+    h = hashlib.sha256()
+    try:
+        for item in items:
+            h.update(pickle.dumps(item, protocol=4))
+    except Exception:
+        return None
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# 结果缓存（cache=）
+# ---------------------------------------------------------------------------
+class ResultCache(ABC):
+    """apply_parallel 结果缓存的接口：以字符串键存取任意可 pickle 的结果。
+
+    自定义后端（如 Redis）继承本类并实现抽象方法 ``get`` / ``set``，缺少
+    任一方法时在实例化时即抛出 ``TypeError``；
+    ``flush`` / ``close`` 在每次调用结束时被调用，默认什么也不做。
+    """
+
+    _MISSING = object()
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        """返回缓存的结果，未命中时返回 ``ResultCache._MISSING``。"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        """写入一条结果。"""
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class MemoryCache(ResultCache):
+    """进程内的 LRU 结果缓存，超过 maxsize 条时淘汰最久未使用的结果。"""
+
+    def __init__(self, maxsize: int = 100_000) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return self._MISSING
+            return self._data[key]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class DiskCache(ResultCache):
+    """基于 sqlite 的持久化结果缓存，结果以 pickle 存储，跨进程 / 跨天复用。
+
+    写入先缓存在内存中，每 ``batch`` 条或 ``flush()`` 时批量提交。
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], batch: int = 1000) -> None:
+        self.path = os.fspath(path)
+        self.batch = batch
+        self._pending: list[tuple[str, bytes]] = []
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB)"
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        return self._MISSING if row is None else pickle.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        self._pending.append((key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._pending:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?)", self._pending
+                )
+                self._conn.commit()
+                self._pending = []
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+
+# cache=True 时使用的模块级内存缓存
+_default_cache: Optional[MemoryCache] = None
+
+
+def _open_cache(cache: Any) -> tuple[Optional[ResultCache], bool]:
+    """将 cache 参数解析为 ``(缓存对象, 是否由本次调用负责关闭)``。"""
+    global _default_cache
+    if cache is None or cache is False:
+        return None, False
+    if cache is True:
+        if _default_cache is None:
+            _default_cache = MemoryCache()
+        return _default_cache, False
+    if isinstance(cache, ResultCache):
+        return cache, False
+    if isinstance(cache, (str, os.PathLike)):
+        return DiskCache(cache), True
+    raise ValueError(
+        f"cache 参数须为 True、ResultCache 实例或 sqlite 文件路径，收到: {cache!r}"
+    )
+
+
+def _hash_code(h: Any, code: types.CodeType) -> None:
+    """将字节码、常量（递归进入嵌套函数）与引用的名字并入哈希。"""
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _hash_code(h, const)
+        else:
+            h.update(repr(const).encode())
+
+
+def _func_fingerprint(func: Callable) -> tuple[str, bool]:
+    """函数身份，返回 ``(指纹, 是否可靠)``。
+
+    指纹由全名、字节码、常量、引用的名字、闭包变量的值（``functools.partial``
+    则为内层函数及其绑定参数）组成，函数体或绑定的值改变后旧缓存自然失效。
+    lambda 与闭包的身份无法从名字可靠地区分（闭包变量也未必可 pickle），
+    可调用对象的状态同理，此时第二项为 ``False``，调用方须要求显式的
+    ``cache_key``。全局变量的值不参与指纹。
+    """
+    h = hashlib.sha256()
+    reliable = True
+    if isinstance(func, functools.partial):
+        inner, reliable = _func_fingerprint(func.func)
+        h.update(inner.encode())
+        try:
+            h.update(pickle.dumps((func.args, sorted(func.keywords.items())), protocol=4))
+        except Exception:
+            h.update(repr((func.args, func.keywords)).encode())
+            reliable = False
+        return f"functools.partial:{h.hexdigest()[:16]}", reliable
+
+    code = getattr(func, "__code__", None)
+    if code is not None:
+        _hash_code(h, code)
+        cells = getattr(func, "__closure__", None) or ()
+        if cells or getattr(func, "__name__", "") == "<lambda>":
+            reliable = False
+        if isinstance(func, types.MethodType):
+            # 绑定方法的结果取决于实例状态
+            reliable = False
+            try:
+                h.update(pickle.dumps(func.__self__, protocol=4))
+            except Exception:
+                h.update(repr(func.__self__).encode())
+        for cell in cells:
+            try:
+                h.update(pickle.dumps(cell.cell_contents, protocol=4))
+            except Exception:
+                h.update(repr(cell.cell_contents).encode())
+    elif not isinstance(func, (types.BuiltinFunctionType, types.BuiltinMethodType, type)):
+        # 可调用对象：以实例状态参与哈希
+        reliable = False
+        try:
+            h.update(pickle.dumps(func, protocol=4))
+        except Exception:
+            h.update(repr(func).encode())
+    return f"{_func_key(func)}:{h.hexdigest()[:16]}", reliable
+
+
+def _cache_key(fingerprint: str, element: Any, key: Optional[Callable]) -> str:
+    """元素的缓存键：函数身份 + 元素（或 key(元素)）pickle 后的 sha256。"""
+    payload = element if key is None else key(element)
+    h = hashlib.sha256(fingerprint.encode())
+    h.update(pickle.dumps(payload, protocol=4))
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# 结果落盘（memory_limit=）
+# ---------------------------------------------------------------------------
+_BYTE_UNITS = {"": 1, "B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30, "TB": 1 << 40}
+
+
+def _parse_bytes(value: Union[int, str]) -> int:
+    """解析字节数：整数，或 ``"512MB"`` / ``"2 GB"`` 形式的字符串（1024 进制）。"""
+    if isinstance(value, int):
+        return value
+    text = str(value).strip().upper().replace(" ", "")
+    number = text.rstrip("KMGTB")
+    unit = text[len(number):]
+    if not number or unit not in _BYTE_UNITS:
+        raise ValueError(f"无法解析的字节数: {value!r}，示例: 1073741824 / '512MB' / '2GB'")
+    return int(float(number) * _BYTE_UNITS[unit])
+
+
+def _approx_size(value: Any) -> int:
+    """结果占用内存的粗略估计（字节）：不做序列化，容器只向下展开一层。"""
+    nbytes = getattr(value, "nbytes", None)  # numpy / pyarrow 等缓冲区对象
+    if isinstance(nbytes, int):
+        return nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(map(sys.getsizeof, value))
+    return size
+
+
+class SpilledResults(SequenceABC):
+    """``apply_parallel(memory_limit=...)`` 的返回值：按需从磁盘加载的结果序列。
+
+    行为与 list 一致（``len`` / 下标 / 切片 / 迭代 / 与 list 比较相等，顺序
+    与输入一致）。内存占用按 :func:`_approx_size` 粗略估计，不做序列化；
+    超出内存预算后的结果以 pickle protocol 5 写入匿名临时文件，访问时才
+    读取并反序列化。每次访问都会重新加载，需要多次使用的结果请自行保存引用。
+    临时文件在对象被回收或调用 :meth:`close` 时删除。
+    """
+
+    def __init__(self, total: int, memory_limit: int) -> None:
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self._values: list = [None] * total
+        self._offsets: dict[int, tuple[int, int]] = {}
+        self._file = tempfile.TemporaryFile(prefix="mp_spill_")
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, self._file.close)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return (
+            f"SpilledResults(len={len(self)}, spilled={self.spilled}, "
+            f"memory_used={self.memory_used})"
+        )
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, (list, SpilledResults)):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            a is b or a == b for a, b in zip(self, other)
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    @property
+    def spilled(self) -> int:
+        """已写入磁盘的结果个数。"""
+        return len(self._offsets)
+
+    def __setitem__(self, idx: int, value: Any) -> None:
+        # 预算内的结果留在内存；一旦超出预算，其后的结果全部落盘
+        if not self._offsets:
+            size = _approx_size(value)
+            if self.memory_used + size <= self.memory_limit:
+                self.memory_used += size
+                self._values[idx] = value
+                return
+        try:
+            data = pickle.dumps(value, protocol=5)
+        except Exception:
+            self._values[idx] = value  # 无法序列化的结果只能留在内存
+            return
+        with self._lock:
+            pos = self._file.seek(0, os.SEEK_END)
+            self._file.write(data)
+        self._offsets[idx] = (pos, len(data))
+        self._values[idx] = None
+
+    def __getitem__(self, idx: Union[int, slice]) -> Any:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        entry = self._offsets.get(idx)
+        if entry is None:
+            return self._values[idx]
+        pos, size = entry
+        with self._lock:
+            self._file.seek(pos)
+            data = self._file.read(size)
+        return pickle.loads(data)
+
+    def close(self) -> None:
+        """删除临时文件；之后访问已落盘的结果会报错。"""
+        self._finalizer()
+
+    def __enter__(self) -> SpilledResults:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# ---------------------------------------------------------------------------
+# 列批分片（apply_sharded）
+# ---------------------------------------------------------------------------
+# 可直接内存映射的 numpy dtype 类别：布尔 / 整数 / 浮点 / 复数 / 时间
+_MAPPABLE_KINDS = frozenset("biufcmM")
+
+# worker 侧已打开的内存映射缓存：{"dir": 当前分片目录, "arrays": {path: ndarray}}
+_shard_cache: dict = {"dir": None, "arrays": {}}
+
+
+def _open_mapped(directory: str, path: str) -> Any:
+    """在 worker 中以只读 mmap 打开 .npy 文件，同一次调用内只打开一次。"""
+    if _shard_cache["dir"] != directory:
+        # 新一次 apply_sharded 调用：丢弃上一次的映射，避免常驻池无限增长
+        _shard_cache["dir"] = directory
+        _shard_cache["arrays"] = {}
+    arrays = _shard_cache["arrays"]
+    arr = arrays.get(path)
+    if arr is None:
+        arr = arrays[path] = _get_np().load(path, mmap_mode="r")
+    return arr
+
+
+def _run_shard(
+    func: Callable,
+    spec: dict,
+    start: int,
+    stop: int,
+    extra: dict,
+    index: Any = None,
+) -> Any:
+    """在 worker 中根据 spec 重建 ``[start, stop)`` 行区间的切片并调用 func。
+
+    已映射的列直接切 mmap 视图（零拷贝）；无法映射的列（object、
+    Categorical / Int64 等扩展类型）以及行索引由主进程按分片随任务传入
+    ``extra`` / ``index``，扩展类型以 pandas ExtensionArray 传入以保留 dtype。
+    """
+    directory = spec["dir"]
+    if spec["kind"] == "ndarray":
+        if spec["path"] is None:
+            return func(extra[0])
+        return func(_open_mapped(directory, spec["path"])[start:stop])
+
+    # 列以位置为键，兼容重复 / 非字符串列名
+    columns = dict(extra)
+    for pos, path in spec["mapped"]:
+        columns[pos] = _open_mapped(directory, path)[start:stop]
+    frame = _get_pd().DataFrame(
+        {pos: columns[pos] for pos in range(len(spec["columns"]))},
+        index=index,
+        copy=False,
+    )
+    frame.columns = spec["columns"]
+    return func(frame)
+
+
+def _concat_shards(parts: List[Any]) -> Any:
+    """将各分片结果按顺序拼接：DataFrame / Series → concat，ndarray → concatenate。"""
+    if not parts:
+        return []
+    pd, np = _get_pd(), _get_np()
+    first = parts[0]
+    if pd is not None and isinstance(first, (pd.DataFrame, pd.Series)):
+        return pd.concat(parts)
+    if np is not None and isinstance(first, np.ndarray):
+        return np.concatenate(parts)
+    if isinstance(first, list):
+        return [x for part in parts for x in part]
+    return parts
+
+
+# ---------------------------------------------------------------------------
+# 可复用执行器池
+# ---------------------------------------------------------------------------
+class ParallelPool:
+    """可在多次 ``apply_parallel`` 调用间复用的线程 / 进程池。
+
+    执行器在首次使用时惰性创建；若进程池因 worker 崩溃而损坏，下次访问
+    ``executor`` 时会自动重建。支持上下文管理器协议，退出时关闭执行器。
+
+    Parameters
+    ----------
+    method : ``"thread"`` | ``"process"``, default ``"thread"``
+    num_workers : int, default ``NUM_WORKERS``
+        worker 数量，会被裁剪到 ``[1, MAX_POOL_WORKERS]``。
+    warmup : bool, default ``False``
+        为 ``True`` 时在构造后立即预热（创建全部 worker）。
+    initializer, initargs
+        透传给底层执行器，在每个 worker 启动时调用一次。
+    shared : Any, optional
+        下发给每个 worker 的只读共享对象，func 内通过 :func:`get_shared` 获取。
+    max_tasks_per_child : int | None, default ``None``
+        每个 worker 进程执行多少个任务后被替换（仅 process 模式，Python 3.11+），
+        用于回收有内存泄漏的 worker。
+
+    Examples
+    --------
+    >>> with ParallelPool("process", num_workers=4, warmup=True) as pool:
+    ...     for batch in batches:
+    ...         apply_parallel(batch, func, pool=pool)
+    """
+
+    def __init__(
+        self,
+        method: Literal["thread", "process"] = "thread",
+        num_workers: int = NUM_WORKERS,
+        warmup: bool = False,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = (),
+        shared: Any = _UNSET,
+        max_tasks_per_child: Optional[int] = None,
+    ) -> None:
+        method = _resolve_method(method)
+        if method not in _EXECUTOR_MAP:
+            raise ValueError(
+                f"method 参数仅支持 {tuple(_EXECUTOR_MAP)!r}，收到: {method!r}"
+            )
+        if num_workers > MAX_POOL_WORKERS:
+            logger.warning(
+                f"num_workers={num_workers} 超过上限 {MAX_POOL_WORKERS}，已截断"
+            )
+        self.method = method
+        self.num_workers = max(1, min(num_workers, MAX_POOL_WORKERS))
+        self._executor_kwargs, self._fork_token = _executor_kwargs(
+            method, self.num_workers, shared, initializer, initargs,
+            max_tasks_per_child,
+        )
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._users = 0         # 正在使用本池的 apply_parallel 等调用数
+        self._retired = False   # 已被 get_pool 的 LRU 淘汰，最后一个使用者结束时关闭
+        self._shared_key: Optional[tuple[str, int]] = None
+        if warmup:
+            self.warmup()
+
+    def __enter__(self) -> ParallelPool:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.shutdown()
+
+    def __repr__(self) -> str:
+        state = "closed" if self._closed else ("running" if self._executor else "idle")
+        return f"ParallelPool(method={self.method!r}, num_workers={self.num_workers}, {state})"
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def executor(self) -> Executor:
+        """返回底层执行器，必要时（首次访问 / 进程池损坏）创建。"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ParallelPool 已关闭，无法继续提交任务")
+            if self._executor is not None and getattr(self._executor, "_broken", False):
+                logger.warning(f"{self!r} 的执行器已损坏，正在重建")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._executor is None:
+                self._executor = _EXECUTOR_MAP[self.method](**self._executor_kwargs)
+            return self._executor
+
+    def recycle(self) -> Executor:
+        """终止当前全部 worker 并新建执行器，用于 worker 卡死时恢复吞吐。"""
+        with self._lock:
+            old, self._executor = self._executor, None
+        if old is not None:
+            _terminate_executor(old)
+        return self.executor
+
+    def warmup(self, delay: float = 0.05) -> List[int]:
+        """向每个 worker 提交一个短任务，强制创建全部线程 / 进程。
+
+        Returns
+        -------
+        list[int]
+            执行预热任务的 worker 所在进程 PID（线程模式下均为当前进程）。
+        """
+        start = time.perf_counter()
+        executor = self.executor
+        futures = [
+            executor.submit(_warmup_task, delay) for _ in range(self.num_workers)
+        ]
+        pids = [f.result() for f in futures]
+        logger.info(
+            f"{self!r} 预热完成，耗时 {time.perf_counter() - start:.3f}s"
+        )
+        return pids
+
+    def _acquire(self) -> bool:
+        """登记一个使用者；池已关闭时返回 ``False``。"""
+        with self._lock:
+            if self._closed:
+                return False
+            self._users += 1
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self._users -= 1
+            close = self._retired and self._users == 0
+        if close:
+            self.shutdown(wait=False)
+
+    def _retire(self) -> None:
+        """标记为已淘汰：没有使用者时立即关闭，否则等最后一个使用者结束。"""
+        with self._lock:
+            self._retired = True
+            close = self._users == 0
+        if close:
+            self.shutdown(wait=False)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        """关闭底层执行器。关闭后的池不可再使用。"""
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+        _fork_payloads.pop(self._fork_token, None)
+
+
+_shared_pools: "OrderedDict[tuple[str, int], ParallelPool]" = OrderedDict()
+_shared_lock = threading.Lock()
+
+
+def get_pool(
+    method: Literal["thread", "process"] = "thread",
+    num_workers: int = NUM_WORKERS,
+) -> ParallelPool:
+    """获取（或创建）按 ``(method, num_workers)`` 缓存的模块级共享池。
+
+    共享池最多保留 ``_MAX_SHARED_POOLS`` 个，超出时淘汰最久未使用的池：
+    仍有调用在使用的池等其结束后再关闭，之后再挂载该池的调用会自动换用
+    同规格的新池。解释器退出时统一通过 :func:`shutdown_pools` 关闭。
+    """
+    key = (method, max(1, min(num_workers, MAX_POOL_WORKERS)))
+    evicted: List[ParallelPool] = []
+    with _shared_lock:
+        pool = _shared_pools.get(key)
+        if pool is None or pool.closed:
+            pool = ParallelPool(method, key[1])
+            pool._shared_key = key
+            _shared_pools[key] = pool
+        _shared_pools.move_to_end(key)
+        while len(_shared_pools) > _MAX_SHARED_POOLS:
+            _, old = _shared_pools.popitem(last=False)
+            evicted.append(old)
+    for old in evicted:
+        logger.info(f"共享池数量超过 {_MAX_SHARED_POOLS}，淘汰 {old!r}")
+        old._retire()
+    return pool
+
+
+def shutdown_pools(wait: bool = True) -> None:
+    """关闭全部模块级共享池（已注册为 atexit 钩子）。"""
+    with _shared_lock:
+        pools = list(_shared_pools.values())
+        _shared_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait)
+
+
+atexit.register(shutdown_pools)
+
+
+# ---------------------------------------------------------------------------
+# 远程执行器（method="remote"）
+# ---------------------------------------------------------------------------
+def _parse_address(address: Union[str, tuple]) -> tuple[str, int]:
+    """将 ``"host:port"`` 或 ``(host, port)`` 统一为 ``(host, port)``。"""
+    if isinstance(address, str):
+        host, _, port = address.rpartition(":")
+        return host or "127.0.0.1", int(port)
+    host, port = address
+    return host, int(port)
+
+
+# 默认的远程 worker 地址与认证密钥，可由环境变量或 set_remote_workers 配置
+_remote_addresses: List[tuple[str, int]] = [
+    _parse_address(a) for a in os.environ.get("MP_REMOTE_WORKERS", "").split(",") if a
+]
+_remote_authkey: Optional[bytes] = (
+    os.environ["MP_REMOTE_AUTHKEY"].encode() if os.environ.get("MP_REMOTE_AUTHKEY") else None
+)
+
+# 连接断开后每个槽位的最大重连次数，及首次重连的退避时长（秒，指数增长）
+_REMOTE_MAX_RECONNECTS = 5
+_REMOTE_RECONNECT_DELAY = 0.2
+
+
+class WorkerLostError(RuntimeError):
+    """远程 worker 在执行任务时断连，且重试次数已耗尽。"""
+
+
+def set_remote_workers(
+    addresses: List[Union[str, tuple]],
+    authkey: Union[str, bytes, None] = None,
+) -> None:
+    """设置 ``method="remote"`` 默认使用的 worker 地址（``"host:port"``）与密钥。"""
+    global _remote_addresses, _remote_authkey
+    _remote_addresses = [_parse_address(a) for a in addresses]
+    if authkey is not None:
+        _remote_authkey = authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def _resolve_authkey(authkey: Union[str, bytes, None]) -> bytes:
+    """显式传入的密钥优先，其次是 set_remote_workers / ``MP_REMOTE_AUTHKEY``；都没有时报错。"""
+    if isinstance(authkey, str):
+        authkey = authkey.encode()
+    authkey = authkey or _remote_authkey
+    if not authkey:
+        raise ValueError(
+            "远程 worker 需要认证密钥：请传入 authkey，或设置环境变量 MP_REMOTE_AUTHKEY"
+        )
+    return authkey
+
+
+def serve_worker(
+    address: Union[str, tuple] = ("127.0.0.1", 6000),
+    authkey: Union[str, bytes, None] = None,
+) -> None:
+    """启动远程 worker 服务并阻塞运行。
+
+    每个客户端连接由独立线程顺序执行其任务；需要利用多核时，应在同一台
+    机器上按核数启动多个服务进程（不同端口）。任务函数按引用 pickle，
+    因此 worker 端必须能 import 到与调用方相同的模块。
+
+    信任模型：worker 对收到的任务直接 ``pickle.loads`` 并执行，通过认证的
+    客户端即可在本机以服务进程的权限执行任意代码。认证依赖 ``authkey``
+    （HMAC 挑战应答，不加密传输内容），没有内置默认值：未传入且未设置
+    ``MP_REMOTE_AUTHKEY`` 时直接报错。默认只监听 ``127.0.0.1``；需要对外
+    提供服务时显式指定地址，使用足够随机的密钥，并只在可信网络
+    （或 SSH 隧道 / VPN）内开放端口。
+    """
+    address = _parse_address(address)
+    authkey = _resolve_authkey(authkey)
+    with Listener(address, authkey=authkey) as listener:
+        logger.info(f"远程 worker 已启动 | address={listener.address}, pid={os.getpid()}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, AuthenticationError) as exc:
+                logger.warning(f"拒绝连接: {exc}")
+                continue
+            threading.Thread(
+                target=_serve_connection, args=(conn,), daemon=True,
+            ).start()
+
+
+def _serve_connection(conn: Any) -> None:
+    """worker 端：循环接收 ``(kind, payload)`` 消息并回复 ``(ok, value)``。"""
+    with conn:
+        while True:
+            try:
+                kind, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                fn, args = pickle.loads(payload)
+                reply = (True, fn(*args))
+            except Exception as exc:
+                reply = (False, exc)
+            try:
+                conn.send(reply)
+            except (EOFError, OSError):
+                return
+            except Exception as exc:
+                # 返回值或异常无法 pickle 时，改为发送可序列化的描述
+                conn.send((False, RuntimeError(f"{kind} 结果无法序列化: {exc!r}")))
+
+
+class _RemoteTask:
+    """排队中的远程任务及其已尝试次数。"""
+
+    __slots__ = ("future", "fn", "args", "attempts")
+
+    def __init__(self, future: Future, fn: Callable, args: tuple) -> None:
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.attempts = 0
+
+
+class RemoteExecutor(Executor):
+    """通过 TCP 将任务分发给远程 worker 服务的执行器。
+
+    每个槽位（共 ``max_workers`` 个，轮流分配到各地址）持有一条到 worker 的
+    连接和一个调度线程，从共享队列领取任务、发送并等待结果，因此同一
+    槽位内任务串行、不同槽位之间并行。连接断开时，正在执行的任务重新排队
+    交给其他槽位（最多 ``max_retries`` 次，超过则以 :class:`WorkerLostError`
+    失败），该槽位按指数退避重连，重连失败后退出；全部槽位退出后执行器
+    标记为损坏，剩余任务以 ``BrokenExecutor`` 失败。
+
+    Parameters
+    ----------
+    max_workers : int | None
+        槽位数，默认等于地址数。
+    initializer, initargs
+        每条连接建立后在 worker 端调用一次。
+    addresses : list | None
+        worker 地址列表，默认使用 :func:`set_remote_workers` /
+        环境变量 ``MP_REMOTE_WORKERS``（逗号分隔的 ``host:port``）。
+    authkey : bytes | None
+        连接认证密钥，默认取 :func:`set_remote_workers` 设置的值或环境变量
+        ``MP_REMOTE_AUTHKEY``；均未设置时抛出 ``ValueError``。
+    max_retries : int, default ``2``
+        单个任务因 worker 断连而重新排队的最大次数。
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = (),
+        addresses: Optional[List[Union[str, tuple]]] = None,
+        authkey: Optional[bytes] = None,
+        max_retries: int = 2,
+    ) -> None:
+        self._addresses = [_parse_address(a) for a in (addresses or _remote_addresses)]
+        if not self._addresses:
+            raise ValueError(
+                "未配置远程 worker 地址，请调用 set_remote_workers() "
+                "或设置环境变量 MP_REMOTE_WORKERS"
+            )
+        self._authkey = _resolve_authkey(authkey)
+        self._init = (
+            pickle.dumps((initializer, initargs)) if initializer is not None else None
+        )
+        self._max_retries = max_retries
+        self._tasks: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._shutdown = False
+        self._broken = False
+        num_slots = max_workers or len(self._addresses)
+        self._alive = num_slots
+        self._threads = [
+            threading.Thread(
+                target=self._slot_loop,
+                args=(self._addresses[i % len(self._addresses)],),
+                name=f"remote-slot-{i}",
+                daemon=True,
+            )
+            for i in range(num_slots)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        if kwargs:
+            raise TypeError("RemoteExecutor.submit 不支持关键字参数")
+        with self._lock:
+            if self._broken:
+                raise BrokenExecutor("全部远程 worker 均已断开")
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            future: Future = Future()
+            self._tasks.put(_RemoteTask(future, fn, args))
+            return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._shutdown = True
+        self._stop.set()
+        if cancel_futures:
+            self._drain(None)
+        for _ in self._threads:
+            self._tasks.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    # ── 内部实现 ──
+    def _drain(self, exc: Optional[BaseException]) -> None:
+        """清空队列：exc 为 None 时取消任务，否则以 exc 失败。"""
+        while True:
+            try:
+                task = self._tasks.get_nowait()
+            except queue.Empty:
+                return
+            if task is None:
+                continue
+            if exc is None:
+                task.future.cancel()
+            elif task.attempts or task.future.set_running_or_notify_cancel():
+                task.future.set_exception(exc)
+
+    def _connect(self, address: tuple[str, int]) -> Optional[Any]:
+        """建立连接并执行 initializer；多次失败或执行器关闭时返回 ``None``。"""
+        for attempt in range(_REMOTE_MAX_RECONNECTS + 1):
+            if attempt and self._stop.wait(_REMOTE_RECONNECT_DELAY * 2 ** (attempt - 1)):
+                return None
+            try:
+                conn = Client(address, authkey=self._authkey)
+                if self._init is not None:
+                    conn.send(("init", self._init))
+                    ok, value = conn.recv()
+                    if not ok:
+                        conn.close()
+                        logger.error(f"远程 worker {address} initializer 失败: {value}")
+                        return None
+                return conn
+            except (OSError, EOFError, AuthenticationError) as exc:
+                logger.warning(f"连接远程 worker {address} 失败（第 {attempt + 1} 次）: {exc}")
+        return None
+
+    def _slot_loop(self, address: tuple[str, int]) -> None:
+        conn = None
+        try:
+            while True:
+                if conn is None:
+                    conn = self._connect(address)
+                    if conn is None:
+                        return
+                task = self._tasks.get()
+                if task is None:
+                    return
+                if task.attempts == 0 and not task.future.set_running_or_notify_cancel():
+                    continue  # 已被取消
+                try:
+                    payload = pickle.dumps((task.fn, task.args))
+                except Exception as exc:
+                    task.future.set_exception(exc)
+                    continue
+                try:
+                    conn.send(("task", payload))
+                    ok, value = conn.recv()
+                except (OSError, EOFError) as exc:
+                    conn.close()
+                    conn = None
+                    self._retry(task, address, exc)
+                    continue
+                if ok:
+                    task.future.set_result(value)
+                else:
+                    task.future.set_exception(value)
+        finally:
+            if conn is not None:
+                conn.close()
+            self._slot_exit(address)
+
+    def _retry(self, task: _RemoteTask, address: tuple, exc: BaseException) -> None:
+        task.attempts += 1
+        if task.attempts > self._max_retries:
+            task.future.set_exception(WorkerLostError(
+                f"远程 worker {address} 断连，任务已重试 {self._max_retries} 次: {exc}"
+            ))
+            return
+        logger.warning(f"远程 worker {address} 断连（{exc}），任务重新排队")
+        self._tasks.put(task)
+
+    def _slot_exit(self, address: tuple) -> None:
+        with self._lock:
+            self._alive -= 1
+            last = self._alive == 0
+            if last and not self._shutdown:
+                self._broken = True
+        if last and not self._shutdown:
+            logger.error("全部远程 worker 均已断开，剩余任务将失败")
+            self._drain(BrokenExecutor("全部远程 worker 均已断开"))
+        elif not self._shutdown:
+            logger.warning(f"远程 worker {address} 的槽位已退出")
+
+
+_EXECUTOR_MAP["remote"] = RemoteExecutor
+
+
+# ---------------------------------------------------------------------------
+# 核心函数
+# ---------------------------------------------------------------------------
+def apply_parallel(
+    iterable: Iterable,
+    func: Callable,
+    method: Literal["thread", "process", "interpreter", "async", "remote"] = "thread",
+    num_workers: Union[int, Literal["auto"]] = NUM_WORKERS,
+    show_progress: bool = True,
+    total_num: Optional[int] = None,
+    error_policy: Literal["store", "raise", "ignore"] = "store",
+    progress_desc: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    pool: Union[ParallelPool, bool, None] = None,
+    chunksize: Union[int, Literal["auto"]] = 1,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+    shared: Any = _UNSET,
+    checkpoint: Union[str, os.PathLike, None] = None,
+    checkpoint_interval: float = 10.0,
+    task_timeout: Optional[float] = None,
+    max_tasks_per_child: Optional[int] = None,
+    progress_callback: Union[Callable[[dict], None], Literal["log"], None] = None,
+    progress_interval: float = PROGRESS_INTERVAL,
+    retries: int = 0,
+    backoff: Union[float, Callable[[int], float]] = 0.5,
+    retry_on: Union[type, tuple] = Exception,
+    return_attempts: bool = False,
+    return_stats: bool = False,
+    cost: Optional[Callable[[Any], float]] = None,
+    cache: Union[ResultCache, str, os.PathLike, bool, None] = None,
+    cache_key: Optional[Callable[[Any], Any]] = None,
+    memory_limit: Union[int, str, None] = None,
+    rate_limit: Union[float, tuple[float, int], None] = None,
+    concurrency_key: Optional[Callable[[Any], Any]] = None,
+    max_per_key: Union[int, dict, None] = None,
+) -> Union[List[Any], SpilledResults, tuple]:
+    """对 *iterable* 中的每个元素并行调用 *func*，返回与输入顺序严格一致的结果列表。
+
+    Parameters
+    ----------
+    iterable : Iterable
+        任意可迭代对象（列表、元组、生成器、``pandas.DataFrame`` 等）。
+        当传入 DataFrame 时，自动按行转为 ``dict`` 列表。
+    func : callable
+        对每个元素执行的函数。根据元素类型自动选择解包方式。
+    method : ``"thread"`` | ``"process"`` | ``"interpreter"`` | ``"async"`` | ``"remote"``, default ``"thread"``
+        并行方式。传入其他值将抛出 ``ValueError``。``"async"`` 时 func 须为
+        协程函数，等价于 ``asyncio.run(apply_parallel_async(...))``，
+        此时 ``batch_size`` 不生效，``task_timeout`` 以 ``asyncio.wait_for``
+        实现；``pool`` / ``chunksize`` / ``max_tasks_per_child`` 等只适用于
+        执行器的参数会抛出 ``ValueError``。
+        ``"interpreter"`` 用于 CPU 密集型任务：依次尝试自由线程构建下的线程、
+        3.14+ 的子解释器池，都不可用时回退到 ``"process"``（见 :func:`_resolve_method`）。
+    num_workers : int | ``"auto"``, default ``NUM_WORKERS``
+        worker 数；``"async"`` 模式下为最大并发协程数，通常应设为数百至数千。
+        ``"auto"`` 时以 :func:`available_cpus`（含 cgroup 配额）为起点，运行中
+        按吞吐爬山调整并发数，选定值写入日志并按 ``(method, 函数代码对象)``
+        缓存，后续调用直接复用（不同的 lambda 各自调优）。``"async"`` 模式下 ``"auto"`` 取
+        ``ASYNC_CONCURRENCY``。
+    show_progress : bool, default ``True``
+    total_num : int | None, default ``None``
+    error_policy : ``"store"`` | ``"raise"`` | ``"ignore"``, default ``"store"``
+        任务异常处理策略：
+        - ``"store"``  — 将异常对象存入结果列表对应位置（默认，向后兼容）。
+        - ``"raise"``  — 遇到第一个异常立即取消剩余任务并抛出。
+        - ``"ignore"`` — 记录日志，结果位置填 ``None``。
+    progress_desc : str | None, default ``None``
+        自定义进度条描述文字。为 ``None`` 时使用默认格式。
+    batch_size : int | None, default ``None``
+        滑动窗口大小，即同时在途（已提交未收集）的最大任务数。为 ``None``
+        时取 ``num_workers * 4``：任一任务完成即补充一个新任务，worker 持续
+        有活可干，也不会一次性创建过多 Future。设为 0 或负数表示不限制。
+    pool : ParallelPool | bool | None, default ``None``
+        复用已有执行器池，调用结束后不关闭：
+        - ``ParallelPool`` — 使用该池（此时 ``method`` / ``num_workers`` 取自池）。
+        - ``True``         — 使用 :func:`get_pool` 返回的模块级共享池。
+        - ``None``         — 每次调用新建并销毁执行器（默认，向后兼容）。
+    chunksize : int | ``"auto"``, default ``1``
+        每个任务打包的元素个数。``> 1`` 时一次向 worker 发送一组元素，
+        大幅降低 process 模式下逐条 pickle / IPC 的开销；结果仍按输入顺序
+        逐条展开，error_policy 对每个元素单独生效。``"auto"`` 时先经执行器
+        串行执行少量元素、按 worker 端耗时推算 chunksize（探测同样受
+        task_timeout 约束）。
+    initializer : callable | None, default ``None``
+        每个 worker 启动时调用一次 ``initializer(*initargs)``（如加载模型）。
+    initargs : tuple, default ``()``
+    shared : Any, optional
+        只读共享对象，每个 worker 只接收一次，func 内通过 :func:`get_shared`
+        获取，避免大对象随每个任务重复 pickle。process 模式且启动方式为
+        fork 时由子进程写时复制继承，完全不经过序列化。使用 ``pool`` 时须在
+        创建 ``ParallelPool`` 时指定。
+    checkpoint : str | PathLike | None, default ``None``
+        断点文件路径（逐帧追加的 pickle 日志）。成功完成的元素的
+        ``(下标, 结果)`` 每隔 ``checkpoint_interval`` 秒及调用结束（含异常
+        退出）时落盘；重新运行时已完成的元素直接取回结果（类型与首次运行
+        一致），只执行其余元素（失败或结果无法 pickle 的元素会重新执行）。
+        崩溃时写了一半的末帧在续跑时自动截掉。全部完成后文件保留，需自行
+        删除；文件以 pickle 读取，只加载自己生成的断点文件。续跑时函数名、
+        元素数或输入内容（全部元素 pickle 后的哈希）与断点不一致时抛出
+        ``ValueError``。
+    checkpoint_interval : float, default ``10.0``
+        断点落盘的最小间隔（秒）。
+    task_timeout : float | None, default ``None``
+        单个任务（chunksize > 1 时为整组）的最长执行时间（秒），从 worker
+        开始执行该任务起计时（排队时间不计入）。超时的元素以
+        ``TimeoutError`` 按 error_policy 处理。process 模式下会终止卡死的
+        worker 并重建进程池（其余在途任务重新提交，可能被重复执行）；
+        thread 模式或挂载 ``pool`` 时不终止 worker，仅放弃该任务，卡住的
+        worker 继续占用直到返回。
+    max_tasks_per_child : int | None, default ``None``
+        每个 worker 进程执行多少个任务后被替换，用于回收有内存泄漏的
+        worker（仅 process 模式，Python 3.11+，会改用 forkserver / spawn 启动）。
+    progress_callback : callable | ``"log"`` | None, default ``None``
+        机器可读的进度流，适合无终端的生产环境。每次刷新时以字典调用
+        ``progress_callback(stats)``，键为 ``done`` / ``total`` / ``errors`` /
+        ``elapsed`` / ``rate`` (items/s) / ``eta`` (秒)；传 ``"log"`` 时改为
+        输出一行 INFO 日志。可与 ``show_progress`` 同时使用。
+    progress_interval : float, default ``PROGRESS_INTERVAL`` (0.1)
+        进度条与回调的最小刷新间隔（秒）。完成数在两次刷新之间只做累加，
+        海量微任务下主线程不再为逐条 ``tqdm.update`` 付出开销。
+    retries : int, default ``0``
+        每个元素失败后的最大重试次数。只有失败的元素会被重新提交（chunksize
+        > 1 时也按单个元素重试），用尽重试后才交给 error_policy 处理。
+    backoff : float | callable, default ``0.5``
+        重试等待时长（秒）。数值时按指数退避：第 *k* 次失败后等待
+        ``backoff * 2 ** (k - 1)``；可调用对象时为 ``backoff(k)`` 的返回值。
+        等待在主线程的延迟队列中完成，不占用 worker。
+    retry_on : type | tuple[type, ...], default ``Exception``
+        只有这些异常类型才会触发重试，其余异常直接按 error_policy 处理。
+    return_attempts : bool, default ``False``
+        为 ``True`` 时返回 ``(results, attempts)``，``attempts[i]`` 为第 *i* 个
+        元素在本次调用中的执行次数（从断点恢复的元素为 0）。
+    return_stats : bool, default ``False``
+        为 ``True`` 时在返回值末尾附带统计字典，用于判断瓶颈在 worker 池、
+        func 还是主线程。各项按任务统计（chunksize > 1 时一个任务含多个元素）：
+
+        - ``execution_ms`` / ``queue_wait_ms`` / ``collect_lag_ms`` /
+          ``total_ms`` — 执行、提交到开始、结束到主线程收取、提交到收取的
+          avg / min / max / p50 / p90 / p95 / p99；
+        - ``workers`` — 每个 worker 的任务数、忙碌时长与忙碌占比；
+        - ``utilization`` — 全部 worker 的平均忙碌占比；
+        - ``stragglers`` — 执行耗时超过中位数 4 倍的慢任务（最多 10 个）；
+        - ``bottleneck`` — 粗略结论：``"func"`` / ``"pool"`` / ``"main_thread"``。
+
+        计时本身有少量开销，默认关闭。
+    cost : callable | None, default ``None``
+        估算单个元素代价的函数（如文件大小、文本长度），接收原始元素（不
+        解包）。提供时先在主线程对全部待执行元素求值，再按代价从大到小
+        提交，避免少数大任务落在末尾形成长尾；``chunksize > 1`` 时按总代价
+        相近的原则装箱，大元素单独成组、小元素合并成组。结果仍按输入顺序返回。
+    cache : ResultCache | str | PathLike | bool | None, default ``None``
+        结果缓存。提交前先按 "函数指纹 + 元素" 的 sha256 查询（指纹含全名、
+        字节码、常量与闭包 / partial 绑定的值，不含全局变量的值），
+        命中的元素直接取回结果、完全不提交，只有未命中的元素进入执行器；
+        成功的结果写回缓存（失败的不缓存）。
+        - ``True``             — 模块级的内存 LRU（:class:`MemoryCache`）。
+        - ``str`` / ``PathLike`` — sqlite 文件（:class:`DiskCache`），跨进程复用。
+        - ``ResultCache`` 实例 — 自定义容量或后端。
+        func 为 lambda、闭包或可调用对象时身份无法可靠识别，须同时指定
+        ``cache_key``，否则抛出 ``ValueError``。
+    cache_key : callable | None, default ``None``
+        自定义缓存键：接收原始元素，返回参与哈希的可 pickle 对象（如只取
+        ``item["id"]``）。默认对整个元素做 pickle 哈希。
+    memory_limit : int | str | None, default ``None``
+        结果占用内存的预算（字节数，或 ``"512MB"`` / ``"2GB"``），按结果
+        在内存中的大小粗略估计（数组取 ``nbytes``，容器只展开一层），只有
+        落盘的结果才会被 pickle。设置后返回 :class:`SpilledResults`：预算内的
+        结果留在内存，超出部分以 pickle protocol 5 写入临时文件，访问时再
+        加载，下标与顺序语义与 list 相同。适合图像、向量等大体积输出。
+    rate_limit : float | tuple[float, int] | None, default ``None``
+        全局提交速率上限（元素/秒），由调度器以令牌桶实现：``qps`` 或
+        ``(qps, burst)``，burst 为允许的突发量（默认 ``max(1, int(qps))``）。
+        限流发生在主线程提交之前，worker 不会因等待令牌而被占用；重试的
+        元素同样受限，避免触发限流后形成重试风暴。需要 chunksize 为 1
+        （``"auto"`` 时自动取 1）。
+    concurrency_key : callable | None, default ``None``
+        ``concurrency_key(元素)`` 返回限流 key（如目标域名 / API 租户），
+        与 ``max_per_key`` 配合限制每个 key 的在途任务数。需要 chunksize 为 1。
+    max_per_key : int | dict | None, default ``None``
+        每个 key 的最大在途数；dict 时只限制其中列出的 key。达到上限的
+        元素暂缓提交，其后其他 key 的元素可先行执行。
+
+    Returns
+    -------
+    list | SpilledResults | tuple
+        结果列表（设置 ``memory_limit`` 时为 :class:`SpilledResults`），
+        第 *i* 个元素对应 ``iterable`` 中第 *i* 个输入；
+        ``return_attempts`` / ``return_stats`` 为 ``True`` 时依次附带每个元素的
+        执行次数与统计字典，即 ``(results, attempts, stats)`` 的对应子集。
+
+    Raises
+    ------
+    ValueError
+        当 ``method`` 不是支持的取值之一时。
+    RuntimeError
+        当 ``error_policy="raise"`` 且有任务抛出异常时（封装原始异常）。
+
+    Examples
+    --------
+    >>> from mp import apply_parallel
+    >>> results = apply_parallel(range(10), lambda x: x ** 2, method="thread")
+    >>> assert results == [i ** 2 for i in range(10)]
+    """
+
+    # ---- 1. 参数校验 -----------------------------------------------------
+    if isinstance(pool, ParallelPool):
+        method, num_workers = pool.method, pool.num_workers
+    method = _resolve_method(method)
+    _validate_options(method, error_policy)
+    if method == "async":
+        if (pool is not None or shared is not _UNSET or initializer is not None
+                or checkpoint is not None or retries or return_attempts
+                or return_stats or cost is not None or cache
+                or memory_limit is not None or rate_limit is not None
+                or concurrency_key is not None or chunksize != 1
+                or max_tasks_per_child is not None):
+            raise ValueError(
+                "method='async' 不支持 pool / shared / initializer / checkpoint / "
+                "retries / return_attempts / return_stats / cost / cache / "
+                "memory_limit / rate_limit / concurrency_key / chunksize / "
+                "max_tasks_per_child 参数"
+            )
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError(
+                "当前线程已有运行中的事件循环，请改用 `await apply_parallel_async(...)`"
+            )
+        if num_workers == "auto":
+            num_workers = ASYNC_CONCURRENCY
+        return asyncio.run(apply_parallel_async(
+            iterable, func, num_workers=num_workers, show_progress=show_progress,
+            total_num=total_num, error_policy=error_policy,
+            progress_desc=progress_desc, progress_callback=progress_callback,
+            progress_interval=progress_interval, task_timeout=task_timeout,
+        ))
+    if chunksize != "auto" and (not isinstance(chunksize, int) or chunksize < 1):
+        raise ValueError(
+            f"chunksize 参数须为正整数或 'auto'，收到: {chunksize!r}"
+        )
+
+    if not isinstance(retries, int) or retries < 0:
+        raise ValueError(f"retries 参数须为非负整数，收到: {retries!r}")
+    if memory_limit is not None:
+        memory_limit = _parse_bytes(memory_limit)
+    fingerprint = ""
+    if cache is not None and cache is not False:
+        fingerprint, reliable = _func_fingerprint(func)
+        if not reliable and cache_key is None:
+            raise ValueError(
+                "cache= 无法可靠识别 lambda / 闭包 / 可调用对象的身份，"
+                "请改用模块级函数，或同时指定 cache_key"
+            )
+    if (concurrency_key is None) != (max_per_key is None):
+        raise ValueError("concurrency_key 与 max_per_key 须同时指定")
+    if rate_limit is not None or concurrency_key is not None:
+        # 限流按元素计量：整组提交会绕开令牌桶 / key 上限（auto 的探测亦然）
+        if chunksize == "auto":
+            chunksize = 1
+        elif chunksize != 1:
+            raise ValueError("rate_limit / concurrency_key 限流时 chunksize 须为 1")
+    if concurrency_key is not None:
+        caps = max_per_key.values() if isinstance(max_per_key, dict) else [max_per_key]
+        if any(not isinstance(c, int) or c < 1 for c in caps):
+            raise ValueError(f"max_per_key 须为正整数，收到: {max_per_key!r}")
+    throttle = (
+        _Throttle(rate_limit, concurrency_key, max_per_key)
+        if rate_limit is not None or concurrency_key is not None else None
+    )
+
+    # ---- 2. 物化可迭代对象 -----------------------------------------------
+    items, inferred_total = _resolve_iterable(iterable)
+    total_num = total_num or inferred_total
+
+    # 边界: 空任务直接返回
+    if total_num == 0:
+        stats = _TaskStats(1).report() if return_stats else {}
+        empty = SpilledResults(0, memory_limit) if memory_limit is not None else []
+        return _with_extras(empty, [], stats, return_attempts, return_stats)
+
+    # num_workers="auto": 命中缓存则直接使用，否则在运行中爬山调优
+    tuner = None
+    if num_workers == "auto":
+        key = (method, _tune_key(func))
+        cpus = available_cpus()
+        if key in _autotune_cache or pool is not None:
+            num_workers = _autotune_cache.get(key, cpus)
+        else:
+            upper = MAX_POOL_WORKERS if method == "thread" else cpus * 2
+            upper = max(1, min(upper, total_num))
+            tuner = _ConcurrencyTuner(key, _func_key(func), start=cpus, lower=1, upper=upper)
+            num_workers = upper
+
+    # 裁剪 num_workers 到合理范围（共享池保持其原有大小，以便跨调用复用）
+    if pool is True:
+        pool = get_pool(method, num_workers)
+    if not isinstance(pool, ParallelPool):
+        num_workers = max(1, min(num_workers, total_num))
+
+    # ---- 3. 决定滑动窗口大小 ---------------------------------------------
+    if batch_size is None:
+        window = num_workers * _WINDOW_FACTOR
+    elif batch_size <= 0:
+        window = total_num  # 不限制在途任务数，一次性提交
+    else:
+        window = batch_size
+
+    # ---- 4. 选择执行器 ---------------------------------------------------
+    if task_timeout is not None and task_timeout <= 0:
+        raise ValueError(f"task_timeout 须为正数，收到: {task_timeout!r}")
+    executor_ctx = _executor_context(
+        pool, method, num_workers, shared, initializer, initargs,
+        max_tasks_per_child,
+    )
+
+    # ---- 5. 进度条、缓存与断点准备 ---------------------------------------
+    result_cache, owns_cache = _open_cache(cache)
+    progress = _make_progress(
+        show_progress, total_num, progress_desc, progress_callback, progress_interval,
+    )
+    ckpt = (
+        _Checkpoint(
+            checkpoint, total_num, _func_key(func), _inputs_fingerprint(items),
+            checkpoint_interval,
+        )
+        if checkpoint is not None else None
+    )
+    retry_queue = _RetryQueue(items, retries, backoff, retry_on) if retries else None
+    task_stats = _TaskStats(num_workers) if return_stats else None
+
+    # ---- 6. 提交与收集 ---------------------------------------------------
+    results: Union[list, SpilledResults] = (
+        SpilledResults(total_num, memory_limit)
+        if memory_limit is not None else [None] * total_num
+    )
+    error_count = 0
+    completed_count = 0
+    cache_keys: dict[int, str] = {}  # 未命中缓存的元素 → 缓存键
+
+    def _record(idx: int, ok: bool, value: Any) -> bool:
+        """按 error_policy 写入单个元素的结果；元素被排入重试时返回 ``False``。"""
+        nonlocal error_count
+        if ok:
+            results[idx] = value
+            if ckpt is not None:
+                ckpt.add(idx, value)
+            if cache_keys:
+                result_cache.set(cache_keys[idx], value)
+            return True
+        if retry_queue is not None and retry_queue.schedule(idx, value):
+            return False
+        error_count += 1
+        results[idx] = _apply_error_policy(idx, value, error_policy)
+        return True
+
+    try:
+        # checkpoint: 恢复已完成的元素，只提交其余部分
+        pending: Sequence[int] = range(total_num)
+        restored: dict = {}
+        if ckpt is not None:
+            restored = ckpt.load()
+            for idx, value in restored.items():
+                results[idx] = value
+            if restored:
+                pending = [i for i in range(total_num) if i not in restored]
+                completed_count = len(restored)
+                if progress is not None:
+                    progress.update(len(restored))
+
+        # cache: 命中的元素直接取回结果，只提交未命中的部分
+        if result_cache is not None and pending:
+            misses: list[int] = []
+            for idx in pending:
+                key = _cache_key(fingerprint, items[idx], cache_key)
+                value = result_cache.get(key)
+                if value is ResultCache._MISSING:
+                    cache_keys[idx] = key
+                    misses.append(idx)
+                else:
+                    results[idx] = restored[idx] = value
+            hits = len(pending) - len(misses)
+            logger.info(f"缓存命中 {hits} / {len(pending)} 个元素")
+            if hits:
+                pending = misses
+                completed_count += hits
+                if progress is not None:
+                    progress.update(hits)
+
+        def _settle(indices: Sequence[int], future: Future, stats: Optional[_TaskStats]) -> None:
+            nonlocal completed_count
+            errors_before = error_count
+            outcomes = _task_outcomes(future, indices, stats)
+            settled = sum(
+                _record(idx, ok, value) for idx, (ok, value) in zip(indices, outcomes)
+            )
+            completed_count += settled
+            if progress is not None:
+                progress.update(settled, error_count - errors_before)
+
+        # 全部命中缓存 / 断点时无需创建执行器
+        if pending or retry_queue:
+            with executor_ctx as handle:
+                # chunksize="auto": 先经执行器探测少量元素，其结果直接记录，
+                # 正式提交从其后开始
+                if chunksize == "auto" and pending:
+                    probe_stats = task_stats or _TaskStats(num_workers)
+                    probe = _ChunkProbe(items, pending, num_workers, probe_stats)
+                    with closing(_run_window(
+                        handle, func, probe.groups(), 1,
+                        task_timeout=task_timeout, recycle=method == "process",
+                        stats=probe_stats, throttle=throttle,
+                    )) as stream:
+                        for indices, future in stream:
+                            _settle(indices, future, probe_stats)
+                    chunksize = probe.chunksize()
+                    pending = pending[probe.probed:]
+                elif chunksize == "auto":
+                    chunksize = 1
+
+                logger.info(
+                    f"apply_parallel 启动 | method={method}, workers={num_workers}, "
+                    f"total={total_num}, window={window}, chunksize={chunksize}, "
+                    f"error_policy={error_policy}, "
+                    f"pool={'shared' if isinstance(pool, ParallelPool) else 'new'}",
+                )
+
+                if cost is not None:
+                    groups = _cost_groups(items, chunksize, pending, cost)
+                else:
+                    groups = _chunked(items, chunksize, pending)
+                with closing(_run_window(
+                    handle, func, groups, window, tuner,
+                    task_timeout=task_timeout, recycle=method == "process",
+                    retry_queue=retry_queue, stats=task_stats, throttle=throttle,
+                )) as stream:
+                    for indices, future in stream:
+                        _settle(indices, future, task_stats)
+
+    finally:
+        if progress is not None:
+            progress.close()
+        if tuner is not None:
+            tuner.finish()
+        if ckpt is not None:
+            ckpt.flush()
+        if result_cache is not None:
+            if owns_cache:
+                result_cache.close()
+            else:
+                result_cache.flush()
+
+    # ---- 7. 日志汇总 -----------------------------------------------------
+    if error_count:
+        logger.warning(f"共有 {error_count} / {total_num} 个任务执行失败")
+    else:
+        logger.info(f"全部 {total_num} 个任务执行完成")
+    if isinstance(results, SpilledResults) and results.spilled:
+        logger.info(
+            f"{results.spilled} / {total_num} 个结果超出内存预算 "
+            f"{memory_limit} 字节，已写入临时文件"
+        )
+    if retry_queue is not None and retry_queue.attempts:
+        logger.info(
+            f"{len(retry_queue.attempts)} 个元素发生重试，共重试 "
+            f"{sum(retry_queue.attempts.values()) - len(retry_queue.attempts)} 次"
+        )
+
+    attempts: List[int] = []
+    if return_attempts:
+        attempts = [0 if i in restored else 1 for i in range(total_num)]
+        if retry_queue is not None:
+            for idx, n in retry_queue.attempts.items():
+                attempts[idx] = n
+    stats: dict = {}
+    if task_stats is not None:
+        stats = task_stats.report()
+        logger.info(
+            f"apply_parallel 统计 | 执行 p50={stats['execution_ms']['p50']:.2f}ms "
+            f"p99={stats['execution_ms']['p99']:.2f}ms, "
+            f"排队 p50={stats['queue_wait_ms']['p50']:.2f}ms, "
+            f"worker 利用率={stats['utilization']:.0%}, "
+            f"慢任务 {len(stats['stragglers'])} 个, 瓶颈={stats['bottleneck']}"
+        )
+    return _with_extras(results, attempts, stats, return_attempts, return_stats)
+
+
+def _with_extras(
+    results: list,
+    attempts: List[int],
+    stats: dict,
+    return_attempts: bool,
+    return_stats: bool,
+) -> Union[List[Any], tuple]:
+    """按 return_attempts / return_stats 组装 apply_parallel 的返回值。"""
+    if not (return_attempts or return_stats):
+        return results
+    extras = ([attempts] if return_attempts else []) + ([stats] if return_stats else [])
+    return (results, *extras)
+
+
+async def apply_parallel_async(
+    iterable: Iterable,
+    func: Callable,
+    num_workers: int = ASYNC_CONCURRENCY,
+    show_progress: bool = True,
+    total_num: Optional[int] = None,
+    error_policy: Literal["store", "raise", "ignore"] = "store",
+    progress_desc: Optional[str] = None,
+    progress_callback: Union[Callable[[dict], None], Literal["log"], None] = None,
+    progress_interval: float = PROGRESS_INTERVAL,
+    task_timeout: Optional[float] = None,
+) -> List[Any]:
+    """在当前事件循环中并发执行协程函数 *func*，返回与输入顺序一致的结果列表。
+
+    启动 ``num_workers`` 个常驻协程，各自从共享下标序列中领取元素并
+    ``await func(...)``，因此同时只存在 ``num_workers`` 个在途调用，
+    且不会为每个元素预先创建 Task。元素解包规则与 ``apply_parallel`` 相同；
+    若 func 返回非 awaitable 对象，则直接作为结果。
+
+    Parameters
+    ----------
+    num_workers : int, default ``ASYNC_CONCURRENCY``
+        最大并发协程数（默认 1000，可由环境变量 ``ASYNC_CONCURRENCY`` 覆盖）。
+    task_timeout : float | None, default ``None``
+        单个协程的最长执行时间（秒），经 ``asyncio.wait_for`` 实现，超时的
+        协程被取消，该元素以 ``TimeoutError`` 按 error_policy 处理。
+
+    其余参数含义与 ``apply_parallel`` 相同。
+
+    Examples
+    --------
+    >>> async def fetch(url):
+    ...     async with session.get(url) as resp:
+    ...         return await resp.text()
+    >>> pages = await apply_parallel_async(urls, fetch, num_workers=2000)
+    """
+    _validate_options("async", error_policy)
+    if task_timeout is not None and task_timeout <= 0:
+        raise ValueError(f"task_timeout 须为正数，收到: {task_timeout!r}")
+    items, inferred_total = _resolve_iterable(iterable)
+    total_num = total_num or inferred_total
+    if total_num == 0:
+        return []
+    num_workers = max(1, min(num_workers, total_num))
+
+    logger.info(
+        f"apply_parallel_async 启动 | concurrency={num_workers}, "
+        f"total={total_num}, error_policy={error_policy}"
+    )
+
+    results: list = [None] * total_num
+    error_count = 0
+    indices = iter(range(total_num))
+    progress = _make_progress(
+        show_progress, total_num, progress_desc, progress_callback, progress_interval,
+    )
+
+    async def _worker() -> None:
+        nonlocal error_count
+        # 单线程事件循环内 next(indices) 不会被并发打断，无需加锁
+        for idx in indices:
+            try:
+                ret = _call_func(func, items[idx])
+                if inspect.isawaitable(ret):
+                    try:
+                        ret = await asyncio.wait_for(ret, task_timeout)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"任务执行超过 {task_timeout}s，已取消") from None
+                results[idx] = ret
+                failed = 0
+            except Exception as exc:
+                error_count += 1
+                failed = 1
+                results[idx] = _apply_error_policy(idx, exc, error_policy)
+            if progress is not None:
+                progress.update(1, failed)
+
+    workers = [asyncio.ensure_future(_worker()) for _ in range(num_workers)]
+    try:
+        # raise 策略下首个异常即返回，finally 中取消其余 worker
+        await asyncio.gather(*workers)
+    finally:
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if progress is not None:
+            progress.close()
+
+    if error_count:
+        logger.warning(f"共有 {error_count} / {total_num} 个任务执行失败")
+    else:
+        logger.info(f"全部 {total_num} 个任务执行完成")
+    return results
+
+
+def _fold_chunk(
+    func: Callable,
+    reducer: Callable,
+    initial: Any,
+    error_policy: str,
+    elements: Sequence,
+) -> tuple[Any, list[tuple[int, BaseException]]]:
+    """在 worker 中对一块元素执行 func 并用 reducer 就地折叠。
+
+    返回 ``(部分聚合值, [(块内位置, 异常), ...])``；``error_policy="raise"``
+    时遇到首个异常即停止。initial 先深拷贝，thread 模式下各块互不干扰。
+    """
+    acc = copy.deepcopy(initial)
+    failures: list[tuple[int, BaseException]] = []
+    for pos, elem in enumerate(elements):
+        try:
+            acc = reducer(acc, _call_func(func, elem))
+        except Exception as exc:
+            failures.append((pos, exc))
+            if error_policy == "raise":
+                break
+    return acc, failures
+
+
+def apply_reduce(
+    iterable: Iterable,
+    func: Callable,
+    reducer: Callable[[Any, Any], Any],
+    initial: Any,
+    method: Literal["thread", "process", "interpreter", "remote"] = "thread",
+    num_workers: int = NUM_WORKERS,
+    combiner: Optional[Callable[[Any, Any], Any]] = None,
+    chunksize: Optional[int] = None,
+    show_progress: bool = True,
+    total_num: Optional[int] = None,
+    error_policy: Literal["raise", "ignore"] = "raise",
+    progress_desc: Optional[str] = None,
+    pool: Union[ParallelPool, bool, None] = None,
+) -> Any:
+    """并行执行 *func* 并把结果归约为单个值，等价于
+    ``functools.reduce(reducer, map(func, iterable), initial)``。
+
+    输入按 chunksize 切块，每块作为一个任务在 worker 中从 ``initial`` 的副本
+    开始逐个折叠（``acc = reducer(acc, func(elem))``），只有部分聚合值回传
+    主进程，再按块的顺序用 combiner 合并。输入以流式方式读取，不会整体
+    物化。
+
+    Parameters
+    ----------
+    reducer : callable
+        ``reducer(acc, result) -> acc``，worker 内的折叠函数。
+    initial : Any
+        折叠初值，每块使用其深拷贝（如 ``0``、``Counter()``）。
+    combiner : callable | None, default ``None``
+        ``combiner(acc, partial) -> acc``，主进程合并各块部分聚合值的函数，
+        默认与 reducer 相同（适用于 ``operator.add`` 等结果与聚合值同类型的
+        情形）。合并按块的输入顺序进行，只要求满足结合律，不要求交换律。
+    chunksize : int | None, default ``None``
+        每块的元素数。默认在总数已知时取 ``ceil(总数 / (num_workers * 4))``，
+        使每个 worker 约分到 4 块；否则为 ``_REDUCE_CHUNKSIZE``。
+    error_policy : ``"raise"`` | ``"ignore"``, default ``"raise"``
+        ``"ignore"`` 时跳过（并记录）失败的元素，不计入聚合。
+
+    其余参数（``method`` / ``num_workers`` / ``show_progress`` / ``total_num`` /
+    ``progress_desc`` / ``pool``）含义与 ``apply_parallel`` 相同。
+
+    Returns
+    -------
+    Any
+        全部元素归约后的结果；输入为空时返回 ``initial``。
+
+    Examples
+    --------
+    >>> from collections import Counter
+    >>> counts = apply_reduce(
+    ...     lines, lambda line: Counter(line.split()), operator.add, Counter(),
+    ...     method="process",
+    ... )
+    """
+    if isinstance(pool, ParallelPool):
+        method, num_workers = pool.method, pool.num_workers
+    method = _resolve_method(method)
+    _validate_options(method, error_policy, tuple(_EXECUTOR_MAP))
+    if error_policy == "store":
+        raise ValueError("apply_reduce 的 error_policy 仅支持 'raise' / 'ignore'")
+    if chunksize is not None and (not isinstance(chunksize, int) or chunksize < 1):
+        raise ValueError(f"chunksize 参数须为正整数，收到: {chunksize!r}")
+    combiner = combiner or reducer
+
+    if total_num is None and hasattr(iterable, "__len__"):
+        total_num = len(iterable)
+    if total_num == 0:
+        return initial
+    num_workers = max(1, num_workers)
+    if chunksize is None:
+        chunksize = (
+            math.ceil(total_num / (num_workers * _WINDOW_FACTOR))
+            if total_num else _REDUCE_CHUNKSIZE
+        )
+    if pool is True:
+        pool = get_pool(method, num_workers)
+
+    logger.info(
+        f"apply_reduce 启动 | method={method}, workers={num_workers}, "
+        f"total={total_num}, chunksize={chunksize}"
+    )
+
+    # 每块作为单个任务提交：元素组包成 (块,)，经 _call_func 解包后整块传入
+    fold = functools.partial(_fold_chunk, func, reducer, initial, error_policy)
+    spans: dict[int, range] = {}
+
+    def _tasks() -> Iterator[tuple[Sequence[int], list]]:
+        for chunk_no, (span, group) in enumerate(
+            _iter_groups(_iter_elements(iterable), chunksize)
+        ):
+            spans[chunk_no] = span
+            yield (chunk_no,), [(group,)]
+
+    progress = _make_progress(show_progress, total_num, progress_desc)
+    acc = copy.deepcopy(initial)
+    partials: dict[int, Any] = {}  # 已完成但尚未轮到合并的块
+    next_chunk = 0
+    error_count = 0
+    try:
+        with _executor_context(pool, method, num_workers) as handle, closing(
+            _run_window(handle, fold, _tasks(), num_workers * _WINDOW_FACTOR)
+        ) as stream:
+            for (chunk_no,), future in stream:
+                span = spans.pop(chunk_no)
+                (ok, value), = _task_outcomes(future, (chunk_no,))
+                if not ok:
+                    # 整块在池层面失败（如序列化错误）：块内每个元素都计为失败
+                    value = (copy.deepcopy(initial), [(pos, value) for pos in range(len(span))])
+                partial, failures = value
+                for pos, exc in failures:
+                    error_count += 1
+                    _apply_error_policy(span[pos], exc, error_policy)
+                partials[chunk_no] = partial
+                while next_chunk in partials:
+                    acc = combiner(acc, partials.pop(next_chunk))
+                    next_chunk += 1
+                if progress is not None:
+                    progress.update(len(span), len(failures))
+    finally:
+        if progress is not None:
+            progress.close()
+
+    if error_count:
+        logger.warning(f"apply_reduce 完成 | 跳过 {error_count} 个失败元素")
+    else:
+        logger.info(f"apply_reduce 完成 | 共 {next_chunk} 块")
+    return acc
+
+
+def apply_sharded(
+    data: Any,
+    func: Callable,
+    method: Literal["thread", "process"] = "process",
+    num_workers: int = NUM_WORKERS,
+    shard_size: Optional[int] = None,
+    show_progress: bool = True,
+    progress_desc: Optional[str] = None,
+    pool: Optional[ParallelPool] = None,
+) -> Any:
+    """列批模式：按行区间切分 DataFrame / ndarray，对每个分片调用向量化的 *func*。
+
+    与 ``apply_parallel`` 逐行转 dict 再逐条 pickle 不同，process 模式下数据
+    只写出一次：可映射的列（数值 / 布尔 / 时间类型）保存为 ``.npy`` 文件
+    （优先位于 ``/dev/shm``），worker 以只读 mmap 打开并按 ``[start, stop)``
+    切视图，不经过 pickle；object 等无法映射的列（及同类 dtype 的
+    ndarray）按分片随任务发送。thread 模式下直接传递切片视图。
+
+    Parameters
+    ----------
+    data : pandas.DataFrame | numpy.ndarray
+        待处理数据，ndarray 按第 0 维切分。
+    func : callable
+        ``func(shard) -> result``，shard 为与 ``data`` 同类型的行切片。
+        process 模式下 ndarray 列为只读视图，func 不应原地修改。
+    method : ``"thread"`` | ``"process"``, default ``"process"``
+    num_workers : int, default ``NUM_WORKERS``
+    shard_size : int | None, default ``None``
+        每个分片的行数，默认 ``ceil(行数 / (num_workers * 4))``。
+    pool : ParallelPool | None, default ``None``
+        复用已有执行器池（此时 ``method`` / ``num_workers`` 取自池）。
+
+    Returns
+    -------
+    Any
+        各分片结果按行顺序拼接：DataFrame / Series 使用 ``pd.concat``，
+        ndarray 使用 ``np.concatenate``，list 展平；其他类型返回分片结果列表。
+
+    Raises
+    ------
+    TypeError
+        当 ``data`` 不是 DataFrame 或 ndarray 时。
+    RuntimeError
+        任一分片执行失败时（封装原始异常）。
+
+    Examples
+    --------
+    >>> out = apply_sharded(df, lambda part: part["a"] * 2 + part["b"])
+    >>> assert out.equals(df["a"] * 2 + df["b"])
+    """
+    if pool is not None:
+        method, num_workers = pool.method, pool.num_workers
+    method = _resolve_method(method)
+    _validate_options(method, "raise", tuple(_EXECUTOR_MAP))
+
+    pd, np = _get_pd(), _get_np()
+    is_frame = pd is not None and isinstance(data, pd.DataFrame)
+    if not is_frame and not (np is not None and isinstance(data, np.ndarray)):
+        raise TypeError(
+            f"apply_sharded 仅支持 pandas.DataFrame / numpy.ndarray，收到: {type(data).__name__}"
+        )
+
+    total_num = len(data)
+    if total_num == 0:
+        return _concat_shards([func(data)])
+    num_workers = max(1, min(num_workers, total_num))
+    shard_size = shard_size or -(-total_num // (num_workers * _WINDOW_FACTOR))
+    bounds = [
+        (start, min(start + shard_size, total_num))
+        for start in range(0, total_num, shard_size)
+    ]
+
+    logger.info(
+        f"apply_sharded 启动 | method={method}, workers={num_workers}, "
+        f"rows={total_num}, shards={len(bounds)}, shard_size={shard_size}"
+    )
+
+    shard_dir = None
+    spec: dict = {}
+    unmapped: dict = {}
+    pbar = _make_pbar(show_progress, len(bounds), progress_desc)
+    try:
+        if method == "process":
+            shard_dir = tempfile.mkdtemp(
+                prefix="mp_shard_",
+                dir="/dev/shm" if os.path.isdir("/dev/shm") else None,
+            )
+            spec, unmapped = _write_shard_spec(data, is_frame, shard_dir)
+
+        with _executor_context(pool, method, num_workers) as handle:
+            executor = handle.executor
+            futures = []
+            for start, stop in bounds:
+                if method == "thread":
+                    part = data.iloc[start:stop] if is_frame else data[start:stop]
+                    futures.append(executor.submit(func, part))
+                    continue
+                extra = {pos: col[start:stop] for pos, col in unmapped.items()}
+                index = data.index[start:stop] if is_frame else None
+                futures.append(executor.submit(
+                    _run_shard, func, spec, start, stop, extra, index,
+                ))
+
+            parts: list = [None] * len(futures)
+            future_to_pos = {fut: pos for pos, fut in enumerate(futures)}
+            for fut in as_completed(future_to_pos):
+                pos = future_to_pos[fut]
+                try:
+                    parts[pos] = fut.result()
+                except Exception as exc:
+                    for f in futures:
+                        f.cancel()
+                    start, stop = bounds[pos]
+                    _apply_error_policy(start, exc, "raise")
+                if pbar is not None:
+                    pbar.update(1)
+    finally:
+        if pbar is not None:
+            pbar.close()
+        if shard_dir is not None:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+
+    logger.info(f"apply_sharded 完成 | {len(bounds)} 个分片")
+    return _concat_shards(parts)
+
+
+def _write_shard_spec(data: Any, is_frame: bool, directory: str) -> tuple[dict, dict]:
+    """将可映射的数据写入 directory，返回 (worker 侧 spec, 需按分片发送的列)。"""
+    np = _get_np()
+    if not is_frame:
+        if data.dtype.kind not in _MAPPABLE_KINDS:
+            # object 等 dtype 无法 mmap，与 DataFrame 的不可映射列一样按分片发送
+            logger.info(f"apply_sharded: dtype={data.dtype} 无法内存映射，将按分片随任务发送")
+            return {"kind": "ndarray", "dir": directory, "path": None}, {0: data}
+        path = os.path.join(directory, "data.npy")
+        np.save(path, np.ascontiguousarray(data))
+        return {"kind": "ndarray", "dir": directory, "path": path}, {}
+
+    is_extension = _get_pd().api.types.is_extension_array_dtype
+    mapped: List[tuple[int, str]] = []
+    unmapped: dict = {}
+    for pos in range(data.shape[1]):
+        column = data.iloc[:, pos]
+        if is_extension(column.dtype):
+            # to_numpy() 会丢失扩展类型（Categorical → object、Int64 → float/NaN），原样发送
+            unmapped[pos] = column.array
+            continue
+        values = column.to_numpy()
+        if values.dtype.kind in _MAPPABLE_KINDS:
+            path = os.path.join(directory, f"col_{pos}.npy")
+            np.save(path, np.ascontiguousarray(values))
+            mapped.append((pos, path))
+        else:
+            unmapped[pos] = values
+    if unmapped:
+        logger.info(
+            f"apply_sharded: {len(unmapped)} 列无法内存映射，将按分片随任务发送"
+        )
+    spec = {
+        "kind": "frame",
+        "dir": directory,
+        "columns": list(data.columns),
+        "mapped": mapped,
+    }
+    return spec, unmapped
+
+
+def imap_parallel(
+    iterable: Iterable,
+    func: Callable,
+    method: Literal["thread", "process"] = "thread",
+    num_workers: int = NUM_WORKERS,
+    ordered: bool = True,
+    max_in_flight: Optional[int] = None,
+    show_progress: bool = True,
+    total_num: Optional[int] = None,
+    error_policy: Literal["store", "raise", "ignore"] = "store",
+    progress_desc: Optional[str] = None,
+    pool: Union[ParallelPool, bool, None] = None,
+    chunksize: int = 1,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+    shared: Any = _UNSET,
+    progress_callback: Union[Callable[[dict], None], Literal["log"], None] = None,
+    progress_interval: float = PROGRESS_INTERVAL,
+) -> Iterator[Any]:
+    """``apply_parallel`` 的流式版本：惰性消费输入，边完成边 yield 结果。
+
+    输入迭代器只在有空闲窗口时才被拉取，在途任务数（含保序模式下已完成
+    但尚未 yield 的任务）不超过 ``max_in_flight``，消费方处理得慢时会自然
+    形成背压。适合处理无法整体放入内存的超大输入 / 输出。
+
+    Parameters
+    ----------
+    ordered : bool, default ``True``
+        ``True`` 时按输入顺序 yield；``False`` 时按完成顺序 yield，
+        慢任务不会阻塞其后已完成的结果。
+    max_in_flight : int | None, default ``None``
+        同时在途的最大任务数，默认 ``num_workers * 2``。
+    chunksize : int, default ``1``
+        每个任务打包的元素个数（不支持 ``"auto"``）。
+
+    其余参数（``method`` / ``num_workers`` / ``show_progress`` / ``total_num`` /
+    ``error_policy`` / ``progress_desc`` / ``pool`` / ``initializer`` /
+    ``initargs`` / ``shared`` / ``progress_callback`` / ``progress_interval``）
+    含义与 ``apply_parallel`` 相同；``error_policy="store"`` / ``"ignore"`` 时失败元素分别 yield 异常
+    对象 / ``None``。
+
+    Yields
+    ------
+    Any
+        每个输入元素对应的结果。
+
+    Examples
+    --------
+    >>> with open("big.txt") as f:
+    ...     for n in imap_parallel(f, len, show_progress=False):
+    ...         ...
+    """
+    if isinstance(pool, ParallelPool):
+        method, num_workers = pool.method, pool.num_workers
+    method = _resolve_method(method)
+    _validate_options(method, error_policy, tuple(_EXECUTOR_MAP))
+    if not isinstance(chunksize, int) or chunksize < 1:
+        raise ValueError(
+            f"imap_parallel 的 chunksize 参数须为正整数，收到: {chunksize!r}"
+        )
+    num_workers = max(1, num_workers)
+    window = max(1, max_in_flight or num_workers * 2)
+
+    if total_num is None and hasattr(iterable, "__len__"):
+        total_num = len(iterable)
+
+    if pool is True:
+        pool = get_pool(method, num_workers)
+
+    # 参数校验在调用时立即完成；执行器在首次迭代时才创建
+    return _imap_stream(
+        iterable, func, method, num_workers, ordered, window, show_progress,
+        total_num, error_policy, progress_desc, pool, chunksize,
+        shared, initializer, initargs, progress_callback, progress_interval,
+    )
+
+
+def _imap_stream(
+    iterable: Iterable,
+    func: Callable,
+    method: str,
+    num_workers: int,
+    ordered: bool,
+    window: int,
+    show_progress: bool,
+    total_num: Optional[int],
+    error_policy: str,
+    progress_desc: Optional[str],
+    pool: Optional[ParallelPool],
+    chunksize: int,
+    shared: Any,
+    initializer: Optional[Callable],
+    initargs: tuple,
+    progress_callback: Union[Callable[[dict], None], str, None],
+    progress_interval: float,
+) -> Iterator[Any]:
+    """imap_parallel 的生成器实现：有界窗口提交，按序或按完成顺序 yield。"""
+    logger.info(
+        f"imap_parallel 启动 | method={method}, workers={num_workers}, "
+        f"window={window}, ordered={ordered}, chunksize={chunksize}, "
+        f"error_policy={error_policy}"
+    )
+
+    groups = _iter_groups(_iter_elements(iterable), chunksize)
+    executor_ctx = _executor_context(
+        pool, method, num_workers, shared, initializer, initargs,
+    )
+
+    progress = _make_progress(
+        show_progress, total_num, progress_desc, progress_callback, progress_interval,
+    )
+    error_count = 0
+    done_count = 0
+    # 保序模式下按提交顺序排列的 (Future, 下标区间)
+    ordered_queue: deque = deque()
+
+    def _resolve(future: Future, indices: range) -> List[Any]:
+        nonlocal error_count, done_count
+        n = len(indices)
+        values = []
+        failed = 0
+        for idx, (ok, value) in zip(indices, _task_outcomes(future, indices)):
+            if not ok:
+                error_count += 1
+                failed += 1
+                value = _apply_error_policy(idx, value, error_policy)
+            values.append(value)
+        done_count += n
+        if progress is not None:
+            progress.update(n, failed)
+        return values
+
+    try:
+        with executor_ctx as handle:
+            executor = handle.executor
+            if not ordered:
+                with closing(_run_window(handle, func, groups, window)) as stream:
+                    for indices, fut in stream:
+                        yield from _resolve(fut, indices)
+                return
+
+            for indices, group in groups:
+                # 窗口已满：等待队首完成并 yield 后才继续从输入拉取（背压）；
+                # 已完成但未轮到的任务仍占用窗口，保证缓冲有界
+                if len(ordered_queue) >= window:
+                    yield from _resolve(*ordered_queue.popleft())
+                fut = _submit_task(executor, func, group)
+                ordered_queue.append((fut, indices))
+            while ordered_queue:
+                yield from _resolve(*ordered_queue.popleft())
+    finally:
+        # 消费方提前退出或出现异常时，取消尚未开始的任务
+        for fut, _ in ordered_queue:
+            fut.cancel()
+        if progress is not None:
+            progress.close()
+        logger.info(
+            f"imap_parallel 结束 | 完成 {done_count} 个, 失败 {error_count} 个"
+        )
+
+
+# ---------------------------------------------------------------------------
+# 流水线（Pipeline）
+# ---------------------------------------------------------------------------
+
+_STAGE_DONE = object()  # 级间队列的结束标记
+
+
+class _StageFailed:
+    """级间队列中传递的异常包装：下游取到后原样抛出。"""
+
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+def _filter_call(predicate: Callable, whole: bool, element: Any) -> tuple[bool, Any]:
+    """filter 级的 worker 函数：返回 ``(是否保留, 原元素)``。
+
+    whole 为 ``True``（上游为 batch 阶段）时把整个元素作为单个参数传入。
+    """
+    keep = predicate(element) if whole else _call_func(predicate, element)
+    return bool(keep), element
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """将迭代器按 size 个一组打包为 list，最后一组可能不足 size 个。"""
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Pipeline:
+    """由多个并行阶段串联而成的流水线。
+
+    每个 ``map`` / ``filter`` 阶段在独立的后台线程中通过
+    :func:`imap_parallel` 驱动自己的执行器，产出写入容量为 ``queue_size``
+    的有界队列，下一阶段从该队列惰性取数。因此下一阶段无需等待上一阶段
+    全部完成即可开始，且任意时刻驻留内存的中间结果不超过各级队列与在途
+    窗口之和；下游慢时队列写满，上游自然阻塞（背压）。
+    ``batch`` 阶段只做打包，不占用线程与执行器；紧随其后的阶段把每个
+    批次（list）作为单个参数传给 func，而不是按元素解包规则展开。
+
+    Examples
+    --------
+    >>> pipe = (
+    ...     Pipeline()
+    ...     .map(download, method="thread", num_workers=32)
+    ...     .map(decode, method="process", num_workers=8)
+    ...     .filter(lambda img: img is not None)
+    ...     .batch(64)
+    ...     .map(write_batch, num_workers=2)
+    ... )
+    >>> for written in pipe.run(urls):
+    ...     ...
+    """
+
+    def __init__(self) -> None:
+        self._stages: list[tuple[str, Any, dict]] = []
+
+    def __repr__(self) -> str:
+        names = [
+            f"batch({arg})" if kind == "batch"
+            else f"{kind}({getattr(arg, '__name__', arg)}, {opts['method']})"
+            for kind, arg, opts in self._stages
+        ]
+        return f"Pipeline({' -> '.join(names)})"
+
+    def map(
+        self,
+        func: Callable,
+        method: Literal["thread", "process", "remote"] = "thread",
+        num_workers: int = NUM_WORKERS,
+        ordered: bool = True,
+        chunksize: int = 1,
+        error_policy: Literal["store", "raise", "ignore"] = "raise",
+        queue_size: Optional[int] = None,
+        pool: Union[ParallelPool, bool, None] = None,
+    ) -> Pipeline:
+        """追加一个 map 阶段：对每个元素调用 func，元素解包规则与 ``apply_parallel`` 相同。
+
+        Parameters
+        ----------
+        queue_size : int | None, default ``None``
+            本阶段输出队列的容量，默认 ``num_workers * 2``。
+        error_policy : str, default ``"raise"``
+            默认任一元素失败即中止整条流水线；``"store"`` / ``"ignore"`` 时
+            异常对象 / ``None`` 会作为结果继续流向下一阶段。
+
+        其余参数含义与 :func:`imap_parallel` 相同。
+        """
+        return self._add("map", func, method, num_workers, ordered, chunksize,
+                         error_policy, queue_size, pool)
+
+    def filter(
+        self,
+        predicate: Callable,
+        method: Literal["thread", "process", "remote"] = "thread",
+        num_workers: int = NUM_WORKERS,
+        ordered: bool = True,
+        chunksize: int = 1,
+        error_policy: Literal["store", "raise", "ignore"] = "raise",
+        queue_size: Optional[int] = None,
+        pool: Union[ParallelPool, bool, None] = None,
+    ) -> Pipeline:
+        """追加一个 filter 阶段：只保留 predicate 返回真值的元素。
+
+        predicate 在执行器中并行求值；``error_policy`` 为 ``"store"`` /
+        ``"ignore"`` 时求值失败的元素被丢弃。其余参数同 :meth:`map`。
+        """
+        return self._add("filter", predicate, method, num_workers, ordered,
+                         chunksize, error_policy, queue_size, pool)
+
+    def batch(self, size: int) -> Pipeline:
+        """追加一个 batch 阶段：将上游元素每 size 个打包为一个 list。"""
+        if not isinstance(size, int) or size < 1:
+            raise ValueError(f"batch size 须为正整数，收到: {size!r}")
+        self._stages.append(("batch", size, {}))
+        return self
+
+    def _add(self, kind, func, method, num_workers, ordered, chunksize,
+             error_policy, queue_size, pool) -> Pipeline:
+        if isinstance(pool, ParallelPool):
+            method, num_workers = pool.method, pool.num_workers
+        method = _resolve_method(method)
+        _validate_options(method, error_policy, tuple(_EXECUTOR_MAP))
+        if not isinstance(chunksize, int) or chunksize < 1:
+            raise ValueError(f"chunksize 参数须为正整数，收到: {chunksize!r}")
+        num_workers = max(1, num_workers)
+        self._stages.append((kind, func, {
+            "method": method,
+            "num_workers": num_workers,
+            "ordered": ordered,
+            "chunksize": chunksize,
+            "error_policy": error_policy,
+            "queue_size": max(1, queue_size or num_workers * 2),
+            "pool": pool,
+        }))
+        return self
+
+    def run(
+        self,
+        iterable: Iterable,
+        show_progress: bool = False,
+        progress_desc: Optional[str] = None,
+    ) -> Iterator[Any]:
+        """惰性执行流水线，逐个 yield 最后一个阶段的输出。
+
+        各阶段线程在首次迭代时启动；迭代提前结束（break / 异常）时通知所有
+        阶段停止取数，并等待其在途任务结束。任一阶段抛出的异常会在消费方
+        的迭代处重新抛出。
+        """
+        stop = threading.Event()
+        threads: list[threading.Thread] = []
+        stream: Iterable = iterable
+        after_batch = False
+        for kind, arg, opts in self._stages:
+            if kind == "batch":
+                stream = _batched(stream, arg)
+                after_batch = True
+                continue
+            out: queue.Queue = queue.Queue(maxsize=opts["queue_size"])
+            thread = threading.Thread(
+                target=self._run_stage,
+                args=(kind, arg, opts, stream, out, stop, after_batch),
+                name=f"pipeline-{len(threads)}-{kind}", daemon=True,
+            )
+            threads.append(thread)
+            stream = self._drain(out, stop)
+            after_batch = False
+
+        logger.info(f"{self!r} 启动")
+        progress = _make_progress(show_progress, None, progress_desc)
+        count = 0
+        try:
+            for thread in threads:
+                thread.start()
+            for value in stream:
+                count += 1
+                if progress is not None:
+                    progress.update(1)
+                yield value
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            if progress is not None:
+                progress.close()
+            logger.info(f"{self!r} 结束 | 输出 {count} 个元素")
+
+    @staticmethod
+    def _run_stage(kind, func, opts, upstream, out, stop, whole) -> None:
+        """阶段线程：用 imap_parallel 处理上游数据，结果写入有界队列。"""
+
+        def _put(value) -> bool:
+            # 队列满时阻塞，但定期检查 stop，避免下游已退出时永久挂起
+            while not stop.is_set():
+                try:
+                    out.put(value, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        options = {k: v for k, v in opts.items() if k != "queue_size"}
+        # 包成单元素 tuple，使元素（或整个批次）作为一个参数传入
+        if kind == "filter":
+            upstream = ((elem,) for elem in upstream)
+            func = functools.partial(_filter_call, func, whole)
+        elif whole:
+            upstream = ((elem,) for elem in upstream)
+        try:
+            results = imap_parallel(upstream, func, show_progress=False, **options)
+            with closing(results):
+                for value in results:
+                    if kind == "filter":
+                        if not isinstance(value, tuple):
+                            continue  # 求值失败（store / ignore）的元素直接丢弃
+                        keep, value = value
+                        if not keep:
+                            continue
+                    if not _put(value):
+                        return
+        except BaseException as exc:
+            _put(_StageFailed(exc))
+            return
+        _put(_STAGE_DONE)
+
+    @staticmethod
+    def _drain(out: queue.Queue, stop: threading.Event) -> Iterator[Any]:
+        """从阶段输出队列取数，直到结束标记；stop 置位后立即结束。"""
+        while not stop.is_set():
+            try:
+                value = out.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if value is _STAGE_DONE:
+                return
+            if isinstance(value, _StageFailed):
+                raise value.exc
+            yield value
+
+
+def _main(argv: Optional[List[str]] = None) -> None:
+    """命令行入口：``python -m my_toolkit.mp --host 127.0.0.1 --port 6000``。"""
+    parser = argparse.ArgumentParser(description="my_toolkit.mp 远程 worker 服务")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="监听地址，对外提供服务时显式指定（如 0.0.0.0）")
+    parser.add_argument("--port", type=int, default=6000)
+    parser.add_argument("--authkey", default=None, help="默认取 MP_REMOTE_AUTHKEY")
+    args = parser.parse_args(argv)
+    serve_worker((args.host, args.port), args.authkey)
 
-    # ---- 7. 日志汇总 -----------------------------------------------------
-    if error_count:
-        logger.warning(f"共有 {error_count} / {total_num} 个任务执行失败")
-    else:
-        logger.info(f"全部 {total_num} 个任务执行完成")
 
-    return results
\ No newline at end of file
+if __name__ == "__main__":
+    _main()
@@ -7,8 +7,13 @@ from __future__ import annotations
 
 import contextlib
 import io
+import math
+import random
+import threading
 import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 from pathlib import Path
 import sys
 import importlib
@@ -83,6 +88,194 @@ class TestBenchmark(unittest.TestCase):
         self.assertEqual(report["success_count"], 0)
 
 
+class TestOpenLoop(unittest.TestCase):
+    def _run(self, func, data, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            return bench_mod.benchmark(func, data, show_progress=False, **kwargs)
+
+    def test_arrival_offsets(self):
+        self.assertEqual(list(bench_mod._arrival_offsets(4, 2.0, "constant", None)),
+                         [0.0, 0.5, 1.0, 1.5])
+        poisson = list(bench_mod._arrival_offsets(2000, 100.0, "poisson", 7))
+        self.assertEqual(poisson, list(bench_mod._arrival_offsets(2000, 100.0, "poisson", 7)))
+        self.assertEqual(poisson, sorted(poisson))
+        # 平均间隔约为 1/rate
+        self.assertAlmostEqual(poisson[-1] / 1999, 0.01, delta=0.002)
+
+    def test_paced_by_rate(self):
+        report = self._run(inc, list(range(10)), concurrency=2, rate=50.0)
+        self.assertEqual(report["mode"], "open")
+        self.assertEqual(report["target_qps"], 50.0)
+        self.assertEqual(report["success_count"], 10)
+        self.assertEqual(report["results"], [x + 1 for x in range(10)])
+        # 第 10 个请求计划在 0.18s 发出
+        self.assertGreaterEqual(report["total_time"], 0.17)
+
+    def test_latency_includes_queueing(self):
+        # 单 worker 服务耗时 20ms，以 200 QPS 到达 —— 请求持续排队
+        report = self._run(slow, list(range(20)), concurrency=1, rate=200.0)
+        service_p99 = report["service_latency_stats"]["p99"]
+        self.assertLess(service_p99, 100)
+        self.assertGreater(report["latency_stats"]["p99"], 3 * service_p99)
+
+        closed = self._run(slow, list(range(20)), concurrency=1)
+        self.assertEqual(closed["mode"], "closed")
+        self.assertEqual(closed["latency_stats"], closed["service_latency_stats"])
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            bench_mod.benchmark(inc, [1], rate=0, show_progress=False)
+        with self.assertRaises(ValueError):
+            bench_mod.benchmark(inc, [1], rate=10, arrival="burst", show_progress=False)
+
+    def test_report_prints_open_loop_section(self):
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(io.StringIO()):
+            bench_mod.benchmark(inc, [1, 2], rate=100.0, arrival="poisson", seed=1, show_progress=False)
+        self.assertIn("open-loop 100.0 QPS (poisson)", buf.getvalue())
+        self.assertIn("Service time", buf.getvalue())
+
+
+_capacity = threading.Semaphore(4)
+
+
+def capped(x: int) -> int:
+    # 模拟只能同时处理 4 个请求、单次 10ms 的服务
+    with _capacity:
+        time.sleep(0.01)
+    return x
+
+
+class TestStages(unittest.TestCase):
+    def _run(self, func, data, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            return bench_mod.benchmark(func, data, show_progress=False, **kwargs)
+
+    def test_ramp_stages(self):
+        self.assertEqual(bench_mod.ramp_stages(10, 50, 20, hold=5), [(10, 5), (30, 5), (50, 5)])
+        self.assertEqual(bench_mod.ramp_stages(1, 4, 2, hold=1), [(1, 1), (3, 1), (4, 1)])
+        with self.assertRaises(ValueError):
+            bench_mod.ramp_stages(5, 1, 1, hold=1)
+
+    def test_per_stage_report_and_saturation(self):
+        stages = [(1, 0.2), (2, 0.2), (4, 0.2), (8, 0.2), (16, 0.2)]
+        report = self._run(capped, list(range(7)), stages=stages)
+
+        self.assertEqual([st["concurrency"] for st in report["stages"]], [1, 2, 4, 8, 16])
+        self.assertEqual(report["concurrency"], 16)
+        self.assertEqual(report["total_requests"], sum(st["requests"] for st in report["stages"]))
+        self.assertEqual(report["results"], list(range(7)))
+        for st in report["stages"]:
+            self.assertEqual(st["error_rate"], 0.0)
+            self.assertGreater(st["requests"], 0)
+        # 容量为 4：4 以内 QPS 近似线性，之后进入平台期
+        qps = [st["qps"] for st in report["stages"]]
+        self.assertGreater(qps[2], qps[0] * 2.5)
+        sat = report["saturation"]
+        self.assertIsNotNone(sat)
+        self.assertEqual(sat["knee_concurrency"], 4)
+        self.assertEqual(sat["concurrency"], 8)
+
+    def test_stages_share_one_pool(self):
+        created = []
+
+        class CountingPool(ThreadPoolExecutor):
+            def __init__(self, max_workers=None):
+                created.append(max_workers)
+                super().__init__(max_workers=max_workers)
+
+        with mock.patch.dict(bench_mod._EXECUTOR_MAP, {"thread": CountingPool}):
+            report = self._run(inc, [1, 2], stages=[(1, 0.05), (3, 0.05), (2, 0.05)])
+        self.assertEqual(created, [3])
+        self.assertEqual(len(report["stages"]), 3)
+
+    def test_error_rate_triggers_saturation(self):
+        lock = threading.Lock()
+        in_flight = [0]
+
+        def flaky(x):
+            # 同时处理超过 2 个请求即报错
+            with lock:
+                in_flight[0] += 1
+                overloaded = in_flight[0] > 2
+            time.sleep(0.005)
+            with lock:
+                in_flight[0] -= 1
+            if overloaded:
+                raise RuntimeError("overloaded")
+            return x
+
+        report = self._run(flaky, [0], stages=[(1, 0.1), (8, 0.1)])
+        self.assertEqual(report["stages"][0]["error_rate"], 0.0)
+        self.assertGreater(report["stages"][1]["error_rate"], 0.0)
+        self.assertEqual(report["saturation"]["stage"], 1)
+        self.assertIn("error rate", report["saturation"]["reason"])
+
+    def test_invalid_stages(self):
+        with self.assertRaises(ValueError):
+            bench_mod.benchmark(inc, [1], stages=[(2, 0.1)], rate=10, show_progress=False)
+        with self.assertRaises(ValueError):
+            bench_mod.benchmark(inc, [1], stages=[(0, 0.1)], show_progress=False)
+        with self.assertRaises(ValueError):
+            bench_mod.benchmark(inc, [1], stages=[], show_progress=False)
+
+
+def fail_odd(x: int) -> int:
+    if x % 2:
+        raise ValueError(x)
+    return x
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles_match_exact(self):
+        rng = random.Random(0)
+        values = [rng.lognormvariate(-5, 1.5) for _ in range(50_000)]
+        hist = bench_mod.LatencyHistogram()
+        for v in values:
+            hist.record(v)
+        ordered = sorted(v * 1000 for v in values)
+        stats = hist.stats()
+        self.assertAlmostEqual(stats["avg"], sum(ordered) / len(ordered), places=6)
+        self.assertAlmostEqual(stats["min"], ordered[0], places=9)
+        self.assertAlmostEqual(stats["max"], ordered[-1], places=9)
+        for key, pct in (("p50", 50), ("p99", 99), ("p999", 99.9), ("p9999", 99.99)):
+            # nearest-rank 定义：第 ceil(pct% × n) 个样本
+            exact = ordered[math.ceil(pct / 100 * len(ordered)) - 1]
+            self.assertLess(abs(stats[key] - exact) / exact, 0.002, key)
+
+    def test_merge_and_bounded_buckets(self):
+        rng = random.Random(1)
+        whole, left, right = (bench_mod.LatencyHistogram() for _ in range(3))
+        for i in range(20_000):
+            v = rng.uniform(0, 5)
+            whole.record(v)
+            (left if i % 2 else right).record(v)
+        left.merge(right)
+        self.assertEqual(left.counts, whole.counts)
+        self.assertEqual(len(left), 20_000)
+        self.assertEqual(left.percentiles([50, 99.99]), whole.percentiles([50, 99.99]))
+        # 0–5 秒的样本最多落在约 1.4 万个桶内，与样本数无关
+        self.assertLess(len(whole.counts), 15_000)
+
+    def test_empty(self):
+        hist = bench_mod.LatencyHistogram()
+        self.assertEqual(hist.stats()["p9999"], 0.0)
+        self.assertEqual(len(hist), 0)
+
+    def test_report_and_keep_results(self):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            report = bench_mod.benchmark(fail_odd, list(range(6)), repeat=3, show_progress=False)
+            dropped = bench_mod.benchmark(
+                inc, [1, 2], repeat=2, keep_results=False, show_progress=False,
+            )
+        self.assertIn("p9999", report["latency_stats"])
+        self.assertEqual(report["fail_count"], 9)
+        self.assertEqual(len(report["errors"]), 9)
+        self.assertEqual(report["results"], [0, None, 2, None, 4, None])
+        self.assertEqual(dropped["results"], [])
+        self.assertEqual(dropped["success_count"], 4)
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
 
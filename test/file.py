@@ -70,6 +70,23 @@ class TestFileJson(_Base):
             file_mod.write_jsonl(rows, p)
             self.assertEqual(file_mod.read_jsonl(p), rows)
 
+    def test_jsonl_from_dataframe_chunked(self):
+        import pandas as pd
+
+        with tempfile.TemporaryDirectory() as td:
+            p = Path(td) / "df.jsonl"
+            df = pd.DataFrame({"i": list(range(10)), "s": [f"中{i}" for i in range(10)]})
+            file_mod.write_file(df, p, chunk_size=3, num_workers=2)
+            self.assertEqual(file_mod.read_jsonl(p), df.to_dict(orient="records"))
+
+            # 浮点数须精确往返，不能被 to_json 的默认精度截断
+            p2 = Path(td) / "floats.jsonl"
+            floats = [0.12345678901234567, 1e-12, 123456789.123456789, -2.5e300, 0.1]
+            df2 = pd.DataFrame({"f": floats, "i": range(5)})
+            file_mod.write_file(df2, p2, chunk_size=2, num_workers=2)
+            self.assertEqual(file_mod.read_jsonl(p2), df2.to_dict(orient="records"))
+            self.assertEqual([r["f"] for r in file_mod.read_jsonl(p2)], floats)
+
 
 class TestFilePickle(_Base):
     def test_pickle_roundtrip(self):
@@ -5,7 +5,17 @@
 
 from __future__ import annotations
 
+import asyncio
+import multiprocessing
+import functools
+import operator
+import os
+import socket
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
 from pathlib import Path
 import sys
 import importlib
@@ -24,6 +34,16 @@ def add(a: int, b: int) -> int:
     return a + b
 
 
+def square(x: int) -> int:
+    return x * x
+
+
+def fail_on_two(x: int) -> int:
+    if x == 2:
+        raise ValueError("boom")
+    return x
+
+
 class TestApplyParallel(unittest.TestCase):
     def test_thread_keeps_order(self):
         out = mp_mod.apply_parallel(range(10), lambda x: x * x, method="thread", show_progress=False)
@@ -76,6 +96,1109 @@ class TestApplyParallel(unittest.TestCase):
             mp_mod.apply_parallel([1, 2, 3], f, method="thread", show_progress=False, error_policy="raise")
 
 
+async def async_double(x: int) -> int:
+    await asyncio.sleep(0)
+    return x * 2
+
+
+class TestProgressReporting(unittest.TestCase):
+    def test_callback_receives_final_stats(self):
+        snapshots = []
+        out = mp_mod.apply_parallel(
+            range(1, 6), fail_on_two, num_workers=2, show_progress=False,
+            progress_callback=snapshots.append, progress_interval=3600,
+        )
+        self.assertIsInstance(out[1], ValueError)
+        # 间隔很大时仅在结束时刷新一次
+        self.assertEqual(len(snapshots), 1)
+        stats = snapshots[0]
+        self.assertEqual((stats["done"], stats["total"], stats["errors"]), (5, 5, 1))
+        self.assertEqual(stats["eta"], 0.0)
+        self.assertGreater(stats["rate"], 0)
+
+    def test_rate_limited_updates(self):
+        snapshots = []
+        mp_mod.apply_parallel(
+            range(2000), square, num_workers=2, show_progress=False,
+            progress_callback=snapshots.append, progress_interval=0,
+        )
+        done = [s["done"] for s in snapshots]
+        self.assertEqual(done, sorted(done))
+        self.assertEqual(done[-1], 2000)
+
+    def test_log_mode_and_async(self):
+        with self.assertLogs(mp_mod.logger, level="INFO") as cm:
+            mp_mod.apply_parallel(range(3), async_double, method="async",
+                                  show_progress=False, progress_callback="log")
+        self.assertTrue(any("进度 3/3" in line for line in cm.output))
+
+    def test_imap_callback(self):
+        snapshots = []
+        list(mp_mod.imap_parallel(range(10), square, show_progress=False,
+                                  progress_callback=snapshots.append))
+        self.assertEqual(snapshots[-1]["done"], 10)
+
+    def test_invalid_callback(self):
+        with self.assertRaises(ValueError):
+            mp_mod.apply_parallel(range(3), square, show_progress=False,
+                                  progress_callback="stdout")
+
+
+class TestAsyncBackend(unittest.TestCase):
+    def test_async_method_concurrency_and_order(self):
+        async def fetch(x: int) -> int:
+            await asyncio.sleep(0.05)
+            return x * 2
+
+        start = time.perf_counter()
+        out = mp_mod.apply_parallel(range(500), fetch, method="async", num_workers=500,
+                                    show_progress=False)
+        self.assertEqual(out, [i * 2 for i in range(500)])
+        self.assertLess(time.perf_counter() - start, 2.0)
+
+    def test_async_error_policies(self):
+        async def f(x: int) -> int:
+            if x == 2:
+                raise ValueError("boom")
+            return x
+
+        out = asyncio.run(mp_mod.apply_parallel_async([1, 2, 3], f, show_progress=False))
+        self.assertIsInstance(out[1], ValueError)
+        with self.assertRaises(RuntimeError):
+            mp_mod.apply_parallel([1, 2, 3], f, method="async", error_policy="raise",
+                                  show_progress=False)
+
+    def test_async_task_timeout(self):
+        async def slow(x: int) -> int:
+            await asyncio.sleep(1.0 if x == 1 else 0)
+            return x
+
+        start = time.perf_counter()
+        out = mp_mod.apply_parallel(range(3), slow, method="async", task_timeout=0.1,
+                                    show_progress=False)
+        self.assertLess(time.perf_counter() - start, 0.8)
+        self.assertEqual(out[0], 0)
+        self.assertIsInstance(out[1], TimeoutError)
+        self.assertEqual(out[2], 2)
+
+    def test_async_rejects_executor_options(self):
+        for kwargs in ({"chunksize": 4}, {"max_tasks_per_child": 1}):
+            with self.assertRaises(ValueError):
+                mp_mod.apply_parallel(range(3), async_double, method="async",
+                                      show_progress=False, **kwargs)
+
+
+def io_bound(x: int) -> int:
+    time.sleep(0.005)
+    return x
+
+
+class TestAutoWorkers(unittest.TestCase):
+    def test_available_cpus_positive(self):
+        self.assertGreaterEqual(mp_mod.available_cpus(), 1)
+
+    def test_auto_tunes_and_caches(self):
+        key = ("thread", mp_mod._tune_key(io_bound))
+        mp_mod._autotune_cache.pop(key, None)
+        with mock.patch.object(mp_mod, "_TUNE_INTERVAL_SECONDS", 0.05):
+            out = mp_mod.apply_parallel(range(3000), io_bound, num_workers="auto",
+                                        show_progress=False)
+        self.assertEqual(out, list(range(3000)))
+        self.assertGreater(mp_mod._autotune_cache[key], 1)
+
+        # 第二次调用直接复用缓存值
+        out = mp_mod.apply_parallel(range(10), io_bound, num_workers="auto", show_progress=False)
+        self.assertEqual(out, list(range(10)))
+
+
+    def test_lambdas_tuned_separately(self):
+        fast, slow = (lambda x: x), (lambda x: x)
+        self.assertEqual(mp_mod._func_key(fast), mp_mod._func_key(slow))
+        self.assertNotEqual(mp_mod._tune_key(fast), mp_mod._tune_key(slow))
+        self.assertEqual(mp_mod._tune_key(functools.partial(io_bound)),
+                         mp_mod._tune_key(io_bound))
+        mp_mod._autotune_cache[("thread", mp_mod._tune_key(fast))] = 1
+        with mock.patch.object(mp_mod, "_ConcurrencyTuner",
+                               wraps=mp_mod._ConcurrencyTuner) as tuner:
+            mp_mod.apply_parallel(range(4), slow, num_workers="auto", show_progress=False)
+        tuner.assert_called_once()
+        mp_mod._autotune_cache.pop(("thread", mp_mod._tune_key(fast)), None)
+
+
+def pair(x: int) -> tuple:
+    return (x, x)
+
+
+class TestCheckpoint(unittest.TestCase):
+    def test_resume_skips_finished_items(self):
+        calls = []
+        crash = [True]
+
+        def flaky(x: int) -> int:
+            calls.append(x)
+            if crash[0] and x >= 7:
+                raise KeyboardInterrupt if x == 7 else ValueError(x)
+            return x * 2
+
+        with tempfile.TemporaryDirectory() as td:
+            ckpt = os.path.join(td, "run.jsonl")
+            with self.assertRaises(KeyboardInterrupt):
+                mp_mod.apply_parallel(range(10), flaky, num_workers=1, chunksize=1,
+                                      checkpoint=ckpt, show_progress=False)
+
+            calls.clear()
+            crash[0] = False
+            out = mp_mod.apply_parallel(range(10), flaky, num_workers=2, checkpoint=ckpt,
+                                        show_progress=False)
+            self.assertEqual(out, [i * 2 for i in range(10)])
+            self.assertEqual(sorted(calls), [7, 8, 9])
+
+            with self.assertRaises(ValueError):
+                mp_mod.apply_parallel(range(3), square, checkpoint=ckpt, show_progress=False)
+
+    def test_resume_from_truncated_file(self):
+        calls = []
+
+        def traced_pair(x: int) -> tuple:
+            calls.append(x)
+            return pair(x)
+
+        with tempfile.TemporaryDirectory() as td:
+            ckpt = os.path.join(td, "run.ckpt")
+            out = mp_mod.apply_parallel(range(6), traced_pair, checkpoint=ckpt,
+                                        show_progress=False)
+            self.assertEqual(out, [(i, i) for i in range(6)])
+            # 模拟追加到一半时崩溃：截掉最后一帧的一部分
+            size = os.path.getsize(ckpt)
+            with open(ckpt, "r+b") as f:
+                f.truncate(size - 3)
+
+            calls.clear()
+            out = mp_mod.apply_parallel(range(6), traced_pair, checkpoint=ckpt,
+                                        show_progress=False)
+            self.assertEqual(out, [(i, i) for i in range(6)])
+            self.assertEqual(len(calls), 1)
+            # 续跑结果与首次运行类型一致（tuple 不会变成 list）
+            out = mp_mod.apply_parallel(range(6), traced_pair, checkpoint=ckpt,
+                                        show_progress=False)
+            self.assertEqual(out, [(i, i) for i in range(6)])
+
+    def test_unpicklable_results_are_recomputed(self):
+        def make(x):
+            return lambda: x
+
+        with tempfile.TemporaryDirectory() as td:
+            ckpt = os.path.join(td, "run.ckpt")
+            out = mp_mod.apply_parallel(range(3), make, checkpoint=ckpt, show_progress=False)
+            self.assertEqual([f() for f in out], [0, 1, 2])
+            out = mp_mod.apply_parallel(range(3), make, checkpoint=ckpt, show_progress=False)
+            self.assertEqual([f() for f in out], [0, 1, 2])
+
+    def test_rejects_different_inputs_of_same_length(self):
+        with tempfile.TemporaryDirectory() as td:
+            ckpt = os.path.join(td, "run.ckpt")
+            mp_mod.apply_parallel([1, 2, 3], square, checkpoint=ckpt, show_progress=False)
+            with self.assertRaises(ValueError):
+                mp_mod.apply_parallel([10, 20, 30], square, checkpoint=ckpt,
+                                      show_progress=False)
+
+    def test_rejects_different_function(self):
+        with tempfile.TemporaryDirectory() as td:
+            ckpt = os.path.join(td, "run.ckpt")
+            mp_mod.apply_parallel([1, 2, 3], square, checkpoint=ckpt, show_progress=False)
+            with self.assertRaises(ValueError):
+                mp_mod.apply_parallel([1, 2, 3], pair, checkpoint=ckpt, show_progress=False)
+
+
+class TestChunksize(unittest.TestCase):
+    def test_process_chunksize_keeps_order(self):
+        out = mp_mod.apply_parallel(range(50), square, method="process", num_workers=2,
+                                    chunksize=7, show_progress=False)
+        self.assertEqual(out, [i * i for i in range(50)])
+
+    def test_chunksize_error_policy_per_item(self):
+        out = mp_mod.apply_parallel([1, 2, 3, 4], fail_on_two, chunksize=3, show_progress=False)
+        self.assertEqual(out[0], 1)
+        self.assertIsInstance(out[1], ValueError)
+        self.assertEqual(out[2:], [3, 4])
+
+    def test_auto_chunksize(self):
+        out = mp_mod.apply_parallel(range(200), square, method="process", num_workers=2,
+                                    chunksize="auto", show_progress=False)
+        self.assertEqual(out, [i * i for i in range(200)])
+
+    def test_auto_chunksize_probes_in_workers(self):
+        pids = mp_mod.apply_parallel(range(40), worker_pid, method="process", num_workers=2,
+                                     chunksize="auto", show_progress=False)
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_auto_chunksize_probe_respects_timeout(self):
+        start = time.monotonic()
+        out = mp_mod.apply_parallel([(x, 60) for x in range(8)], hang_on_three,
+                                    method="process", num_workers=2, chunksize="auto",
+                                    task_timeout=0.5, show_progress=False)
+        self.assertLess(time.monotonic() - start, 30)
+        self.assertIsInstance(out[3], TimeoutError)
+        self.assertEqual([out[i] for i in range(8) if i != 3], [0, 1, 4, 16, 25, 36, 49])
+
+    def test_invalid_chunksize(self):
+        with self.assertRaises(ValueError):
+            mp_mod.apply_parallel([1], square, chunksize=0, show_progress=False)
+
+
+class TestImapParallel(unittest.TestCase):
+    def test_ordered_stream(self):
+        out = list(mp_mod.imap_parallel((i for i in range(20)), square, num_workers=3,
+                                        chunksize=2, show_progress=False))
+        self.assertEqual(out, [i * i for i in range(20)])
+
+    def test_unordered_stream(self):
+        out = mp_mod.imap_parallel(range(20), square, ordered=False, show_progress=False)
+        self.assertEqual(sorted(out), sorted(i * i for i in range(20)))
+
+    def test_backpressure_bounds_consumption(self):
+        pulled = []
+
+        def source():
+            for i in range(1000):
+                pulled.append(i)
+                yield i
+
+        it = mp_mod.imap_parallel(source(), square, num_workers=2, max_in_flight=4,
+                                  show_progress=False)
+        self.assertEqual(next(it), 0)
+        self.assertLessEqual(len(pulled), 6)
+        it.close()
+
+    def test_error_policies(self):
+        out = list(mp_mod.imap_parallel([1, 2, 3], fail_on_two, show_progress=False))
+        self.assertIsInstance(out[1], ValueError)
+        out = list(mp_mod.imap_parallel([1, 2, 3], fail_on_two, error_policy="ignore",
+                                        show_progress=False))
+        self.assertEqual(out, [1, None, 3])
+        with self.assertRaises(RuntimeError):
+            list(mp_mod.imap_parallel([1, 2, 3], fail_on_two, error_policy="raise",
+                                      show_progress=False))
+
+    def test_invalid_method_raises_eagerly(self):
+        with self.assertRaises(ValueError):
+            mp_mod.imap_parallel([1], square, method="bad")
+
+
+def _frame_shard(part):
+    return part["a"] * 2 + part["b"]
+
+
+def _frame_dtypes(part):
+    return [tuple(str(dtype) for dtype in part.dtypes)]
+
+
+def _first_column(part):
+    return part[:, 0]
+
+
+def _sum_rows(part):
+    return part.sum(axis=1)
+
+
+class TestApplySharded(unittest.TestCase):
+    def setUp(self):
+        try:
+            import numpy  # noqa: F401
+            import pandas  # noqa: F401
+        except Exception as exc:
+            self.skipTest(f"numpy / pandas 不可用，跳过分片测试: {exc}")
+
+    def test_dataframe_process_shards(self):
+        import pandas as pd
+
+        df = pd.DataFrame({"a": range(100), "b": [0.5] * 100, "s": ["x"] * 100},
+                          index=range(100, 200))
+        out = mp_mod.apply_sharded(df, _frame_shard, num_workers=2, shard_size=7,
+                                   show_progress=False)
+        self.assertTrue(out.equals(df["a"] * 2 + df["b"]))
+
+    def test_extension_dtypes_preserved_in_process_shards(self):
+        import pandas as pd
+
+        df = pd.DataFrame({
+            "cat": pd.Categorical(["x", "y", "z"] * 10),
+            "n": pd.array([1, None, 3] * 10, dtype="Int64"),
+            "t": pd.date_range("2024-01-01", periods=30, tz="UTC"),
+        })
+        out = mp_mod.apply_sharded(df, _frame_dtypes, num_workers=2, shard_size=7,
+                                   show_progress=False)
+        self.assertEqual(set(out), {tuple(str(dtype) for dtype in df.dtypes)})
+
+    def test_ndarray_thread_and_process(self):
+        import numpy as np
+
+        arr = np.arange(60, dtype=np.float64).reshape(20, 3)
+        for method in ("thread", "process"):
+            out = mp_mod.apply_sharded(arr, _sum_rows, method=method, num_workers=2,
+                                       show_progress=False)
+            np.testing.assert_array_equal(out, arr.sum(axis=1))
+
+    def test_object_ndarray_process_shards(self):
+        import numpy as np
+
+        arr = np.array([[i, str(i)] for i in range(20)], dtype=object)
+        out = mp_mod.apply_sharded(arr, _first_column, method="process", num_workers=2,
+                                   shard_size=6, show_progress=False)
+        self.assertEqual(list(out), list(range(20)))
+
+    def test_rejects_other_types(self):
+        with self.assertRaises(TypeError):
+            mp_mod.apply_sharded([1, 2, 3], _sum_rows, show_progress=False)
+
+
+def lookup_shared(key: str) -> int:
+    return mp_mod.get_shared()[key]
+
+
+_INIT_VALUE = None
+
+
+def set_init_value(value: int) -> None:
+    global _INIT_VALUE
+    _INIT_VALUE = value
+
+
+def read_init_value(x: int) -> int:
+    return x + _INIT_VALUE
+
+
+class TestSharedPayload(unittest.TestCase):
+    def test_shared_process_and_thread(self):
+        table = {str(i): i * 10 for i in range(100)}
+        for method in ("process", "thread"):
+            out = mp_mod.apply_parallel([str(i) for i in range(100)], lookup_shared,
+                                        method=method, num_workers=2, shared=table,
+                                        show_progress=False)
+            self.assertEqual(out, [i * 10 for i in range(100)])
+
+    def test_shared_with_pool(self):
+        with mp_mod.ParallelPool("process", num_workers=2, shared={"a": 1}) as pool:
+            out = mp_mod.apply_parallel(["a", "a"], lookup_shared, pool=pool, show_progress=False)
+        self.assertEqual(out, [1, 1])
+        with self.assertRaises(ValueError):
+            mp_mod.apply_parallel(["a"], lookup_shared, pool=True, shared={}, show_progress=False)
+
+    def test_shared_and_initializer_with_auto_chunksize(self):
+        # chunksize="auto" 的探测须在已初始化的 worker 中执行
+        table = {str(i): i for i in range(50)}
+        for method in ("process", "thread"):
+            out = mp_mod.apply_parallel([str(i) for i in range(50)], lookup_shared,
+                                        method=method, num_workers=2, shared=table,
+                                        chunksize="auto", show_progress=False)
+            self.assertEqual(out, list(range(50)))
+        out = mp_mod.apply_parallel(range(50), read_init_value, method="process",
+                                    num_workers=2, initializer=set_init_value, initargs=(7,),
+                                    chunksize="auto", show_progress=False)
+        self.assertEqual(out, [x + 7 for x in range(50)])
+
+    def test_get_shared_without_payload(self):
+        with self.assertRaises(LookupError):
+            mp_mod.get_shared()
+
+
+def die_once(x: int, marker: str) -> int:
+    # 第一次处理 x == 5 的 worker 直接退出，模拟 worker 丢失
+    if x == 5 and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return x * 3
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestRemoteExecutor(unittest.TestCase):
+    def setUp(self):
+        self.addresses = [f"127.0.0.1:{_free_port()}" for _ in range(3)]
+        self.procs = [
+            multiprocessing.Process(target=mp_mod.serve_worker, args=(addr, b"test"), daemon=True)
+            for addr in self.addresses
+        ]
+        for p in self.procs:
+            p.start()
+        mp_mod.set_remote_workers(self.addresses, authkey=b"test")
+
+    def tearDown(self):
+        for p in self.procs:
+            p.terminate()
+            p.join()
+
+    def test_authkey_required(self):
+        with mock.patch.object(mp_mod, "_remote_authkey", None):
+            with self.assertRaises(ValueError):
+                mp_mod.serve_worker(f"127.0.0.1:{_free_port()}")
+            with self.assertRaises(ValueError):
+                mp_mod.RemoteExecutor(addresses=self.addresses)
+
+    def test_remote_keeps_order_with_shared(self):
+        out = mp_mod.apply_parallel([str(i) for i in range(30)], lookup_shared, method="remote",
+                                    num_workers=3, chunksize=4, show_progress=False,
+                                    shared={str(i): i for i in range(30)})
+        self.assertEqual(out, list(range(30)))
+
+    def test_remote_retries_on_worker_loss(self):
+        with tempfile.TemporaryDirectory() as td:
+            marker = os.path.join(td, "died")
+            items = [(i, marker) for i in range(20)]
+            out = mp_mod.apply_parallel(items, die_once, method="remote", num_workers=3,
+                                        show_progress=False)
+        self.assertEqual(out, [i * 3 for i in range(20)])
+
+    def test_remote_error_policy(self):
+        out = mp_mod.apply_parallel([1, 2, 3], fail_on_two, method="remote", num_workers=3,
+                                    show_progress=False)
+        self.assertIsInstance(out[1], ValueError)
+
+
+def flaky(x: int, marker_dir: str, failures: int) -> int:
+    # 3 的倍数在前 failures 次调用时失败，次数记录在 marker_dir 下的文件里
+    if x % 3 == 0:
+        path = os.path.join(marker_dir, str(x))
+        count = os.path.getsize(path) if os.path.exists(path) else 0
+        if count < failures:
+            with open(path, "a") as f:
+                f.write("x")
+            raise ConnectionError(f"transient {x}")
+    return x + 100
+
+
+class TestRetries(unittest.TestCase):
+    def _items(self, td, n=7, failures=2):
+        return [(x, td, failures) for x in range(n)]
+
+    def test_retries_recover_failed_items(self):
+        with tempfile.TemporaryDirectory() as td:
+            out, attempts = mp_mod.apply_parallel(
+                self._items(td), flaky, num_workers=2, retries=2, backoff=0.01,
+                return_attempts=True, show_progress=False,
+            )
+        self.assertEqual(out, [x + 100 for x in range(7)])
+        self.assertEqual(attempts, [3, 1, 1, 3, 1, 1, 3])
+
+    def test_retries_exhausted_and_retry_on(self):
+        with tempfile.TemporaryDirectory() as td:
+            out, attempts = mp_mod.apply_parallel(
+                self._items(td, n=4, failures=5), flaky, retries=1, backoff=0,
+                return_attempts=True, show_progress=False,
+            )
+        self.assertIsInstance(out[0], ConnectionError)
+        self.assertEqual(attempts, [2, 1, 1, 2])
+
+        with tempfile.TemporaryDirectory() as td:
+            out, attempts = mp_mod.apply_parallel(
+                self._items(td, n=4), flaky, retries=3, retry_on=(KeyError,),
+                return_attempts=True, show_progress=False,
+            )
+        self.assertIsInstance(out[3], ConnectionError)
+        self.assertEqual(attempts, [1, 1, 1, 1])
+
+    def test_process_chunked_retries(self):
+        with tempfile.TemporaryDirectory() as td:
+            out = mp_mod.apply_parallel(
+                self._items(td, n=10, failures=1), flaky, method="process",
+                num_workers=2, chunksize=3, retries=1, backoff=lambda k: 0.01,
+                show_progress=False,
+            )
+        self.assertEqual(out, [x + 100 for x in range(10)])
+
+    def test_backoff_does_not_block_workers(self):
+        with tempfile.TemporaryDirectory() as td:
+            start = time.monotonic()
+            out = mp_mod.apply_parallel(
+                [(x, td, 1) for x in range(3, 43, 3)], flaky, num_workers=1,
+                retries=1, backoff=0.3, show_progress=False,
+            )
+            elapsed = time.monotonic() - start
+        self.assertEqual(out, [x + 100 for x in range(3, 43, 3)])
+        # 14 个元素的退避并行等待，总耗时接近一次退避而不是 14 次
+        self.assertLess(elapsed, 2.0)
+
+
+def slow_on_seven(x: int) -> int:
+    time.sleep(0.2 if x == 7 else 0.005)
+    return x
+
+
+class TestStats(unittest.TestCase):
+    def test_stats_report(self):
+        out, stats = mp_mod.apply_parallel(
+            range(20), slow_on_seven, num_workers=2, return_stats=True, show_progress=False,
+        )
+        self.assertEqual(out, list(range(20)))
+        self.assertEqual((stats["tasks"], stats["items"]), (20, 20))
+        for key in ("execution_ms", "queue_wait_ms", "collect_lag_ms", "total_ms"):
+            self.assertEqual(set(stats[key]), {"avg", "min", "max", "p50", "p90", "p95", "p99"})
+        self.assertGreaterEqual(stats["execution_ms"]["max"], 200)
+        self.assertEqual([s["index"] for s in stats["stragglers"]], [7])
+        self.assertLessEqual(len(stats["workers"]), 2)
+        self.assertEqual(sum(w["tasks"] for w in stats["workers"].values()), 20)
+        self.assertTrue(0 < stats["utilization"] <= 1.0)
+        self.assertIn(stats["bottleneck"], ("func", "pool", "main_thread"))
+
+    def test_stats_with_attempts_and_chunks(self):
+        with tempfile.TemporaryDirectory() as td:
+            out, attempts, stats = mp_mod.apply_parallel(
+                [(x, td, 1) for x in range(6)], flaky, method="process", num_workers=2,
+                chunksize=2, retries=1, backoff=0, return_attempts=True,
+                return_stats=True, show_progress=False,
+            )
+        self.assertEqual(out, [x + 100 for x in range(6)])
+        self.assertEqual(attempts, [2, 1, 1, 2, 1, 1])
+        # 3 个分组 + 2 个单元素重试任务
+        self.assertEqual((stats["tasks"], stats["items"]), (5, 8))
+
+
+def is_even(x: int) -> bool:
+    return x % 2 == 0
+
+
+class TestPipeline(unittest.TestCase):
+    def test_chained_stages(self):
+        pipe = (
+            mp_mod.Pipeline()
+            .map(square, method="process", num_workers=2, chunksize=4)
+            .filter(is_even, num_workers=2)
+            .batch(3)
+            .map(sum, num_workers=2)
+        )
+        evens = [i * i for i in range(20) if i * i % 2 == 0]
+        expected = [sum(evens[i:i + 3]) for i in range(0, len(evens), 3)]
+        self.assertEqual(list(pipe.run(range(20))), expected)
+        # 可重复运行
+        self.assertEqual(list(pipe.run(range(20))), expected)
+
+        full = mp_mod.Pipeline().batch(2).filter(lambda b: len(b) == 2)
+        self.assertEqual(list(full.run(range(5))), [[0, 1], [2, 3]])
+
+    def test_stages_overlap(self):
+        events = []
+
+        def produce(x):
+            time.sleep(0.02)
+            events.append(("produce", x))
+            return x
+
+        def consume(x):
+            events.append(("consume", x))
+            return x
+
+        pipe = mp_mod.Pipeline().map(produce, num_workers=1).map(consume, num_workers=1)
+        self.assertEqual(list(pipe.run(range(10))), list(range(10)))
+        first_consume = events.index(("consume", 0))
+        self.assertLess(first_consume, events.index(("produce", 9)))
+
+    def test_bounded_memory_and_early_exit(self):
+        pulled = []
+
+        def source():
+            for i in range(10_000):
+                pulled.append(i)
+                yield i
+
+        pipe = mp_mod.Pipeline().map(square, num_workers=2, queue_size=2).map(square, num_workers=2, queue_size=2)
+        stream = pipe.run(source())
+        self.assertEqual(next(stream), 0)
+        time.sleep(0.2)
+        self.assertLess(len(pulled), 50)
+        stream.close()
+
+    def test_error_propagates(self):
+        pipe = mp_mod.Pipeline().map(fail_on_two).map(square)
+        with self.assertRaises(RuntimeError):
+            list(pipe.run([1, 2, 3]))
+        pipe = mp_mod.Pipeline().map(fail_on_two, error_policy="ignore")
+        self.assertEqual(list(pipe.run([1, 2, 3])), [1, None, 3])
+        with self.assertRaises(ValueError):
+            mp_mod.Pipeline().batch(0)
+
+
+class TestCostScheduling(unittest.TestCase):
+    def test_largest_first_keeps_result_order(self):
+        calls = []
+
+        def record(x):
+            calls.append(x)
+            return x * 2
+
+        out = mp_mod.apply_parallel(range(10), record, num_workers=1, batch_size=1,
+                                    cost=lambda x: x, show_progress=False)
+        self.assertEqual(out, [x * 2 for x in range(10)])
+        self.assertEqual(calls, list(range(9, -1, -1)))
+
+    def test_cost_packing(self):
+        items = [100, 1, 1, 1, 1, 1, 50, 1, 1, 1]
+        groups = list(mp_mod._cost_groups(items, 3, range(10), lambda x: x))
+        self.assertEqual([g[0] for g in groups[:2]], [(0,), (6,)])
+        self.assertEqual(sorted(i for idx, _ in groups for i in idx), list(range(10)))
+
+        out, stats = mp_mod.apply_parallel(
+            items, square, method="process", num_workers=2, chunksize=3,
+            cost=lambda x: x, return_stats=True, show_progress=False,
+        )
+        self.assertEqual(out, [x * x for x in items])
+        self.assertEqual(stats["tasks"], 3)
+
+
+def counted_square(x: int, log_path: str) -> int:
+    with open(log_path, "a") as f:
+        f.write(f"{x}\n")
+    return x * x
+
+
+class TestResultCache(unittest.TestCase):
+    def _calls(self, log_path):
+        with open(log_path) as f:
+            return sorted(int(line) for line in f)
+
+    def test_incomplete_backend_fails_on_construction(self):
+        class GetOnly(mp_mod.ResultCache):
+            def get(self, key):
+                return self._MISSING
+
+        with self.assertRaises(TypeError):
+            GetOnly()
+
+    def test_memory_cache_skips_hits(self):
+        cache = mp_mod.MemoryCache(maxsize=100)
+        with tempfile.TemporaryDirectory() as td:
+            log = os.path.join(td, "calls.log")
+            out1 = mp_mod.apply_parallel([(x, log) for x in range(5)], counted_square,
+                                         cache=cache, cache_key=lambda e: e[0],
+                                         show_progress=False)
+            out2, attempts = mp_mod.apply_parallel(
+                [(x, log) for x in range(3, 8)], counted_square, cache=cache,
+                cache_key=lambda e: e[0], return_attempts=True, show_progress=False,
+            )
+            self.assertEqual(self._calls(log), [0, 1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(out1, [0, 1, 4, 9, 16])
+        self.assertEqual(out2, [9, 16, 25, 36, 49])
+        self.assertEqual(attempts, [0, 0, 1, 1, 1])
+        self.assertEqual(len(cache), 8)
+
+    def test_lru_eviction(self):
+        cache = mp_mod.MemoryCache(maxsize=2)
+        for key in "abc":
+            cache.set(key, key.upper())
+        self.assertIs(cache.get("a"), mp_mod.ResultCache._MISSING)
+        self.assertEqual(cache.get("c"), "C")
+
+    def test_disk_cache_persists_and_skips_pool(self):
+        with tempfile.TemporaryDirectory() as td:
+            db = os.path.join(td, "cache.sqlite")
+            log = os.path.join(td, "calls.log")
+            items = [(x, log) for x in range(6)]
+            out1 = mp_mod.apply_parallel(items, counted_square, method="process",
+                                         num_workers=2, cache=db, show_progress=False)
+            no_pool = mock.Mock(side_effect=AssertionError("不应创建执行器"))
+            with mock.patch.dict(mp_mod._EXECUTOR_MAP, {"process": no_pool}):
+                out2 = mp_mod.apply_parallel(items, counted_square, method="process",
+                                             cache=db, show_progress=False)
+            self.assertEqual(out1, out2)
+            self.assertEqual(self._calls(log), list(range(6)))
+            self.assertEqual(len(mp_mod.DiskCache(db)), 6)
+
+    def test_failures_not_cached(self):
+        cache = mp_mod.MemoryCache()
+        out = mp_mod.apply_parallel([1, 2, 3], fail_on_two, cache=cache, show_progress=False)
+        self.assertIsInstance(out[1], ValueError)
+        self.assertEqual(len(cache), 2)
+        with self.assertRaises(ValueError):
+            mp_mod.apply_parallel([1], square, cache=123, show_progress=False)
+
+    def test_lambda_requires_cache_key(self):
+        with self.assertRaises(ValueError):
+            mp_mod.apply_parallel([1, 2, 3], lambda x: x + 1, cache=True, show_progress=False)
+
+    def test_fingerprint_distinguishes_constants_closures_partials(self):
+        cache = mp_mod.MemoryCache()
+        ident = lambda e: e  # noqa: E731
+
+        def run(func):
+            return mp_mod.apply_parallel([1, 2, 3], func, cache=cache, cache_key=ident,
+                                         show_progress=False)
+
+        self.assertEqual(run(lambda x: x + 1), [2, 3, 4])
+        self.assertEqual(run(lambda x: x + 100), [101, 102, 103])
+
+        def scale(k):
+            return lambda x: x * k
+
+        self.assertEqual(run(scale(2)), [2, 4, 6])
+        self.assertEqual(run(scale(3)), [3, 6, 9])
+
+        self.assertEqual(run(functools.partial(operator.add, 1)), [2, 3, 4])
+        self.assertEqual(run(functools.partial(operator.mul, 10)), [10, 20, 30])
+        # partial 包装模块级函数时可靠，无需 cache_key
+        out = mp_mod.apply_parallel([1, 2], functools.partial(operator.add, 5), cache=cache,
+                                    show_progress=False)
+        self.assertEqual(out, [6, 7])
+
+
+class TestInterpreterBackend(unittest.TestCase):
+    def test_resolution_order(self):
+        with mock.patch.object(mp_mod, "FREE_THREADED", True):
+            self.assertEqual(mp_mod._resolve_method("interpreter"), "thread")
+        with mock.patch.object(mp_mod, "FREE_THREADED", False), \
+                mock.patch.object(mp_mod, "InterpreterPoolExecutor", None):
+            self.assertEqual(mp_mod._resolve_method("interpreter"), "process")
+        self.assertEqual(mp_mod._resolve_method("thread"), "thread")
+
+    def test_interpreter_method_runs(self):
+        out = mp_mod.apply_parallel(range(6), square, method="interpreter",
+                                    num_workers=2, show_progress=False)
+        self.assertEqual(out, [i * i for i in range(6)])
+        out = list(mp_mod.imap_parallel(range(4), square, method="interpreter",
+                                        num_workers=2, show_progress=False))
+        self.assertEqual(out, [0, 1, 4, 9])
+
+
+def make_blob(x: int) -> bytes:
+    return bytes([x % 256]) * 10_000
+
+
+class TestMemoryLimit(unittest.TestCase):
+    def test_spills_beyond_budget(self):
+        out = mp_mod.apply_parallel(range(20), make_blob, method="process", num_workers=2,
+                                    memory_limit="50KB", show_progress=False)
+        self.assertIsInstance(out, mp_mod.SpilledResults)
+        self.assertEqual(len(out), 20)
+        self.assertGreater(out.spilled, 0)
+        self.assertLessEqual(out.memory_used, 50 * 1024)
+        self.assertEqual(list(out), [make_blob(x) for x in range(20)])
+        self.assertEqual(out[-1], make_blob(19))
+        self.assertEqual(out[3:6], [make_blob(x) for x in range(3, 6)])
+        out.close()
+
+    def test_errors_and_small_results(self):
+        with mp_mod.apply_parallel([1, 2, 3], fail_on_two, memory_limit=1 << 20,
+                                   show_progress=False) as out:
+            self.assertEqual(out.spilled, 0)
+            self.assertEqual(out[0], 1)
+            self.assertIsInstance(out[1], ValueError)
+        with mp_mod.apply_parallel([1, 2, 3], fail_on_two, memory_limit=0,
+                                   show_progress=False) as out:
+            self.assertEqual(out.spilled, 3)
+            self.assertIsInstance(out[1], ValueError)
+            self.assertEqual(out[2], 3)
+
+    def test_compares_equal_to_list(self):
+        with mp_mod.apply_parallel(range(5), square, memory_limit=16,
+                                   show_progress=False) as out:
+            self.assertGreater(out.spilled, 0)
+            self.assertEqual(out, [0, 1, 4, 9, 16])
+            self.assertTrue([0, 1, 4, 9, 16] == out)
+            self.assertNotEqual(out, [0, 1, 4, 9])
+
+    def test_parse_bytes(self):
+        self.assertEqual(mp_mod._parse_bytes("2 GB"), 2 << 30)
+        self.assertEqual(mp_mod._parse_bytes(1024), 1024)
+        with self.assertRaises(ValueError):
+            mp_mod._parse_bytes("lots")
+
+
+def word_counts(line: str):
+    from collections import Counter
+    return Counter(line.split())
+
+
+def merge_counts(acc, counts):
+    acc.update(counts)
+    return acc
+
+
+class TestApplyReduce(unittest.TestCase):
+    def test_sum_matches_sequential(self):
+        total = mp_mod.apply_reduce(range(1000), square, operator.add, 0,
+                                    num_workers=3, show_progress=False)
+        self.assertEqual(total, sum(i * i for i in range(1000)))
+
+    def test_counter_in_processes_with_streaming_input(self):
+        from collections import Counter
+        lines = (f"a b {'c' if i % 2 else 'd'}" for i in range(200))
+        initial = Counter()
+        counts = mp_mod.apply_reduce(lines, word_counts, merge_counts, initial,
+                                     method="process", num_workers=2, chunksize=16,
+                                     show_progress=False)
+        self.assertEqual(counts, Counter({"a": 200, "b": 200, "c": 100, "d": 100}))
+        self.assertEqual(initial, Counter())  # 初值不会被原地修改
+
+    def test_order_preserving_combine(self):
+        joined = mp_mod.apply_reduce([str(i) for i in range(50)], str.upper,
+                                     operator.add, "", num_workers=4, chunksize=3,
+                                     show_progress=False)
+        self.assertEqual(joined, "".join(str(i) for i in range(50)))
+
+    def test_error_policies(self):
+        with self.assertRaises(RuntimeError):
+            mp_mod.apply_reduce([1, 2, 3], fail_on_two, operator.add, 0, show_progress=False)
+        total = mp_mod.apply_reduce([1, 2, 3], fail_on_two, operator.add, 0,
+                                    error_policy="ignore", show_progress=False)
+        self.assertEqual(total, 4)
+        self.assertEqual(mp_mod.apply_reduce([], square, operator.add, 7), 7)
+
+    def test_pool_level_chunk_failure_counts_every_element(self):
+        # 第二块含不可序列化的元素，整块在提交时失败
+        items = [1, 2, 3, lambda: 0, 5, 6]
+        with mock.patch.object(mp_mod, "_apply_error_policy",
+                               wraps=mp_mod._apply_error_policy) as policy:
+            total = mp_mod.apply_reduce(items, square, operator.add, 0, method="process",
+                                        num_workers=2, chunksize=3, error_policy="ignore",
+                                        show_progress=False)
+        self.assertEqual(total, 14)
+        self.assertEqual(sorted(call.args[0] for call in policy.call_args_list), [3, 4, 5])
+
+
+class _StandInApi:
+    """本地替身 HTTP 服务：记录每个请求的到达时间与各路径的最大并发数。"""
+
+    def __init__(self, delay: float = 0.0):
+        import http.server
+        import threading
+
+        api = self
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.arrivals = []
+        self.active = {}
+        self.peak = {}
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                with api.lock:
+                    api.arrivals.append(time.monotonic())
+                    api.active[self.path] = api.active.get(self.path, 0) + 1
+                    api.peak[self.path] = max(api.peak.get(self.path, 0), api.active[self.path])
+                time.sleep(api.delay)
+                with api.lock:
+                    api.active[self.path] -= 1
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(self.path.encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def http_get(url: str) -> str:
+    import urllib.request
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        return resp.read().decode()
+
+
+class TestRateLimit(unittest.TestCase):
+    def test_qps_cap_with_burst(self):
+        api = _StandInApi()
+        self.addCleanup(api.close)
+        urls = [f"{api.base}/item/{i}" for i in range(12)]
+        out = mp_mod.apply_parallel(urls, http_get, num_workers=8, rate_limit=(20, 2),
+                                    show_progress=False)
+        self.assertEqual(out, [f"/item/{i}" for i in range(12)])
+        # burst 2 个立即发出，其余 10 个按 20 QPS 间隔约 0.05s
+        span = api.arrivals[-1] - api.arrivals[0]
+        self.assertGreaterEqual(span, 0.4)
+        self.assertLess(span, 2.0)
+
+    def test_per_key_concurrency(self):
+        api = _StandInApi(delay=0.05)
+        self.addCleanup(api.close)
+        urls = [f"{api.base}/{host}" for host in ["slow"] * 6 + ["fast"] * 6]
+        start = time.monotonic()
+        out = mp_mod.apply_parallel(
+            urls, http_get, num_workers=8, show_progress=False,
+            concurrency_key=lambda url: url.rsplit("/", 1)[1],
+            max_per_key={"slow": 1},
+        )
+        self.assertEqual(out, ["/slow"] * 6 + ["/fast"] * 6)
+        self.assertEqual(api.peak["/slow"], 1)
+        self.assertGreater(api.peak["/fast"], 1)
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            mp_mod.apply_parallel([1], square, max_per_key=1, show_progress=False)
+        with self.assertRaises(ValueError):
+            mp_mod.apply_parallel([1], square, concurrency_key=str, max_per_key=1,
+                                  chunksize=4, show_progress=False)
+        with self.assertRaises(ValueError):
+            mp_mod.apply_parallel([1], square, rate_limit=0, show_progress=False)
+        with self.assertRaises(ValueError):
+            mp_mod.apply_parallel([1], square, rate_limit=5, chunksize=4, show_progress=False)
+
+    def test_rate_limit_with_auto_chunksize(self):
+        start = time.monotonic()
+        out = mp_mod.apply_parallel(range(10), square, rate_limit=(20, 1), chunksize="auto",
+                                    show_progress=False)
+        self.assertEqual(out, [i * i for i in range(10)])
+        # burst 1：其余 9 个元素按 20 QPS 发出，至少约 0.45s
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+
+
+def hang_on_three(x: int, seconds: float) -> int:
+    if x == 3:
+        time.sleep(seconds)
+    return x * x
+
+
+def sleep_square(x: int, seconds: float) -> int:
+    time.sleep(seconds)
+    return x * x
+
+
+def worker_pid(_x: int) -> int:
+    return os.getpid()
+
+
+class TestTaskTimeout(unittest.TestCase):
+    def test_thread_timeout_marks_item(self):
+        out = mp_mod.apply_parallel(
+            [(x, 2.0) for x in range(6)], hang_on_three, num_workers=2,
+            task_timeout=0.3, error_policy="ignore", show_progress=False,
+        )
+        self.assertEqual(out, [0, 1, 4, None, 16, 25])
+
+    def test_process_recycles_hung_worker(self):
+        start = time.monotonic()
+        out = mp_mod.apply_parallel(
+            [(x, 60) for x in range(8)], hang_on_three, method="process",
+            num_workers=2, task_timeout=0.5, error_policy="ignore", show_progress=False,
+        )
+        self.assertEqual(out, [0, 1, 4, None, 16, 25, 36, 49])
+        self.assertLess(time.monotonic() - start, 20)
+
+    def test_queued_items_not_timed_out_behind_hung_workers(self):
+        # 两个 worker 都卡在 1、2 上；排在调用队列里的 3 不应被判超时
+        items = [(x, 60 if x in (1, 2) else 0) for x in range(1, 6)]
+        out = mp_mod.apply_parallel(
+            items, sleep_square, method="process", num_workers=2, chunksize=1,
+            task_timeout=1.0, show_progress=False,
+        )
+        self.assertIsInstance(out[0], TimeoutError)
+        self.assertIsInstance(out[1], TimeoutError)
+        self.assertEqual(out[2:], [9, 16, 25])
+
+    def test_shared_pool_timeout_does_not_break_other_callers(self):
+        mp_mod.shutdown_pools()
+        pool = mp_mod.get_pool("process", 2)
+        result = {}
+        other = threading.Thread(target=lambda: result.setdefault("out", mp_mod.apply_parallel(
+            [(x, 0.4) for x in range(8)], sleep_square, pool=pool, show_progress=False)))
+        other.start()
+        try:
+            out = mp_mod.apply_parallel(
+                [(x, 3.0) for x in range(5)], hang_on_three, pool=pool,
+                task_timeout=0.5, error_policy="ignore", show_progress=False,
+            )
+            other.join(30)
+            self.assertEqual(out, [0, 1, 4, None, 16])
+            # 共用同一个池的调用不受超时回收影响
+            self.assertEqual(result["out"], [x * x for x in range(8)])
+        finally:
+            mp_mod.shutdown_pools()
+
+    def test_shared_pool_queue_time_not_counted(self):
+        mp_mod.shutdown_pools()
+        pool = mp_mod.get_pool("process", 2)
+        busy = pool.executor
+        blockers = [busy.submit(time.sleep, 1.5) for _ in range(2)]
+        try:
+            # 两个 worker 都被其他调用占用，排队等待的任务不应判为超时
+            out = mp_mod.apply_parallel(
+                [(x, 0) for x in range(4)], sleep_square, pool=pool,
+                task_timeout=0.5, show_progress=False,
+            )
+            self.assertEqual(out, [0, 1, 4, 9])
+        finally:
+            for f in blockers:
+                f.result()
+            mp_mod.shutdown_pools()
+
+    def test_timeout_stored_as_exception(self):
+        out = mp_mod.apply_parallel(
+            [(x, 2.0) for x in range(4)], hang_on_three, num_workers=2,
+            task_timeout=0.3, show_progress=False,
+        )
+        self.assertEqual(out[:3], [0, 1, 4])
+        self.assertIsInstance(out[3], TimeoutError)
+
+    @unittest.skipIf(sys.version_info < (3, 11), "max_tasks_per_child 需要 Python 3.11+")
+    def test_max_tasks_per_child(self):
+        pids = mp_mod.apply_parallel(
+            range(4), worker_pid, method="process", num_workers=1,
+            max_tasks_per_child=1, show_progress=False,
+        )
+        self.assertEqual(len(set(pids)), 4)
+
+
+class TestParallelPool(unittest.TestCase):
+    def test_pool_reused_across_calls(self):
+        with mp_mod.ParallelPool("thread", num_workers=2) as pool:
+            out1 = mp_mod.apply_parallel(range(5), square, pool=pool, show_progress=False)
+            executor = pool.executor
+            out2 = mp_mod.apply_parallel(range(3), square, pool=pool, show_progress=False)
+            self.assertIs(pool.executor, executor)
+        self.assertEqual(out1, [0, 1, 4, 9, 16])
+        self.assertEqual(out2, [0, 1, 4])
+        self.assertTrue(pool.closed)
+        with self.assertRaises(RuntimeError):
+            pool.executor
+
+    def test_process_pool_warmup(self):
+        with mp_mod.ParallelPool("process", num_workers=2, warmup=True) as pool:
+            out = mp_mod.apply_parallel(range(4), square, pool=pool, show_progress=False)
+        self.assertEqual(out, [0, 1, 4, 9])
+
+    def test_shared_pool(self):
+        out = mp_mod.apply_parallel(range(4), square, pool=True, num_workers=2, show_progress=False)
+        self.assertEqual(out, [0, 1, 4, 9])
+        self.assertIs(mp_mod.get_pool("thread", 2), mp_mod.get_pool("thread", 2))
+        mp_mod.shutdown_pools()
+
+    def test_evicted_shared_pool_outlives_running_call(self):
+        mp_mod.shutdown_pools()
+        started, gate = threading.Event(), threading.Event()
+
+        def blocked(x):
+            started.set()
+            gate.wait(5)
+            return x * x
+
+        result = {}
+        runner = threading.Thread(target=lambda: result.setdefault("out", mp_mod.apply_parallel(
+            range(3), blocked, pool=True, num_workers=1, show_progress=False)))
+        with mock.patch.object(mp_mod, "_MAX_SHARED_POOLS", 1):
+            runner.start()
+            self.assertTrue(started.wait(5))
+            busy = mp_mod.get_pool("thread", 1)
+            mp_mod.get_pool("thread", 2)          # 淘汰仍在使用中的 busy
+            self.assertFalse(busy.closed)
+            gate.set()
+            runner.join(10)
+            self.assertEqual(result["out"], [0, 1, 4])
+            self.assertTrue(busy.closed)
+            # 持有已淘汰池的调用方自动换用同规格的新池
+            out = mp_mod.apply_parallel(range(3), square, pool=busy, show_progress=False)
+            self.assertEqual(out, [0, 1, 4])
+        mp_mod.shutdown_pools()
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
 